@@ -9,7 +9,43 @@ const api = axios.create({
   },
 });
 
-export const uploadFile = async (file) => {
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const CHUNKED_UPLOAD_THRESHOLD = 16 * 1024 * 1024;
+
+// Large files go through the resumable upload endpoints; after a dropped
+// connection the next chunk starts at the offset the server has committed.
+const uploadFileInChunks = async (file, onProgress) => {
+  const { data: upload } = await api.post('/uploads/', { filename: file.name, size: file.size });
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    const end = Math.min(offset + CHUNK_SIZE, file.size);
+    try {
+      const { data } = await api.put(`/uploads/${upload.upload_id}/`, file.slice(offset, end), {
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`,
+        },
+      });
+      offset = data.offset;
+      retries = 0;
+    } catch (error) {
+      if (error.response && error.response.status !== 409) throw error;
+      if (++retries > 5) throw error;
+      const { data } = await api.get(`/uploads/${upload.upload_id}/`);
+      offset = data.offset;
+    }
+    if (onProgress) onProgress(offset / file.size);
+  }
+  const { data } = await api.post(`/uploads/${upload.upload_id}/complete/`);
+  return data;
+};
+
+export const uploadFile = async (file, onProgress) => {
+  if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+    return uploadFileInChunks(file, onProgress);
+  }
+
   const formData = new FormData();
   formData.append('file', file);
   
@@ -22,17 +58,68 @@ export const uploadFile = async (file) => {
   return response.data;
 };
 
-export const trainModel = (sessionId, targetColumn) =>
-  api.post(`/train/${sessionId}/`, { 
+export const getTrainingJob = (jobId) =>
+  api.get(`/jobs/${jobId}/`);
+
+// Training runs as a background job; poll it until the model is ready.
+export const trainModel = async (sessionId, targetColumn, pollInterval = 1000) => {
+  const response = await api.post(`/train/${sessionId}/`, { 
     target_column: targetColumn 
   });
 
+  let job = response.data;
+  while (job.status === 'queued' || job.status === 'running') {
+    await new Promise((resolve) => setTimeout(resolve, pollInterval));
+    job = (await getTrainingJob(job.job_id)).data;
+  }
+
+  if (job.status === 'failed') {
+    const error = new Error(job.error || 'Training failed');
+    error.response = { data: { error: job.error } };
+    throw error;
+  }
+
+  return { ...response, data: job };
+};
+
+// Appends a CSV of new rows to a session. With options.modelId a new version of that model is
+// queued (options.strategy: 'warm_start' or 'window', options.windowRows); poll it with getTrainingJob.
+export const appendRows = async (sessionId, file, options = {}) => {
+  const formData = new FormData();
+  formData.append('file', file);
+  if (options.modelId) formData.append('model_id', options.modelId);
+  if (options.strategy) formData.append('strategy', options.strategy);
+  if (options.windowRows) formData.append('window_rows', options.windowRows);
+
+  const response = await api.post(`/append/${sessionId}/`, formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  return response.data;
+};
+
+export const retrainModel = (modelId, strategy = 'warm_start', windowRows = null) =>
+  api.post(`/models/${modelId}/retrain/`, { strategy, window_rows: windowRows });
+
 export const predict = (modelId, data) =>
   api.post(`/predict/${modelId}/`, { 
     input_data: data 
   });
 
+// params: { fields, columns, type, offset, limit }; fields and columns may be arrays.
+export const getProfile = (sessionId, params = {}) =>
+  api.get(`/profile/${sessionId}/`, {
+    params: Object.fromEntries(
+      Object.entries(params).map(([key, value]) => [key, Array.isArray(value) ? value.join(',') : value])
+    ),
+  });
+
 export const getSummary = (modelId) =>
   api.get(`/summary/${modelId}/`);
 
+// Pinned models are preloaded by every worker and never evicted.
+export const setModelPinned = (modelId, pinned) =>
+  pinned ? api.post(`/models/${modelId}/pin/`) : api.delete(`/models/${modelId}/pin/`);
+
 export default api; 
\ No newline at end of file
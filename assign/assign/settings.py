@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'base.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -146,7 +147,145 @@ REST_FRAMEWORK = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/app/uploads'
 
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB; larger multipart uploads spill to a temp file
+
+# Resumable uploads (api/uploads/): chunks are streamed to disk in reads of this size
+CHUNKED_UPLOAD_READ_SIZE = 1024 * 1024
+CHUNKED_UPLOAD_SNIFF_BYTES = 64 * 1024  # bytes checked for encoding, delimiter and header
+CHUNKED_UPLOAD_MAX_BYTES = 50 * 1024 * 1024 * 1024  # 50GB
+CHUNKED_UPLOAD_TTL = 24 * 3600  # seconds without a chunk before gc_artifacts expires an upload
+
+# Upload profiling streams the whole file in chunks of this many rows
+PROFILE_CHUNK_SIZE = 50000
+PROFILE_MAX_TRACKED_VALUES = 1000  # per-column value counts kept for imbalance checks
+# Columns per page of api/profile/<session_id>/ (?offset=&limit=), with the page's correlations
+PROFILE_PAGE_SIZE = 100
+PROFILE_MAX_PAGE_SIZE = 1000
+
+# Profile correlations: only pairs with |r| at or above the threshold are kept, strongest first
+CORRELATION_THRESHOLD = 0.5
+CORRELATION_MAX_PAIRS = 500
+CORRELATION_BLOCK_SIZE = 256  # columns per float32 block
+
+# The profiler state kept with each columnar cache, so appends profile only the new rows. Its
+# covariance sums take 8*k*k bytes for k numeric columns, 32*k*k when some have missing values
+# (1000 columns: 8-32 MB). Over this many columns it is not kept and appends re-profile in full.
+PROFILER_STATE_MAX_COLUMNS = 1000
+
+# Leakage scoring against the training target, on a sample of the upload
+LEAKAGE_SAMPLE_ROWS = 200000
+LEAKAGE_THRESHOLD = 0.8  # |r| or share of the target's entropy explained
+LEAKAGE_MAX_COLUMNS = 20
+LEAKAGE_BINS = 16  # quantile bins for numeric columns scored by mutual information
+LEAKAGE_MAX_CATEGORIES = 1000
+
+# One-hot features are kept as CSR matrices when the estimated density drops below this
+SPARSE_FEATURE_DENSITY_THRESHOLD = 0.1
+
+# Rows scored per chunk by the streaming batch prediction endpoint
+BATCH_PREDICT_CHUNK_SIZE = 10000
+
+# Prediction logging: buffered in memory and written by a background thread
+PREDICTION_LOG_BACKEND = 'db'  # 'db', 'file' (rotating NDJSON) or 'none'
+PREDICTION_LOG_SAMPLE_RATE = 1.0
+PREDICTION_LOG_MAX_ROWS = 100  # rows of input/predictions kept per logged call
+PREDICTION_LOG_MODEL_OVERRIDES = {}  # {'<model_id>': {'sample_rate': 0.1, 'max_rows': 10}}
+PREDICTION_LOG_BUFFER_SIZE = 10000
+PREDICTION_LOG_BATCH_SIZE = 500
+PREDICTION_LOG_FLUSH_INTERVAL = 2.0  # seconds
+PREDICTION_LOG_DIR = BASE_DIR / 'prediction_logs'
+PREDICTION_LOG_FILE_MAX_BYTES = 100 * 1024 * 1024
+PREDICTION_LOG_FILE_BACKUP_COUNT = 5
+
+# Micro-batching of single-row predictions, opt-in per model id ('*' for every model),
+# e.g. {'<model_id>': {'window_ms': 2, 'max_batch_size': 64}}
+MICRO_BATCH_MODELS = {}
+MICRO_BATCH_WINDOW_MS = 2
+MICRO_BATCH_MAX_SIZE = 64
+# How long a caller waits for its prediction once its batch window has closed before giving up with a 503.
+MICRO_BATCH_TIMEOUT_MS = 5000
+
+# Async endpoints (api/async/, under ASGI): profiling runs in a process pool, predictions and
+# file I/O in a thread pool; once workers + queue depth tasks are in flight requests get a 429
+ASYNC_CPU_WORKERS = 2
+ASYNC_CPU_QUEUE_DEPTH = 4
+ASYNC_THREAD_WORKERS = 8
+ASYNC_THREAD_QUEUE_DEPTH = 32
+ASYNC_RETRY_AFTER = 1  # seconds, sent in the 429's Retry-After header
+
+# Cache for profile and summary payloads: 'locmem' is per process, 'file' is shared by all workers
+RESPONSE_CACHE_BACKEND = 'locmem'
+RESPONSE_CACHE_TIMEOUT = 3600  # seconds
+CACHES = {
+    'default': {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'responses',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'response_cache',
+        },
+    }[RESPONSE_CACHE_BACKEND],
+}
+
+# Loaded models, encoders and preprocessing plans kept in memory per worker
+MODEL_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+
+# Models loaded into the cache when a server process starts, before /api/health/ reports ready:
+# the pinned ones plus the most recently used. manage.py warm_models does the same on demand.
+MODEL_WARMUP_ON_STARTUP = True
+MODEL_WARMUP_RECENT = 10
+MODEL_WARMUP_THREADS = 4
+MODEL_WARMUP_DUMMY_INFERENCE = True  # score one all-missing row so lazy initialization happens up front
+
+# Artifact storage: model files live in sharded directories under ARTIFACT_ROOT and every stored file
+# is tracked with its size. Over a quota the least recently used go first: a session's models, then
+# whole sessions. manage.py gc_artifacts also expires idle sessions and removes orphaned files.
+ARTIFACT_ROOT = '/app/artifacts'
+ARTIFACT_SESSION_QUOTA = 5 * 1024 * 1024 * 1024  # 5GB; only models are evicted, never the upload itself
+ARTIFACT_GLOBAL_QUOTA = 100 * 1024 * 1024 * 1024  # 100GB
+ARTIFACT_TTL = 30 * 24 * 3600  # seconds a session may go unused; None keeps sessions indefinitely
+ARTIFACT_GC_GRACE = 3600  # seconds an unreferenced file is kept, so writes in progress are not collected
+ARTIFACT_TOUCH_INTERVAL = 300  # seconds between last-used updates of one session or model per worker
+
+# Model artifacts: 0 writes them uncompressed so workers memory-map and share one copy;
+# 1-9 compresses them for cold storage (each worker then loads its own copy)
+MODEL_ARTIFACT_COMPRESS = 0
+
+# How forests are scored: 'numpy' (vectorized over rows and trees), 'numba' (JIT, if installed),
+# 'sklearn' (the unpickled estimator) or 'auto' (numba when available, else numpy)
+FOREST_INFERENCE_BACKEND = 'auto'
+
+# Background training jobs run in a local process pool, no broker needed
+TRAINING_JOB_WORKERS = 2
+TRAINING_JOB_QUEUE_DEPTH = 8  # jobs allowed to wait for a free worker
+
+# AutoML model search, run inside each training job
+AUTOML_TIME_BUDGET = 60  # seconds when the request sets none; 0 fits the default random forest
+AUTOML_MAX_TIME_BUDGET = 600
+AUTOML_CANDIDATES = ['random_forest', 'hist_gradient_boosting', 'linear', 'xgboost']  # xgboost only if installed
+AUTOML_WORKERS = None  # processes evaluating candidates, kept between searches; None = one per CPU
+AUTOML_HALVING_FACTOR = 3
+AUTOML_MIN_ROWS = 200  # rows per candidate in the first round
+AUTOML_N_JOBS = -1  # cores for the final refit
+AUTOML_TEMP_DIR = None  # where the shared feature matrix is memory-mapped from
+
+# CSV reads typed from the stored profile: numerical (float) columns are parsed to this dtype,
+# None keeps float64. The target column always keeps full precision.
+CSV_FLOAT_DTYPE = 'float32'
+
+# Retraining after rows are appended (POST /api/append/<session>/ with a model_id): warm_start adds
+# this many trees to a random forest, fitted on the new rows (other models get a window refit);
+# window refits on the newest rows
+RETRAIN_WARM_START_ESTIMATORS = 50
+RETRAIN_WINDOW_ROWS = None  # rows a window refit uses when the request sets none; None = all rows
+
+# Uploads larger than this are trained in streaming passes with SGD instead of in memory
+OUT_OF_CORE_THRESHOLD_BYTES = 1024 * 1024 * 1024  # 1GB
+OUT_OF_CORE_CHUNK_SIZE = 50000
+OUT_OF_CORE_EPOCHS = 1
+OUT_OF_CORE_MAX_CATEGORIES = 1000  # text columns with more distinct values are left out
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React dev server
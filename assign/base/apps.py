@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'base'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .utils.warmup import model_warmup, warm_on_startup
+
+        if warm_on_startup():
+            model_warmup.start()
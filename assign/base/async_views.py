@@ -0,0 +1,189 @@
+"""Async versions of the upload, profile, predict and summary endpoints, served under ``api/async/``.
+
+They are meant for the ASGI entry point: ORM access uses the async query API,
+and pandas/sklearn work runs in the bounded pools from ``utils.executors``
+rather than on the event loop. When a pool is full the request gets a 429
+with a Retry-After header instead of queueing behind the others.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import FileUpload, TrainedModel
+from .serializers import ProfileSerializer
+from .utils.artifact_storage import enforce_quotas, record_upload, touch
+from .utils.blob_store import store_upload, delete_blob, reusable_session
+from .utils.data_profiling import profile_upload
+from .utils.profile_store import save_profile, copy_profile, page_options, profile_page
+from .utils.columnar_cache import delete_columnar_cache
+from .utils.executors import Saturated, cpu_executor, thread_executor
+from .utils.insights import generate_insights
+from .utils.metrics import registry, stats_gauges
+from .utils.micro_batching import BatchTimeout, micro_batcher, single_row
+from .utils.ml_pipeline import predict
+from .utils.prediction_log import prediction_log
+from .utils.response_cache import aconditional_response, cached_payload
+
+
+def _busy(error):
+    response = JsonResponse({'error': str(error)}, status=429)
+    response['Retry-After'] = str(getattr(settings, 'ASYNC_RETRY_AFTER', 1))
+    return response
+
+
+def _uploaded_file(request):
+    # Parsing the multipart body reads and writes temporary files.
+    return request.FILES.get('file')
+
+
+async def _register_upload(file_name, content_hash, created):
+    """``views._register_upload`` with the ORM calls awaited and profiling in the CPU pool."""
+    file_obj = await FileUpload.objects.acreate(file=file_name, content_hash=content_hash)
+    columnar_cache = None
+    try:
+        previous = await sync_to_async(reusable_session)(content_hash)
+        if previous is not None:
+            await sync_to_async(copy_profile)(previous, file_obj)
+        else:
+            schema = await cpu_executor.run(profile_upload, file_obj.file.path, content_hash)
+            columnar_cache = schema['columnar_cache']
+            await sync_to_async(save_profile)(file_obj, schema)
+    except BaseException:
+        delete_columnar_cache(columnar_cache)
+        await file_obj.adelete()
+        if created:
+            delete_blob(file_name)
+        raise
+    await sync_to_async(record_upload)(file_obj)
+    await sync_to_async(enforce_quotas)(file_obj)
+    return file_obj
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncUploadFileView(View):
+    async def post(self, request):
+        try:
+            uploaded = await thread_executor.run(_uploaded_file, request)
+            if uploaded is None:
+                return JsonResponse({'file': ['No file was submitted.']}, status=400)
+            file_name, content_hash, created = await thread_executor.run(store_upload, uploaded)
+            file_obj = await _register_upload(file_name, content_hash, created)
+            return JsonResponse({
+                'session_id': str(file_obj.session_id),
+                'content_hash': content_hash,
+                'deduplicated': not created,
+            }, status=201)
+        except Saturated as e:
+            return _busy(e)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+
+class AsyncProfileDataView(View):
+    async def get(self, request, session_id):
+        not_modified, headers = await aconditional_response(request, FileUpload, 'session_id', session_id)
+        if not_modified is not None:
+            return not_modified
+        try:
+            file_obj = await FileUpload.objects.aget(session_id=session_id)
+        except (FileUpload.DoesNotExist, ValidationError):
+            return JsonResponse({'error': 'Session not found'}, status=404)
+        await sync_to_async(touch)(file_obj)
+        try:
+            if request.GET:
+                options = page_options(request.GET)
+                payload = await sync_to_async(lambda: ProfileSerializer(profile_page(file_obj, **options)).data)()
+            else:
+                payload = await sync_to_async(cached_payload)(
+                    'profile', file_obj.session_id, file_obj.updated_at,
+                    lambda: ProfileSerializer(profile_page(file_obj)).data,
+                )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        response = JsonResponse(payload)
+        for name, value in headers.items():
+            response[name] = value
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncPredictView(View):
+    async def post(self, request, model_id):
+        try:
+            model_obj = await TrainedModel.objects.only(*TrainedModel.SERVING_FIELDS).aget(model_id=model_id)
+            await sync_to_async(touch)(model_obj)
+            try:
+                input_data = json.loads(request.body or b'{}').get('input_data')
+            except (ValueError, AttributeError):
+                return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+            if not input_data:
+                return JsonResponse({'error': 'No input data provided'}, status=400)
+            if not isinstance(input_data, (list, dict)):
+                return JsonResponse({'error': 'Input data must be a JSON object or array'}, status=400)
+
+            record = single_row(input_data)
+            batcher = micro_batcher.batcher_for(model_obj) if record is not None else None
+            if batcher is not None:
+                # The batcher's own thread does the work; wait for it without holding a pool thread.
+                future = batcher.submit(record)
+                try:
+                    predictions = [await asyncio.wait_for(asyncio.wrap_future(future), batcher.timeout)]
+                except asyncio.TimeoutError:
+                    raise batcher.timed_out(future) from None
+            else:
+                predictions = await thread_executor.run(
+                    predict, model_obj.model_path, model_obj.preprocessing_steps, input_data, model_id=model_obj.model_id,
+                )
+            prediction_id = prediction_log.log(model_obj, input_data, predictions)
+            return JsonResponse({'prediction_id': prediction_id, 'predictions': predictions})
+        except TrainedModel.DoesNotExist:
+            return JsonResponse({'error': 'Model not found'}, status=404)
+        except Saturated as e:
+            return _busy(e)
+        except BatchTimeout as e:
+            return JsonResponse({'error': str(e)}, status=503)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+
+class AsyncSummaryView(View):
+    async def get(self, request, model_id):
+        not_modified, headers = await aconditional_response(request, TrainedModel, 'model_id', model_id)
+        if not_modified is not None:
+            return not_modified
+        try:
+            model_obj = await TrainedModel.objects.aget(model_id=model_id)
+            await sync_to_async(touch)(model_obj)
+            if model_obj.insights is None:
+                # Models trained before insights were stored: compute once and keep them.
+                model_obj.insights = generate_insights(model_obj.target_column, model_obj.metrics, model_obj.feature_importance)
+                await model_obj.asave(update_fields=['insights', 'updated_at'])
+            payload = await sync_to_async(cached_payload, thread_sensitive=False)(
+                'summary', model_obj.model_id, model_obj.updated_at,
+                lambda: {'model_id': model_id, 'insights': model_obj.insights},
+            )
+            response = JsonResponse(payload)
+            for name, value in headers.items():
+                response[name] = value
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        except (TrainedModel.DoesNotExist, ValidationError):
+            return JsonResponse({'error': 'Model not found'}, status=404)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+
+registry.register_collector(lambda: [
+    gauge
+    for executor in (cpu_executor, thread_executor)
+    for gauge in stats_gauges('async_executor', 'Bounded async offload pool state.', executor.stats(), pool=executor.name)
+])
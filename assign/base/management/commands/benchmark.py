@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from base.utils.benchmarking import CASES, SIZES, compare, load_results, run_benchmarks, save_results
+
+
+def _format_bytes(value):
+    return f'{value / (1024 * 1024):.1f}MB'
+
+
+class Command(BaseCommand):
+    help = "Benchmark the profiling and ML pipeline functions on synthetic CSVs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--case', action='append', dest='cases', choices=sorted(CASES),
+                            help="Benchmark to run; repeat for several. Defaults to all.")
+        parser.add_argument('--size', action='append', dest='sizes', choices=list(SIZES),
+                            help="Dataset size; repeat for several. Defaults to small and medium.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark.")
+        parser.add_argument('--null-rate', type=float, default=0.05)
+        parser.add_argument('--datetime-cols', type=int, default=1)
+        parser.add_argument('--save', metavar='PATH', help="Write the results as a JSON baseline.")
+        parser.add_argument('--compare', metavar='PATH', help="Compare the results with a saved baseline.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Relative increase over the baseline reported as a regression.")
+
+    def handle(self, *args, **options):
+        def log(key, result):
+            self.stdout.write(
+                f"{key:40s} {result['wall_seconds'] * 1000:10.2f}ms "
+                f"rss {_format_bytes(result['peak_rss_bytes']):>9s} "
+                f"alloc {_format_bytes(result['tracemalloc_peak_bytes']):>9s}"
+            )
+
+        try:
+            results = run_benchmarks(
+                cases=options['cases'],
+                sizes=options['sizes'],
+                repeat=options['repeat'],
+                null_rate=options['null_rate'],
+                datetime_cols=options['datetime_cols'],
+                log=log,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['save']:
+            save_results(results, options['save'])
+            self.stdout.write(f"Saved results to {options['save']}")
+
+        if options['compare']:
+            rows = compare(results, load_results(options['compare']), options['threshold'])
+            regressions = [row for row in rows if row['regression']]
+            for row in rows:
+                line = f"{row['benchmark']:40s} {row['metric']:24s} x{row['ratio']:.2f}"
+                self.stdout.write(self.style.ERROR(line + '  REGRESSION') if row['regression'] else line)
+            if regressions:
+                raise CommandError(f"{len(regressions)} metric(s) regressed by more than {options['threshold']:.0%}")
+            self.stdout.write(self.style.SUCCESS("No regressions"))
@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from base.models import TrainedModel
+from base.utils.artifact_storage import record_model
+from base.utils.artifacts import compress_level, convert_model_artifacts
+
+
+class Command(BaseCommand):
+    help = "Rewrite existing model artifacts in the memory-mappable layout, or at a compression level for cold storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', action='append', dest='model_ids',
+                            help="Model to convert; repeat for several. Defaults to all.")
+        parser.add_argument('--compress', type=int, choices=range(10), default=None,
+                            help="joblib compression level; 0 keeps artifacts memory-mappable. Defaults to MODEL_ARTIFACT_COMPRESS.")
+        parser.add_argument('--dry-run', action='store_true', help="List the models that would be converted.")
+
+    def handle(self, *args, **options):
+        compress = compress_level() if options['compress'] is None else options['compress']
+        models = TrainedModel.objects.order_by('created_at')
+        if options['model_ids']:
+            models = models.filter(model_id__in=options['model_ids'])
+
+        converted = failed = 0
+        for trained_model in models.iterator():
+            if not os.path.exists(trained_model.model_path):
+                self.stdout.write(self.style.WARNING(f"{trained_model.model_id}: missing {trained_model.model_path}"))
+                failed += 1
+                continue
+            if options['dry_run']:
+                self.stdout.write(f"{trained_model.model_id}: {trained_model.model_path}")
+                continue
+            try:
+                paths = convert_model_artifacts(trained_model.model_path, compress)
+                record_model(trained_model)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"{trained_model.model_id}: {e}"))
+                failed += 1
+                continue
+            size = sum(os.path.getsize(path) for path in paths)
+            self.stdout.write(f"{trained_model.model_id}: {len(paths)} file(s), {size / (1024 * 1024):.1f}MB")
+            converted += 1
+
+        if failed:
+            raise CommandError(f"Converted {converted} model(s), {failed} failed")
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} model(s) at compression level {compress}"))
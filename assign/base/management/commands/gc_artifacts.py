@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from base.models import FileUpload
+from base.utils.artifact_storage import (
+    evict_session_models, evict_sessions, expire_chunked_uploads, expire_sessions, reconcile, total_usage,
+)
+from base.utils.training_jobs import fail_orphaned_jobs
+
+
+def _mb(size):
+    return f"{size / (1024 * 1024):.1f}MB"
+
+
+class Command(BaseCommand):
+    help = ("Fail training jobs left behind by exited processes, expire idle sessions and stale "
+            "resumable uploads, enforce the artifact quotas, and reconcile the files on disk with the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be removed without removing it.")
+        parser.add_argument('--no-evict', action='store_true',
+                            help="Only reconcile files and rows; skip TTL expiry and quota eviction.")
+        parser.add_argument('--grace', type=int, default=None,
+                            help="Seconds an unreferenced file is left alone. Defaults to ARTIFACT_GC_GRACE.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        prefix = "Would remove" if dry_run else "Removed"
+
+        # Before eviction: a session with a job in flight is never evicted.
+        orphans = fail_orphaned_jobs(dry_run=dry_run)
+        self.stdout.write(f"{'Would fail' if dry_run else 'Failed'} {len(orphans)} training job(s) whose process exited")
+
+        stale_uploads = expire_chunked_uploads(dry_run=dry_run)
+        self.stdout.write(f"{prefix} {len(stale_uploads)} stale resumable upload(s)")
+
+        if not options['no_evict']:
+            expired = expire_sessions(dry_run=dry_run)
+            self.stdout.write(f"{prefix} {len(expired)} session(s) past ARTIFACT_TTL")
+            models = []
+            for file_obj in FileUpload.objects.only('id', 'session_id', 'file', 'metadata').iterator():
+                models += evict_session_models(file_obj, dry_run=dry_run)
+            self.stdout.write(f"{prefix} {len(models)} model(s) over ARTIFACT_SESSION_QUOTA")
+            sessions = evict_sessions(dry_run=dry_run)
+            self.stdout.write(f"{prefix} {len(sessions)} session(s) over ARTIFACT_GLOBAL_QUOTA")
+
+        result = reconcile(grace=options['grace'], dry_run=dry_run)
+        self.stdout.write(f"{prefix} {result['orphans']} orphaned file(s), {_mb(result['orphan_bytes'])}")
+        self.stdout.write(
+            f"Artifact rows: {result['created_rows']} added, {result['stale_rows']} dropped, {result['resized_rows']} resized"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Tracked artifacts: {_mb(total_usage())}"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from base.utils.warmup import model_warmup, warmup_candidates
+
+
+class Command(BaseCommand):
+    help = ("Load the pinned and most recently used models and score a dummy row with each. Run it before "
+            "starting workers to pull memory-mapped artifacts into the page cache and fill the JIT cache.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', action='append', dest='model_ids',
+                            help="Model to warm; repeat for several. Replaces the pinned and recent selection.")
+        parser.add_argument('--recent', type=int, default=None,
+                            help="How many of the most recently used models to warm. Defaults to MODEL_WARMUP_RECENT.")
+        parser.add_argument('--no-pinned', action='store_true', help="Leave pinned models out unless they are recent.")
+        parser.add_argument('--threads', type=int, default=None, help="Defaults to MODEL_WARMUP_THREADS.")
+        parser.add_argument('--no-dummy', action='store_true', help="Only load the models; skip the dummy inference.")
+
+    def handle(self, *args, **options):
+        models = warmup_candidates(recent=options['recent'], pinned=not options['no_pinned'], model_ids=options['model_ids'])
+        if options['model_ids'] and len(models) < len(options['model_ids']):
+            found = {str(m.model_id) for m in models}
+            raise CommandError(f"Unknown model(s): {', '.join(m for m in options['model_ids'] if m not in found)}")
+
+        stats = model_warmup.run(models, threads=options['threads'], dummy_inference=False if options['no_dummy'] else None)
+        for model_id, error in stats['errors'].items():
+            self.stdout.write(self.style.WARNING(f"{model_id}: {error}"))
+        message = f"Warmed {stats['loaded']} of {stats['total']} model(s) in {stats['seconds']:.2f}s"
+        self.stdout.write(self.style.SUCCESS(message) if not stats['failed'] else self.style.WARNING(message))
@@ -0,0 +1,42 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .utils.metrics import request_duration, requests_total
+
+
+class RequestMetricsMiddleware:
+    """Counts requests and records their latency, labelled by URL route rather than raw path.
+
+    Works in both sync and async chains, so async views under ASGI are not
+    pushed back onto a thread by this middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - start)
+        return response
+
+    def _record(self, request, response, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        # Streaming responses are timed until the first byte is ready, not until the body is sent.
+        endpoint = match.route if match is not None else 'unmatched'
+        request_duration.observe(elapsed, endpoint=endpoint, method=request.method)
+        requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
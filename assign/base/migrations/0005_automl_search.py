@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0004_trainingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainedmodel',
+            name='search_results',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='time_budget',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0005_automl_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainedmodel',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0006_trainedmodel_stage_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainedmodel',
+            name='training_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='reused',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0009_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainedmodel',
+            name='leakage',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+ROW_KEYS = ('columns', 'correlations', 'imbalanced_columns')
+
+
+def split_profiles(apps, schema_editor):
+    # A frozen copy of profile_store.split_schema: move per-column stats and correlations out of metadata.
+    FileUpload = apps.get_model('base', 'FileUpload')
+    ColumnProfile = apps.get_model('base', 'ColumnProfile')
+    ColumnCorrelation = apps.get_model('base', 'ColumnCorrelation')
+    for file_obj in FileUpload.objects.filter(metadata__isnull=False).iterator():
+        schema = file_obj.metadata
+        if 'columns' not in schema:
+            continue
+        imbalanced = schema.get('imbalanced_columns') or {}
+        columns = []
+        for position, col in enumerate(schema['columns']):
+            stats = {key: value for key, value in col.items() if key not in ('name', 'type')}
+            if col['name'] in imbalanced:
+                stats['value_frequencies'] = imbalanced[col['name']]
+            columns.append(ColumnProfile(session=file_obj, position=position, name=str(col['name']), type=col['type'], stats=stats))
+        # Older profiles stored a full matrix; only the pair list format is carried over.
+        pairs = schema.get('correlations') if isinstance(schema.get('correlations'), list) else []
+        correlations = [
+            ColumnCorrelation(session=file_obj, column_a=str(pair['columns'][0]), column_b=str(pair['columns'][1]),
+                              correlation=pair['correlation'], strength=abs(pair['correlation']))
+            for pair in pairs
+        ]
+        ColumnProfile.objects.bulk_create(columns, batch_size=500)
+        ColumnCorrelation.objects.bulk_create(correlations, batch_size=500)
+        metadata = {key: value for key, value in schema.items() if key not in ROW_KEYS}
+        metadata['column_count'] = len(columns)
+        metadata['correlation_count'] = len(correlations)
+        FileUpload.objects.filter(pk=file_obj.pk).update(metadata=metadata)
+
+
+def join_profiles(apps, schema_editor):
+    FileUpload = apps.get_model('base', 'FileUpload')
+    for file_obj in FileUpload.objects.filter(metadata__isnull=False).iterator():
+        schema = {key: value for key, value in file_obj.metadata.items() if key not in ('column_count', 'correlation_count')}
+        schema['columns'] = []
+        schema['imbalanced_columns'] = {}
+        for column in file_obj.column_profiles.order_by('position'):
+            stats = dict(column.stats)
+            frequencies = stats.pop('value_frequencies', None)
+            if frequencies is not None:
+                schema['imbalanced_columns'][column.name] = frequencies
+            schema['columns'].append({'name': column.name, 'type': column.type, **stats})
+        pairs = file_obj.correlations.order_by('-strength', 'id')
+        if pairs.exists():
+            schema['correlations'] = [{'columns': [pair.column_a, pair.column_b], 'correlation': pair.correlation} for pair in pairs]
+        FileUpload.objects.filter(pk=file_obj.pk).update(metadata=schema)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_trainedmodel_leakage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColumnCorrelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('column_a', models.CharField(max_length=255)),
+                ('column_b', models.CharField(max_length=255)),
+                ('correlation', models.FloatField()),
+                ('strength', models.FloatField()),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='correlations', to='base.fileupload')),
+            ],
+            options={
+                'ordering': ['-strength', 'id'],
+                'indexes': [models.Index(fields=['session', '-strength'], name='base_column_session_067ad6_idx'), models.Index(fields=['session', 'column_a'], name='base_column_session_a2b8c1_idx'), models.Index(fields=['session', 'column_b'], name='base_column_session_5d991e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ColumnProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('type', models.CharField(blank=True, db_index=True, max_length=20, null=True)),
+                ('stats', models.JSONField(blank=True, default=dict)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='column_profiles', to='base.fileupload')),
+            ],
+            options={
+                'ordering': ['position'],
+                'indexes': [models.Index(fields=['session', 'name'], name='base_column_session_3fb840_idx')],
+                'constraints': [models.UniqueConstraint(fields=('session', 'position'), name='unique_column_position')],
+            },
+        ),
+        migrations.RunPython(split_profiles, join_profiles),
+    ]
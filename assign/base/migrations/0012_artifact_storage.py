@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def seed_last_used(apps, schema_editor):
+    # Best available guess for existing rows: when they last changed.
+    for name in ('FileUpload', 'TrainedModel'):
+        apps.get_model('base', name).objects.update(last_used_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0011_column_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='last_used_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='trainedmodel',
+            name='last_used_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='Artifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1000, unique=True)),
+                ('kind', models.CharField(choices=[('upload', 'Upload'), ('columnar', 'Columnar cache'), ('model', 'Model')], db_index=True, max_length=20)),
+                ('size', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trained_model', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='artifacts', to='base.trainedmodel')),
+            ],
+        ),
+        migrations.RunPython(seed_last_used, migrations.RunPython.noop),
+    ]
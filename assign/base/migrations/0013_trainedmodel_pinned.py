@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0012_artifact_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainedmodel',
+            name='pinned',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
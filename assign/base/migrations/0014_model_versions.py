@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_trainedmodel_pinned'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainedmodel',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versions', to='base.trainedmodel'),
+        ),
+        migrations.AddField(
+            model_name='trainedmodel',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='parent_model',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='retrain_jobs', to='base.trainedmodel'),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='retrain_strategy',
+            field=models.CharField(blank=True, choices=[('warm_start', 'Warm start'), ('window', 'Sliding window')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='window_rows',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
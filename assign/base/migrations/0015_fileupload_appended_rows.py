@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0014_model_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='appended_rows',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:13
+
+import base.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0015_fileupload_appended_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='owner',
+            field=models.CharField(blank=True, default=base.models.process_owner, max_length=255),
+        ),
+    ]
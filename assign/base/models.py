@@ -1,17 +1,94 @@
 from django.db import models
+from django.utils import timezone
+import os
+import socket
 import uuid
 
+
+def process_owner():
+    """``host:pid`` of this process, recorded on the training jobs its executor runs."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
 class FileUpload(models.Model):
     session_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     file = models.FileField(upload_to='uploads/')
-    metadata = models.JSONField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)  # sha256 of the file
+    metadata = models.JSONField(null=True, blank=True)  # table-level profile; columns live in ColumnProfile
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)  # for LRU/TTL eviction
+    appended_rows = models.PositiveIntegerField(null=True, blank=True)  # rows the last append added, what a warm start fits on
 
     def __str__(self):
         return str(self.session_id)
 
 
+class ColumnProfile(models.Model):
+    session = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='column_profiles')
+    position = models.PositiveIntegerField()  # column order in the file
+    name = models.CharField(max_length=255)
+    type = models.CharField(max_length=20, null=True, blank=True, db_index=True)
+    stats = models.JSONField(default=dict, blank=True)  # counts, flags, outliers, skewness, value frequencies
+
+    class Meta:
+        ordering = ['position']
+        constraints = [models.UniqueConstraint(fields=['session', 'position'], name='unique_column_position')]
+        indexes = [models.Index(fields=['session', 'name'])]
+
+    def __str__(self):
+        return self.name
+
+
+class ColumnCorrelation(models.Model):
+    session = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='correlations')
+    column_a = models.CharField(max_length=255)
+    column_b = models.CharField(max_length=255)
+    correlation = models.FloatField()
+    strength = models.FloatField()  # |correlation|, for ordering
+
+    class Meta:
+        ordering = ['-strength', 'id']
+        indexes = [
+            models.Index(fields=['session', '-strength']),
+            models.Index(fields=['session', 'column_a']),
+            models.Index(fields=['session', 'column_b']),
+        ]
+
+    def __str__(self):
+        return f'{self.column_a} ~ {self.column_b}'
+
+
+class ChunkedUpload(models.Model):
+    STATUS_ACTIVE = 'active'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    upload_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(null=True, blank=True)  # bytes, if the client announced it
+    offset = models.BigIntegerField(default=0)  # bytes received and written so far
+    crc32 = models.BigIntegerField(default=0)  # running CRC32 of the received bytes
+    dialect = models.JSONField(null=True, blank=True)  # sniffed from the first chunk
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    error = models.TextField(null=True, blank=True)
+    session = models.ForeignKey(FileUpload, on_delete=models.SET_NULL, null=True, blank=True, related_name='chunked_uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.upload_id)
+
+
 class TrainedModel(models.Model):
+    # What scoring reads; loading only these leaves the metrics, search results and insights JSON behind.
+    SERVING_FIELDS = ('model_id', 'model_path', 'preprocessing_steps')
+
     model_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     session = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='models')
     model_path = models.CharField(max_length=1000)
@@ -19,7 +96,17 @@ class TrainedModel(models.Model):
     metrics = models.JSONField()
     feature_importance = models.JSONField(null=True, blank=True)
     preprocessing_steps = models.JSONField(null=True, blank=True)  # Store encoder details
+    search_results = models.JSONField(null=True, blank=True)  # AutoML leaderboard and chosen candidate
+    stage_timings = models.JSONField(default=dict, blank=True)  # seconds per training stage
+    training_key = models.CharField(max_length=64, null=True, blank=True, db_index=True)  # content hash + training config
+    insights = models.JSONField(null=True, blank=True)  # precomputed at training time for SummaryView
+    leakage = models.JSONField(default=list, blank=True)  # columns that predict the target suspiciously well
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)  # for LRU eviction
+    pinned = models.BooleanField(default=False, db_index=True)  # always warmed at startup, never evicted
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='versions')  # model this one was retrained from
+    version = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return str(self.model_id)
@@ -32,4 +119,65 @@ class Prediction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return str(self.prediction_id)
\ No newline at end of file
+        return str(self.prediction_id)
+
+class TrainingJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    # Retraining a parent model: add estimators fitted on the newest rows, or refit on them from scratch.
+    RETRAIN_WARM_START = 'warm_start'
+    RETRAIN_WINDOW = 'window'
+    RETRAIN_CHOICES = [
+        (RETRAIN_WARM_START, 'Warm start'),
+        (RETRAIN_WINDOW, 'Sliding window'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    session = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='training_jobs')
+    target_column = models.CharField(max_length=255, null=True, blank=True)
+    time_budget = models.FloatField(null=True, blank=True)  # seconds for the model search, None = AUTOML_TIME_BUDGET
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    timings = models.JSONField(default=dict, blank=True)
+    error = models.TextField(null=True, blank=True)
+    trained_model = models.ForeignKey(TrainedModel, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    reused = models.BooleanField(default=False)  # answered with an existing model instead of training
+    parent_model = models.ForeignKey(TrainedModel, on_delete=models.SET_NULL, null=True, blank=True, related_name='retrain_jobs')
+    retrain_strategy = models.CharField(max_length=20, choices=RETRAIN_CHOICES, blank=True, default='')  # with parent_model
+    window_rows = models.PositiveIntegerField(null=True, blank=True)  # train on this many rows from the end, None = all
+    owner = models.CharField(max_length=255, default=process_owner, blank=True)  # process whose executor runs the job
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return str(self.job_id)
+
+
+class Artifact(models.Model):
+    """A file or directory kept on disk for a session or model, with its size for quotas."""
+    KIND_UPLOAD = 'upload'
+    KIND_COLUMNAR = 'columnar'
+    KIND_MODEL = 'model'
+    KIND_CHOICES = [
+        (KIND_UPLOAD, 'Upload'),
+        (KIND_COLUMNAR, 'Columnar cache'),
+        (KIND_MODEL, 'Model'),
+    ]
+
+    path = models.CharField(max_length=1000, unique=True)  # absolute
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, db_index=True)
+    size = models.BigIntegerField(default=0)  # bytes; a directory's files summed
+    trained_model = models.ForeignKey(TrainedModel, on_delete=models.CASCADE, null=True, blank=True, related_name='artifacts')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.path
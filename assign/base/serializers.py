@@ -1,14 +1,23 @@
 from rest_framework import serializers
-from .models import FileUpload, TrainedModel, Prediction
+from .models import FileUpload, ChunkedUpload, TrainedModel, Prediction, TrainingJob
 
 class FileUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = FileUpload
         fields = ['session_id', 'file']
 
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    session_id = serializers.UUIDField(source='session.session_id', read_only=True, default=None)
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['upload_id', 'filename', 'total_size', 'offset', 'crc32', 'dialect', 'status', 'error',
+                  'session_id', 'created_at', 'updated_at']
+
 class ProfileSerializer(serializers.Serializer):
     session_id = serializers.UUIDField()
     metadata = serializers.JSONField()
+    pagination = serializers.JSONField()
 
 class TrainModelSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,4 +27,20 @@ class TrainModelSerializer(serializers.ModelSerializer):
 class PredictionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Prediction
-        fields = ['prediction_id', 'predictions']
\ No newline at end of file
+        fields = ['prediction_id', 'predictions']
+
+class TrainingJobSerializer(serializers.ModelSerializer):
+    session_id = serializers.UUIDField(source='session.session_id', read_only=True)
+    model_id = serializers.UUIDField(source='trained_model.model_id', read_only=True, default=None)
+    metrics = serializers.JSONField(source='trained_model.metrics', read_only=True, default=None)
+    feature_importance = serializers.JSONField(source='trained_model.feature_importance', read_only=True, default=None)
+    search_results = serializers.JSONField(source='trained_model.search_results', read_only=True, default=None)
+    stage_timings = serializers.JSONField(source='trained_model.stage_timings', read_only=True, default=None)
+    leakage = serializers.JSONField(source='trained_model.leakage', read_only=True, default=None)
+    version = serializers.IntegerField(source='trained_model.version', read_only=True, default=None)
+    parent_model_id = serializers.UUIDField(source='parent_model.model_id', read_only=True, default=None)
+
+    class Meta:
+        model = TrainingJob
+        fields = ['job_id', 'session_id', 'target_column', 'time_budget', 'status', 'reused', 'timings', 'error',
+                  'parent_model_id', 'retrain_strategy', 'window_rows', 'version', 'model_id', 'metrics', 'feature_importance', 'search_results', 'stage_timings', 'leakage', 'created_at', 'started_at', 'finished_at']
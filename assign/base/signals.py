@@ -0,0 +1,30 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FileUpload, TrainedModel
+from .utils.artifact_storage import release_model, release_upload
+from .utils.response_cache import invalidate
+
+
+@receiver([post_save, post_delete], sender=FileUpload)
+def invalidate_profile(sender, instance, **kwargs):
+    invalidate('profile', instance.session_id)
+
+
+@receiver([post_save, post_delete], sender=TrainedModel)
+def invalidate_summary(sender, instance, **kwargs):
+    invalidate('summary', instance.model_id)
+
+
+@receiver(post_delete, sender=FileUpload)
+def remove_upload_files(sender, instance, **kwargs):
+    # After commit, so a rolled back delete keeps its files.
+    transaction.on_commit(partial(release_upload, instance.file.name, instance.metadata))
+
+
+@receiver(post_delete, sender=TrainedModel)
+def remove_model_files(sender, instance, **kwargs):
+    transaction.on_commit(partial(release_model, instance.model_path))
@@ -1,3 +1,1067 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .utils.data_profiling import StreamingProfiler
+from .utils.sketches import CovarianceAccumulator, FrequentItems, HyperLogLog, OnlineMoments, QuantileSketch
+
+
+class MediaTestCase(TestCase):
+    """Runs each test with uploads and artifacts in a temporary directory."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=os.path.join(self.tmp, 'media'), ARTIFACT_ROOT=os.path.join(self.tmp, 'artifacts'))
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+
+
+def sample_frame(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'amount': rng.normal(5e4, 1e4, rows),
+        'count': rng.integers(0, 50, rows),
+        'region': rng.choice(['north', 'south', 'east', 'west'], rows, p=[0.55, 0.25, 0.15, 0.05]),
+    })
+    frame['score'] = frame['amount'] * 0.002 + rng.normal(0, 5, rows)
+    frame.loc[rng.random(rows) < 0.05, 'score'] = np.nan
+    return frame
+
+
+class SketchMergeTests(SimpleTestCase):
+    """Merging per-chunk sketches must give what one pass over all the rows gives."""
+
+    def setUp(self):
+        self.frame = sample_frame()
+        self.parts = np.array_split(np.arange(len(self.frame)), [700, 1500, 2600])
+
+    def test_moments(self):
+        values = self.frame['score'].to_numpy()
+        single = OnlineMoments()
+        single.update(values)
+        merged = OnlineMoments()
+        for part in self.parts:
+            piece = OnlineMoments()
+            piece.update(values[part])
+            merged.merge(piece)
+        self.assertEqual(merged.n, single.n)
+        self.assertAlmostEqual(merged.mean, single.mean, places=9)
+        self.assertAlmostEqual(merged.variance() / single.variance(), 1.0, places=9)
+        self.assertAlmostEqual(merged.skewness(), single.skewness(), places=9)
+        self.assertEqual((merged.min, merged.max), (single.min, single.max))
+        self.assertAlmostEqual(single.skewness(), self.frame['score'].skew(), places=9)
+
+    def test_quantiles(self):
+        values = self.frame['amount'].to_numpy()
+        single = QuantileSketch(k=256)
+        single.update(values)
+        merged = QuantileSketch(k=256)
+        for part in self.parts:
+            piece = QuantileSketch(k=256)
+            piece.update(values[part])
+            merged.merge(piece)
+        self.assertEqual(merged.count(), single.count())
+        for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+            exact = np.quantile(values, q)
+            # Both are approximations; each stays within a few percent of rank of the truth.
+            for sketch in (single, merged):
+                rank = np.count_nonzero(values < sketch.quantile(q)) / len(values)
+                self.assertLess(abs(rank - q), 0.03)
+            self.assertLess(abs(merged.quantile(q) - exact) / exact, 0.02)
+
+    def test_distinct_and_frequent_values(self):
+        values = self.frame['region']
+        single, merged = HyperLogLog(12), HyperLogLog(12)
+        single.update(values)
+        single_items, merged_items = FrequentItems(), FrequentItems()
+        single_items.update(values)
+        for part in self.parts:
+            piece, piece_items = HyperLogLog(12), FrequentItems()
+            piece.update(values.iloc[part])
+            piece_items.update(values.iloc[part])
+            merged.merge(piece)
+            merged_items.merge(piece_items)
+        self.assertEqual(merged.count(), single.count())
+        self.assertEqual(merged.count(), 4)
+        self.assertEqual(merged_items.frequencies(), single_items.frequencies())
+
+    def test_distinct_count_past_exact_range(self):
+        values = np.arange(20000)
+        single, merged = HyperLogLog(12), HyperLogLog(12)
+        single.update(values)
+        for part in np.array_split(values, 4):
+            piece = HyperLogLog(12)
+            piece.update(part)
+            merged.merge(piece)
+        self.assertEqual(merged.count(), single.count())
+        self.assertLess(abs(merged.count() - 20000) / 20000, 0.05)
+
+    def test_covariance(self):
+        columns = ['amount', 'count', 'score']
+        matrix = self.frame[columns]
+        single = CovarianceAccumulator(columns, block_size=2)
+        single.update(matrix)
+        merged = CovarianceAccumulator(columns, block_size=2)
+        for part in self.parts:
+            piece = CovarianceAccumulator(columns, block_size=2)
+            piece.update(matrix.iloc[part])
+            merged.merge(piece)
+        expected = matrix.corr().to_numpy()
+        np.testing.assert_allclose(single.correlation(), expected, atol=1e-5)
+        np.testing.assert_allclose(merged.correlation(), expected, atol=1e-5)
+
+    def test_covariance_state(self):
+        import pickle
+
+        values = np.random.default_rng(7).normal(size=(500, 100))
+        sizes = []
+        for missing in (False, True):
+            if missing:
+                values[0, 0] = np.nan
+            accumulator = CovarianceAccumulator([f'c{i}' for i in range(100)], block_size=32)
+            accumulator.update(values)
+            state = pickle.dumps(accumulator)
+            sizes.append(len(state))
+            restored = pickle.loads(state)
+            for name in ('n', 'sx', 'sxx', 'sxy'):
+                np.testing.assert_array_equal(getattr(restored, name), getattr(accumulator, name))
+            restored.merge(accumulator)
+            np.testing.assert_allclose(restored.correlation(), accumulator.correlation(), atol=1e-6)
+        # Without missing values only the cross products are kept pairwise.
+        self.assertLess(sizes[0], 8 * 100 * 100 * 1.1)
+        self.assertGreater(sizes[1], 8 * 100 * 100 * 4)
+
+    @override_settings(PROFILER_STATE_MAX_COLUMNS=2)
+    def test_wide_profiler_state_is_not_kept(self):
+        from .utils.data_profiling import profiler_state_path, save_profiler_state
+
+        profiler = StreamingProfiler()
+        profiler.update(self.frame)
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        with self.settings(MEDIA_ROOT=tmp):
+            cache = {'path': 'cache'}
+            os.makedirs(os.path.join(tmp, 'cache'))
+            save_profiler_state(cache, profiler)
+            self.assertFalse(os.path.exists(profiler_state_path(cache)))
+            with self.settings(PROFILER_STATE_MAX_COLUMNS=3):
+                save_profiler_state(cache, profiler)
+            self.assertTrue(os.path.exists(profiler_state_path(cache)))
+
+    def test_profiler(self):
+        single = StreamingProfiler()
+        single.update(self.frame)
+        merged = StreamingProfiler()
+        for part in self.parts:
+            piece = StreamingProfiler()
+            piece.update(self.frame.iloc[part])
+            merged.merge(piece)
+        expected, actual = single.finalize(), merged.finalize()
+        self.assertEqual(actual['row_count'], expected['row_count'])
+        self.assertEqual(
+            [(col['name'], col['type'], col['unique_count'], col['null_percentage']) for col in actual['columns']],
+            [(col['name'], col['type'], col['unique_count'], col['null_percentage']) for col in expected['columns']],
+        )
+        self.assertEqual([pair['columns'] for pair in actual['correlations']], [pair['columns'] for pair in expected['correlations']])
+        self.assertEqual(actual['imbalanced_columns'], expected['imbalanced_columns'])
+
+    @override_settings(PROFILE_CHUNK_SIZE=100)
+    def test_all_null_chunks_do_not_change_the_type(self):
+        import io
+
+        from .utils.data_profiling import infer_schema_and_metadata
+
+        rows = 300
+        frame = pd.DataFrame({
+            'seen': pd.date_range('2024-01-01', periods=rows, freq='h').strftime('%Y-%m-%d %H:%M'),
+            'count': np.arange(rows),
+            'blank': [None] * rows,
+        })
+        # The first chunk has no values at all in either column, which pandas reads as float.
+        frame.loc[:99, ['seen', 'count']] = None
+        schema = infer_schema_and_metadata(io.StringIO(frame.to_csv(index=False)))
+        columns = {col['name']: col for col in schema['columns']}
+        self.assertEqual(columns['seen']['type'], 'datetime')
+        self.assertEqual(columns['seen']['datetime_format'], '%Y-%m-%d %H:%M')
+        self.assertEqual(columns['count']['type'], 'numerical')
+        self.assertEqual(columns['count']['skewness'], 0.0)
+        self.assertEqual(columns['blank']['type'], 'empty')
+
+
+class FittedPreprocessorTests(SimpleTestCase):
+    """The preprocessor must encode rows exactly as the training pipeline's imputers and encoder did."""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        rows = 400
+        self.train = pd.DataFrame({
+            'amount': rng.normal(100, 20, rows),
+            'count': rng.integers(0, 10, rows).astype(float),
+            'region': rng.choice(['north', 'south', 'east'], rows),
+            'plan': rng.choice(['basic', 'pro'], rows),
+        })
+        self.train.loc[rng.random(rows) < 0.1, 'amount'] = np.nan
+        self.train.loc[rng.random(rows) < 0.1, 'region'] = np.nan
+        # Unseen and missing categories, missing numbers and a number sent as text.
+        self.requests = pd.DataFrame({
+            'amount': [np.nan, 95.5, 120.0, 80.0],
+            'count': [3.0, np.nan, 7.0, 1.0],
+            'region': ['north', 'west', np.nan, 'east'],
+            'plan': ['pro', 'basic', 'enterprise', np.nan],
+        })
+        self.numerical_cols = ['amount', 'count']
+        self.categorical_cols = ['region', 'plan']
+
+    def fit(self, sparse):
+        from sklearn.impute import SimpleImputer
+        from sklearn.preprocessing import OneHotEncoder
+        from .utils.preprocessing import FittedPreprocessor
+
+        num_imputer = SimpleImputer(strategy='mean').fit(self.train[self.numerical_cols])
+        cat_imputer = SimpleImputer(strategy='constant', fill_value='missing').fit(self.train[self.categorical_cols])
+        encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore').fit(cat_imputer.transform(self.train[self.categorical_cols]))
+
+        def pipeline(frame):
+            numeric = num_imputer.transform(frame[self.numerical_cols])
+            encoded = encoder.transform(cat_imputer.transform(frame[self.categorical_cols]))
+            return np.hstack([numeric, encoded])
+
+        preprocessor = FittedPreprocessor.from_fitted(self.numerical_cols, num_imputer, self.categorical_cols, encoder, sparse=sparse)
+        return preprocessor, pipeline, encoder
+
+    def test_matches_training_pipeline(self):
+        preprocessor, pipeline, encoder = self.fit(sparse=False)
+        self.assertEqual(preprocessor.feature_names, self.numerical_cols + list(encoder.get_feature_names_out(self.categorical_cols)))
+        for frame in (self.train, self.requests):
+            expected = pipeline(frame)
+            np.testing.assert_allclose(preprocessor.transform_frame(frame), expected)
+            records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+            np.testing.assert_allclose(preprocessor.transform_records(records), expected)
+
+    def test_sparse_output(self):
+        preprocessor, pipeline, _ = self.fit(sparse=True)
+        expected = pipeline(self.requests)
+        np.testing.assert_allclose(preprocessor.transform_frame(self.requests).toarray(), expected)
+        np.testing.assert_allclose(preprocessor.transform(self.requests.to_dict('records')).toarray(), expected)
+
+    def test_records_are_matched_loosely(self):
+        preprocessor, pipeline, _ = self.fit(sparse=False)
+        record = {'Amount': '95.5', 'COUNT': None, 'region': 'west', 'plan': 'basic'}
+        np.testing.assert_allclose(preprocessor.transform(record), pipeline(self.requests.iloc[[1]]))
+
+    def test_datetime_parts(self):
+        from .utils.preprocessing import FittedPreprocessor
+
+        preprocessor = FittedPreprocessor(['signup_year', 'signup_month'], [2020.0, 6.0], [], [], datetime_parts={'signup': ['year', 'month']})
+        frame = pd.DataFrame({'signup': ['2023-04-05', None, 'not a date']})
+        expected = [[2023.0, 4.0], [2020.0, 6.0], [2020.0, 6.0]]
+        np.testing.assert_allclose(preprocessor.transform_frame(frame), expected)
+        np.testing.assert_allclose(preprocessor.transform_records(frame.to_dict('records')), expected)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def batcher(self, window_ms=20, max_batch_size=64):
+        from types import SimpleNamespace
+        from .utils.micro_batching import MicroBatcher
+
+        return MicroBatcher(SimpleNamespace(model_id='m', model_path='m.joblib', preprocessing_steps={}), window_ms, max_batch_size)
+
+    def test_failed_batches_fall_back_to_single_rows(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+
+        calls = []
+
+        def predict(model_path, steps, records, model_id=None):
+            failed = any(record.get('bad') for record in records)
+            calls.append((len(records), failed))
+            if failed:
+                raise ValueError('bad record')
+            return [record['x'] * 2 for record in records]
+
+        batcher = self.batcher()
+        records = [{'x': i, 'bad': i % 10 == 0} for i in range(100)]
+        with mock.patch('base.utils.micro_batching.predict', side_effect=predict):
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                futures = [pool.submit(batcher.result, record) for record in records]
+            for record, future in zip(records, futures):
+                if record['bad']:
+                    self.assertRaises(ValueError, future.result)
+                else:
+                    self.assertEqual(future.result(), record['x'] * 2)
+        # Each batch call is followed by one call per row when it failed.
+        batches = failed_batches = i = 0
+        while i < len(calls):
+            size, failed = calls[i]
+            batches += 1
+            failed_batches += failed
+            i += 1 + (size if failed else 0)
+        # The last batch's stats are recorded just after its Futures resolve.
+        deadline = time.monotonic() + 5
+        while batcher.stats()['requests'] < 100 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = batcher.stats()
+        self.assertEqual(stats['requests'], 100)
+        self.assertEqual((stats['batches'], stats['failed_batches']), (batches, failed_batches))
+        self.assertGreater(failed_batches, 0)
+
+    @override_settings(MICRO_BATCH_TIMEOUT_MS=50)
+    def test_result_times_out(self):
+        import threading
+        from unittest import mock
+        from .utils.micro_batching import BatchTimeout
+
+        release = threading.Event()
+        calls = []
+
+        def predict(model_path, steps, records, model_id=None):
+            calls.append([record['x'] for record in records])
+            release.wait(5)
+            return [record['x'] for record in records]
+
+        batcher = self.batcher(window_ms=1, max_batch_size=1)
+        with mock.patch('base.utils.micro_batching.predict', side_effect=predict):
+            first = batcher.submit({'x': 1})
+            with self.assertRaises(BatchTimeout):
+                batcher.result({'x': 2})
+            release.set()
+            self.assertEqual(first.result(timeout=5), 1)
+            self.assertEqual(batcher.result({'x': 3}), 3)
+        # The record whose caller gave up was never scored.
+        self.assertEqual(calls, [[1], [3]])
+        self.assertEqual(batcher.stats()['timeouts'], 1)
+
+
+class SuccessiveHalvingTests(SimpleTestCase):
+    def data(self, rows):
+        rng = np.random.default_rng(2)
+        X = rng.normal(size=(rows, 10))
+        return X, (X[:, 0] + rng.normal(size=rows) > 0).astype(int)
+
+    @override_settings(AUTOML_WORKERS=2)
+    def test_pool_is_reused_and_killed_at_the_deadline(self):
+        import multiprocessing
+        from .utils import automl
+
+        X, y = self.data(2000)
+        linear = [{'family': 'linear', 'params': {'C': 1.0}}, {'family': 'linear', 'params': {'C': 0.1}}]
+        best, _ = automl.successive_halving(X, y, True, 60, linear)
+        self.assertIn(best, linear)
+        pool = automl._candidate_pool()
+        automl.successive_halving(X, y, True, 60, linear)
+        self.assertIs(automl._candidate_pool(), pool)
+
+        X, y = self.data(20000)
+        slow = [{'family': 'random_forest', 'params': {'n_estimators': 5000}}, {'family': 'random_forest', 'params': {'n_estimators': 4000}}]
+        start = time.perf_counter()
+        best, summary = automl.successive_halving(X, y, True, 1, slow)
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assertIsNone(best)
+        self.assertEqual([entry['rounds'] for entry in summary['candidates']], [[], []])
+        # The candidates still fitting were killed with the pool rather than left to run on.
+        self.assertEqual(multiprocessing.active_children(), [])
+        self.assertIsNot(automl._candidate_pool(), pool)
+
+
+class OutOfCoreTrainingTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        rng = np.random.default_rng(3)
+        # Few rows for one epoch: too few SGD steps to walk an unscaled intercept out to 5e4.
+        rows = 1000
+        frame = pd.DataFrame({
+            'tenure': rng.normal(24, 8, rows),
+            'usage': rng.normal(300, 90, rows),
+            'plan': rng.choice(['basic', 'pro', 'team'], rows),
+        })
+        frame['revenue'] = 5e4 + 900 * (frame['tenure'] - 24) / 8 + 600 * (frame['plan'] == 'pro') + rng.normal(0, 300, rows)
+        self.path = os.path.join(self.tmp, 'revenue.csv')
+        frame.to_csv(self.path, index=False)
+
+    def test_regression_on_a_large_target(self):
+        from .utils.ml_pipeline import predict
+        from .utils.out_of_core import train_out_of_core
+
+        with self.settings(ARTIFACT_ROOT=self.tmp, OUT_OF_CORE_CHUNK_SIZE=250, OUT_OF_CORE_EPOCHS=1):
+            model_path, metrics, _, steps, _ = train_out_of_core(self.path, 'revenue')
+            self.assertGreater(metrics['r2'], 0.8)
+            predictions = predict(model_path, steps, [{'tenure': 24, 'usage': 300, 'plan': 'basic'}, {'tenure': 32, 'usage': 300, 'plan': 'pro'}])
+        # Predictions come back on the target's own scale.
+        self.assertLess(abs(predictions[0] - 5e4), 1000)
+        self.assertLess(abs(predictions[1] - 51500), 1000)
+
+    def test_text_target_with_a_numeric_first_chunk(self):
+        from .utils.ml_pipeline import predict
+        from .utils.out_of_core import train_out_of_core
+
+        rng = np.random.default_rng(6)
+        frame = pd.DataFrame({'usage': rng.normal(300, 90, 40), 'label': ['0', '1', '2', '1'] * 5 + ['yes', 'no'] * 10})
+        path = os.path.join(self.tmp, 'mixed.csv')
+        frame.to_csv(path, index=False)
+        with self.settings(ARTIFACT_ROOT=self.tmp, OUT_OF_CORE_CHUNK_SIZE=20):
+            model_path, metrics, _, steps, _ = train_out_of_core(path, 'label')
+            predictions = predict(model_path, steps, [{'usage': 300}])
+        self.assertIn('accuracy', metrics)
+        self.assertIn(predictions[0], {'0', '1', '2', 'yes', 'no'})
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_cases_leave_no_artifacts_behind(self):
+        from .utils.artifact_storage import artifact_root
+        from .utils.benchmarking import run_benchmarks
+
+        def files():
+            return {os.path.join(root, name) for root, _, names in os.walk(artifact_root()) for name in names}
+
+        before = files()
+        report = run_benchmarks(cases=['train_model'], sizes=['small'], repeat=1)
+        self.assertIn('train_model[small]', report['results'])
+        self.assertEqual(files(), before)
+
+
+class ChunkedUploadTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = sample_frame(rows=500).to_csv(index=False).encode()
+
+    def put(self, upload_id, start, body, end=None):
+        end = start + len(body) - 1 if end is None else end
+        return self.client.generic(
+            'PUT', f'/api/uploads/{upload_id}/', body, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(self.data)}',
+        )
+
+    def test_offset_mismatch_and_resume(self):
+        import hashlib
+
+        response = self.client.post('/api/uploads/', {'filename': 'sample.csv', 'size': len(self.data)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()['upload_id']
+
+        response = self.put(upload_id, 0, self.data[:4000])
+        self.assertEqual((response.status_code, response.json()['offset']), (200, 4000))
+        self.assertEqual(response.json()['dialect']['columns'], ['amount', 'count', 'region', 'score'])
+
+        # A chunk that skips ahead, or repeats one already stored, is refused with the offset to resume from.
+        for start in (6000, 0):
+            response = self.put(upload_id, start, self.data[start:start + 1000])
+            self.assertEqual((response.status_code, response.json()['offset']), (409, 4000))
+
+        # The connection drops halfway through a chunk: only what arrived is committed.
+        response = self.put(upload_id, 4000, self.data[4000:6000], end=7999)
+        self.assertEqual((response.status_code, response.json()['offset']), (200, 6000))
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/complete/').status_code, 409)
+
+        offset = self.client.get(f'/api/uploads/{upload_id}/').json()['offset']
+        self.assertEqual(offset, 6000)
+        response = self.put(upload_id, offset, self.data[offset:])
+        self.assertEqual((response.status_code, response.json()['offset']), (200, len(self.data)))
+
+        response = self.client.post(
+            f'/api/uploads/{upload_id}/complete/', {'sha256': hashlib.sha256(self.data).hexdigest()}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'complete')
+        profile = self.client.get(f"/api/profile/{response.json()['session_id']}/").json()
+        self.assertEqual(profile['metadata']['row_count'], 500)
+
+    def test_rejects_a_file_that_is_not_csv(self):
+        response = self.client.post('/api/uploads/', {'filename': 'sample.csv'}, format='json')
+        upload_id = response.json()['upload_id']
+        response = self.client.generic(
+            'PUT', f'/api/uploads/{upload_id}/?offset=0', b'\x00\x01binary', content_type='application/octet-stream',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}/').json()['status'], 'failed')
+
+
+class LeakageSampleTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        rng = np.random.default_rng(4)
+        rows = 10000
+        frame = pd.DataFrame({'day': np.arange(rows), 'noise': rng.normal(size=rows), 'target': rng.normal(100, 10, rows)})
+        # A column that only starts leaking the target after the first rows of a time-ordered file.
+        frame['settled'] = np.where(frame['day'] >= 2000, frame['target'] + rng.normal(0, 1, rows), np.nan)
+        self.path = os.path.join(self.tmp, 'ordered.csv')
+        frame.to_csv(self.path, index=False)
+
+    def check(self, sample):
+        from .utils.correlations import leakage_scores
+
+        self.assertLess(abs(len(sample) - 1000), 150)
+        # Drawn from the whole file, not its head.
+        self.assertGreater(sample['day'].max(), 9000)
+        self.assertTrue(sample['day'].is_monotonic_increasing)
+        self.assertEqual([result['column'] for result in leakage_scores(sample, 'target')], ['settled'])
+
+    @override_settings(LEAKAGE_SAMPLE_ROWS=1000, PROFILE_CHUNK_SIZE=1500)
+    def test_csv_sample_spans_the_file(self):
+        from .utils.correlations import read_sample
+
+        self.check(read_sample(self.path))
+        pd.testing.assert_frame_equal(read_sample(self.path, total_rows=10000), read_sample(self.path))
+
+    @override_settings(LEAKAGE_SAMPLE_ROWS=1000, PROFILE_CHUNK_SIZE=1500)
+    def test_cache_sample_spans_the_file(self):
+        from .utils.columnar_cache import build_columnar_cache
+        from .utils.correlations import read_sample
+
+        with self.settings(MEDIA_ROOT=self.tmp):
+            self.check(read_sample(self.path, build_columnar_cache(self.path, 'ordered')))
+
+
+class FlatForestTests(SimpleTestCase):
+    """The flat layout must predict exactly what the estimator it was built from predicts."""
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        X = rng.normal(size=(600, 6))
+        # Missing values in training give every split a learned side for NaNs.
+        X[rng.random(X.shape) < 0.1] = np.nan
+        self.X, self.y = X, np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1]) * 2 + rng.normal(0, 0.1, 600)
+        self.rows = rng.normal(size=(200, 6))
+        self.rows[rng.random(self.rows.shape) < 0.2] = np.nan
+
+    def forests(self):
+        from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier, RandomForestRegressor
+
+        labels = np.where(self.y > 1, 'high', np.where(self.y > -1, 'mid', 'low'))
+        yield RandomForestRegressor(n_estimators=20, random_state=0).fit(self.X, self.y)
+        yield RandomForestClassifier(n_estimators=20, random_state=0).fit(self.X, labels)
+        yield ExtraTreesClassifier(n_estimators=20, random_state=0).fit(np.nan_to_num(self.X), labels)
+
+    def check(self, backend):
+        from .utils.artifacts import FlatForest, forest_path_for, write_model_artifacts
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        for i, model in enumerate(self.forests()):
+            model_path = os.path.join(tmp, f'model_{i}.joblib')
+            write_model_artifacts(model, model_path)
+            flat = FlatForest.load(forest_path_for(model_path), backend)
+            np.testing.assert_array_equal(flat.predict(self.rows), model.predict(self.rows))
+            if hasattr(model, 'classes_'):
+                np.testing.assert_array_equal(flat.predict_proba(self.rows), model.predict_proba(self.rows))
+            self.assertEqual(len(flat.predict(self.rows[:0])), 0)
+
+    def test_numpy_backend_matches_sklearn(self):
+        self.check('numpy')
+
+    def test_numba_backend_matches_sklearn(self):
+        from .utils import forest_inference
+
+        if forest_inference.numba is None:
+            self.skipTest("numba is not installed")
+        self.check('numba')
+
+
+class QuotaEvictionTests(MediaTestCase):
+    def session(self, models=3):
+        from django.core.files.base import ContentFile
+        from django.utils import timezone
+
+        from .models import FileUpload, TrainedModel
+        from .utils.artifact_storage import new_model_path, record_model, record_upload
+
+        file_obj = FileUpload.objects.create(file=ContentFile(b'a,b\n1,2\n', name='data.csv'))
+        record_upload(file_obj)
+        trained = []
+        for i in range(models):
+            model_path = new_model_path()
+            with open(model_path, 'wb') as f:
+                f.write(b'\0' * 1000)
+            # Oldest first, so the first model is the least recently used.
+            used_at = timezone.now() - timedelta(hours=models - i)
+            trained.append(TrainedModel.objects.create(session=file_obj, model_path=model_path, target_column='b', metrics={}, last_used_at=used_at))
+            record_model(trained[-1])
+        return file_obj, trained
+
+    def test_session_quota_keeps_pinned_models(self):
+        from .models import TrainedModel
+        from .utils.artifact_storage import evict_session_models
+
+        file_obj, (oldest, middle, newest) = self.session()
+        TrainedModel.objects.filter(pk=oldest.pk).update(pinned=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            evicted = evict_session_models(file_obj, quota=1500)
+        # The pinned model is the least recently used, but the next ones go instead.
+        self.assertEqual([m.model_id for m in evicted], [middle.model_id, newest.model_id])
+        self.assertEqual(list(file_obj.models.values_list('pk', flat=True)), [oldest.pk])
+        self.assertTrue(os.path.exists(oldest.model_path))
+        self.assertFalse(os.path.exists(middle.model_path))
+
+    def test_global_quota_keeps_sessions_with_pinned_models(self):
+        from .models import FileUpload, TrainedModel
+        from .utils.artifact_storage import evict_sessions
+
+        pinned_session, (model, *_) = self.session()
+        TrainedModel.objects.filter(pk=model.pk).update(pinned=True)
+        other, _ = self.session()
+        FileUpload.objects.filter(pk=pinned_session.pk).update(last_used_at=other.last_used_at - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            evicted = evict_sessions(quota=0)
+        self.assertEqual([s.session_id for s in evicted], [other.session_id])
+        self.assertTrue(FileUpload.objects.filter(pk=pinned_session.pk).exists())
+        self.assertTrue(os.path.exists(model.model_path))
+
+
+class RetrainTests(MediaTestCase):
+    """Appending rows and retraining, with jobs run inline instead of in the worker pool."""
+
+    def setUp(self):
+        from unittest import mock
+
+        from .utils.training_jobs import run_training_job
+
+        super().setUp()
+        submit = mock.patch('base.views.submit_training_job', side_effect=lambda job: run_training_job(job.pk))
+        submit.start()
+        self.addCleanup(submit.stop)
+        frame = sample_frame(rows=1200).dropna()
+        frame['churn'] = (frame['amount'] > 5e4).astype(int)
+        self.history, self.delta = frame.iloc[:800], frame.iloc[800:]
+
+    def csv(self, frame, name):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return SimpleUploadedFile(name, frame.to_csv(index=False).encode(), content_type='text/csv')
+
+    def job(self, response, status):
+        self.assertEqual(response.status_code, status, response.content)
+        job = response.json().get('job', response.json())
+        job = self.client.get(f"/api/jobs/{job['job_id']}/").json()
+        self.assertEqual(job['status'], 'succeeded', job.get('error'))
+        return job
+
+    def test_versions_link_to_their_parent(self):
+        from .models import TrainedModel
+
+        response = self.client.post('/api/upload/', {'file': self.csv(self.history, 'history.csv')}, format='multipart')
+        session_id = response.json()['session_id']
+        first = self.job(self.client.post(f'/api/train/{session_id}/', {'target_column': 'churn', 'time_budget': 0}, format='json'), 202)
+        self.assertEqual((first['version'], first['parent_model_id']), (1, None))
+        # Nothing appended yet, so a warm start has no newest rows to fit on.
+        response = self.client.post(f"/api/models/{first['model_id']}/retrain/", {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            f'/api/append/{session_id}/', {'file': self.csv(self.delta, 'delta.csv'), 'model_id': first['model_id']}, format='multipart',
+        )
+        self.assertEqual((response.json()['appended_rows'], response.json()['row_count']), (len(self.delta), len(self.history) + len(self.delta)))
+        second = self.job(response, 202)
+        self.assertEqual((second['version'], second['parent_model_id']), (2, first['model_id']))
+        self.assertEqual((second['retrain_strategy'], second['window_rows']), ('warm_start', len(self.delta)))
+        self.assertEqual((second['search_results']['strategy'], second['search_results']['rows']), ('warm_start', len(self.delta)))
+        # Retrained later, a warm start still fits on the rows of the last append only.
+        again = self.job(self.client.post(f"/api/models/{first['model_id']}/retrain/", {}, format='json'), 202)
+        self.assertEqual((again['version'], again['window_rows']), (2, len(self.delta)))
+
+        response = self.client.post(f"/api/models/{second['model_id']}/retrain/", {'strategy': 'window', 'window_rows': 500}, format='json')
+        third = self.job(response, 202)
+        self.assertEqual((third['version'], third['parent_model_id']), (3, second['model_id']))
+        self.assertEqual((third['search_results']['strategy'], third['search_results']['rows']), ('window', 500))
+
+        versions = TrainedModel.objects.get(model_id=first['model_id']).versions.order_by('created_at')
+        self.assertEqual([str(m.model_id) for m in versions], [second['model_id'], again['model_id']])
+
+    def test_boosting_parent_is_refit(self):
+        import joblib
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        from .models import TrainedModel
+        from .utils.artifacts import load_artifact
+        from .utils.model_cache import preprocessor_path_for
+
+        response = self.client.post('/api/upload/', {'file': self.csv(self.history, 'history.csv')}, format='multipart')
+        session_id = response.json()['session_id']
+        first = self.job(self.client.post(f'/api/train/{session_id}/', {'target_column': 'churn', 'time_budget': 0}, format='json'), 202)
+        parent = TrainedModel.objects.get(model_id=first['model_id'])
+        X = load_artifact(preprocessor_path_for(parent.model_path)).transform_frame(self.history.drop(columns=['churn']))
+        joblib.dump(HistGradientBoostingClassifier(max_iter=10).fit(X, self.history['churn']), parent.model_path)
+
+        second = self.job(self.client.post(f"/api/models/{first['model_id']}/retrain/", {'window_rows': 300}, format='json'), 202)
+        self.assertEqual((second['version'], second['retrain_strategy']), (2, 'warm_start'))
+        # Its bins would be rebuilt on the new rows, so a boosting model is refit rather than grown.
+        self.assertEqual(second['search_results']['strategy'], 'window')
+
+
+class TrainingJobTests(MediaTestCase):
+    def setUp(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        super().setUp()
+        frame = sample_frame(rows=500).dropna()
+        frame['churn'] = (frame['amount'] > 5e4).astype(int)
+        upload = SimpleUploadedFile('churn.csv', frame.to_csv(index=False).encode(), content_type='text/csv')
+        self.session_id = self.client.post('/api/upload/', {'file': upload}, format='multipart').json()['session_id']
+
+    def train(self, **data):
+        return self.client.post(f'/api/train/{self.session_id}/', {'target_column': 'churn', 'time_budget': 0, **data}, format='json')
+
+    def poll(self, job_id):
+        return self.client.get(f'/api/jobs/{job_id}/').json()
+
+    def test_submit_and_poll(self):
+        from unittest import mock
+
+        from .models import TrainedModel
+        from .utils.training_jobs import run_training_job
+
+        with mock.patch('base.views.submit_training_job', side_effect=lambda job: run_training_job(job.pk)):
+            response = self.train()
+        self.assertEqual((response.status_code, response.json()['status']), (202, 'queued'))
+        job = self.poll(response.json()['job_id'])
+        self.assertEqual(job['status'], 'succeeded', job['error'])
+        self.assertEqual(str(TrainedModel.objects.get(jobs__job_id=job['job_id']).model_id), job['model_id'])
+
+    @override_settings(TRAINING_JOB_WORKERS=1, TRAINING_JOB_QUEUE_DEPTH=0)
+    def test_full_queue_and_crashed_worker(self):
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+        from unittest import mock
+
+        from .models import TrainingJob
+
+        future = Future()
+        with mock.patch('base.utils.training_jobs._get_executor') as executor:
+            executor.return_value.submit.return_value = future
+            first = self.train()
+            self.assertEqual(first.status_code, 202)
+            response = self.train(refresh=True)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(TrainingJob.objects.count(), 1)
+
+        # The worker process dies without recording anything itself.
+        future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        job = self.poll(first.json()['job_id'])
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('terminated abruptly', job['error'])
+        self.assertIsNotNone(job['finished_at'])
+
+    def test_jobs_of_exited_processes_fail(self):
+        import io
+        import socket
+
+        from django.core.management import call_command
+
+        from .models import FileUpload, TrainingJob, process_owner
+
+        session = FileUpload.objects.get(session_id=self.session_id)
+        jobs = {
+            # Queued by this process, but not in its executor: left over from before a restart.
+            'here': process_owner(),
+            'exited': f'{socket.gethostname()}:{2 ** 22 + 1}',
+            'elsewhere': 'another-host:1',
+        }
+        jobs = {name: TrainingJob.objects.create(session=session, status=TrainingJob.STATUS_RUNNING, owner=owner) for name, owner in jobs.items()}
+        self.assertEqual(self.poll(jobs['here'].job_id)['status'], 'failed')
+
+        call_command('gc_artifacts', '--no-evict', stdout=io.StringIO())
+        statuses = dict(TrainingJob.objects.values_list('owner', 'status'))
+        self.assertEqual(statuses[jobs['exited'].owner], 'failed')
+        self.assertEqual(statuses[jobs['elsewhere'].owner], 'running')
+
+
+class BatchPredictTests(MediaTestCase):
+    def setUp(self):
+        from unittest import mock
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from .utils.training_jobs import run_training_job
+
+        super().setUp()
+        frame = sample_frame(rows=2500)
+        frame['churn'] = (frame['amount'] > 5e4).astype(int)
+        self.frame = frame
+        upload = SimpleUploadedFile('churn.csv', frame.to_csv(index=False).encode(), content_type='text/csv')
+        session_id = self.client.post('/api/upload/', {'file': upload}, format='multipart').json()['session_id']
+        with mock.patch('base.views.submit_training_job', side_effect=lambda job: run_training_job(job.pk)):
+            job_id = self.client.post(f'/api/train/{session_id}/', {'target_column': 'churn', 'time_budget': 0}, format='json').json()['job_id']
+        self.model_id = self.client.get(f'/api/jobs/{job_id}/').json()['model_id']
+
+    def score(self, output):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile('rows.csv', self.frame.drop(columns=['churn']).to_csv(index=False).encode(), content_type='text/csv')
+        response = self.client.post(f'/api/predict/{self.model_id}/batch/?output={output}', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    @override_settings(BATCH_PREDICT_CHUNK_SIZE=1000)
+    def test_csv_output_is_plain_csv(self):
+        import io
+
+        predictions = pd.read_csv(io.StringIO(self.score('csv')))
+        self.assertEqual(list(predictions.columns), ['row', 'prediction'])
+        self.assertEqual(predictions['row'].tolist(), list(range(len(self.frame))))
+        self.assertFalse(predictions['prediction'].isna().any())
+        self.assertTrue(set(predictions['prediction']) <= {0, 1})
+
+    @override_settings(BATCH_PREDICT_CHUNK_SIZE=1000)
+    def test_ndjson_output_ends_with_a_summary(self):
+        import json
+
+        lines = [json.loads(line) for line in self.score('ndjson').splitlines()]
+        self.assertEqual([line['row'] for line in lines[:-1]], list(range(len(self.frame))))
+        self.assertEqual(lines[-1]['summary']['rows'], len(self.frame))
+
+
+class ContentDedupTests(MediaTestCase):
+    def setUp(self):
+        from unittest import mock
+
+        from .utils.training_jobs import run_training_job
+
+        super().setUp()
+        frame = sample_frame(rows=500).dropna()
+        frame['churn'] = (frame['amount'] > 5e4).astype(int)
+        self.data = frame.to_csv(index=False).encode()
+        patcher = mock.patch('base.views.submit_training_job', side_effect=lambda job: run_training_job(job.pk))
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('churn.csv', self.data, content_type='text/csv')}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def train(self, session_id, **data):
+        return self.client.post(f'/api/train/{session_id}/', {'target_column': 'churn', 'time_budget': 0, **data}, format='json')
+
+    def test_same_bytes_reuse_the_blob_profile_and_model(self):
+        from .models import FileUpload
+
+        first, second = self.upload(), self.upload()
+        self.assertEqual((first['deduplicated'], second['deduplicated']), (False, True))
+        self.assertEqual(first['content_hash'], second['content_hash'])
+        sessions = [FileUpload.objects.get(session_id=upload['session_id']) for upload in (first, second)]
+        self.assertEqual(sessions[0].file.name, sessions[1].file.name)
+        self.assertEqual(sessions[0].metadata['columnar_cache'], sessions[1].metadata['columnar_cache'])
+        blobs = [name for _, _, names in os.walk(os.path.join(self.tmp, 'media', 'blobs')) for name in names]
+        self.assertEqual(len(blobs), 1)
+
+        trained = self.train(first['session_id'])
+        self.assertEqual(trained.status_code, 202)
+        model_id = self.client.get(f"/api/jobs/{trained.json()['job_id']}/").json()['model_id']
+        reused = self.train(second['session_id'])
+        self.assertEqual(reused.status_code, 200)
+        self.assertEqual((reused.json()['reused'], reused.json()['status'], reused.json()['model_id']), (True, 'succeeded', model_id))
+        self.assertEqual(self.submit.call_count, 1)
+
+    def test_refresh_trains_again(self):
+        session_id = self.upload()['session_id']
+        first = self.client.get(f"/api/jobs/{self.train(session_id).json()['job_id']}/").json()
+        response = self.train(session_id, refresh=True)
+        self.assertEqual((response.status_code, response.json()['reused']), (202, False))
+        self.assertEqual(self.submit.call_count, 2)
+        second = self.client.get(f"/api/jobs/{response.json()['job_id']}/").json()
+        self.assertNotEqual(second['model_id'], first['model_id'])
+
+
+@override_settings(ARTIFACT_TOUCH_INTERVAL=0)
+class ConditionalResponseTests(MediaTestCase):
+    def setUp(self):
+        from django.core.files.base import ContentFile
+
+        from .models import FileUpload, TrainedModel
+        from .utils.profile_store import save_profile
+
+        super().setUp()
+        self.session = FileUpload.objects.create(file=ContentFile(b'a,b\n1,2\n', name='data.csv'))
+        save_profile(self.session, {'columns': [{'name': 'a', 'type': 'integer'}, {'name': 'b', 'type': 'integer'}], 'row_count': 1})
+        self.model = TrainedModel.objects.create(
+            session=self.session, model_path='unused.joblib', target_column='b', metrics={}, insights={'summary': 'first'},
+        )
+
+    def check_revalidation(self, url, obj):
+        from .utils.artifact_storage import touch
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Recording use must not look like a change to clients holding the payload.
+        used_at = type(obj).objects.get(pk=obj.pk).last_used_at
+        touch(obj)
+        self.assertGreater(type(obj).objects.get(pk=obj.pk).last_used_at, used_at)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+        return etag
+
+    def test_profile_revalidates(self):
+        self.check_revalidation(f'/api/profile/{self.session.session_id}/', self.session)
+
+    def test_saving_the_model_invalidates_its_summary(self):
+        from .utils.response_cache import response_cache
+
+        url = f'/api/summary/{self.model.model_id}/'
+        etag = self.check_revalidation(url, self.model)
+        self.assertIsNotNone(response_cache().get(f'summary:{self.model.model_id}'))
+
+        self.model.insights = {'summary': 'second'}
+        self.model.save()
+        self.assertIsNone(response_cache().get(f'summary:{self.model.model_id}'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['insights'], {'summary': 'second'})
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class PredictionLogTests(SimpleTestCase):
+    def setUp(self):
+        from types import SimpleNamespace
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        log_settings = override_settings(PREDICTION_LOG_BACKEND='file', PREDICTION_LOG_DIR=self.tmp, PREDICTION_LOG_FLUSH_INTERVAL=3600)
+        log_settings.enable()
+        self.addCleanup(log_settings.disable)
+        self.model = SimpleNamespace(pk=1, model_id='model-a')
+
+    def logger(self):
+        from unittest import mock
+
+        from .utils.prediction_log import PredictionLogger
+
+        log = PredictionLogger()
+        with mock.patch('base.utils.prediction_log.atexit.register') as register:
+            log.log(self.model, [{'x': 0}], [0])
+        self.addCleanup(lambda: log._backend.handler.close())
+        self.at_exit = register.call_args.args[0]
+        return log
+
+    def lines(self, name='predictions.ndjson'):
+        import json
+
+        with open(os.path.join(self.tmp, name)) as f:
+            return [json.loads(line) for line in f]
+
+    def test_sampling_and_truncation(self):
+        import random
+
+        random.seed(0)
+        with self.settings(PREDICTION_LOG_MAX_ROWS=2, PREDICTION_LOG_MODEL_OVERRIDES={'model-b': {'sample_rate': 0.0}, 'model-c': {'sample_rate': 0.5}}):
+            log = self.logger()
+            self.assertIsNotNone(log.log(self.model, [{'x': i} for i in range(5)], list(range(5))))
+            self.model.model_id = 'model-b'
+            self.assertEqual([log.log(self.model, [{'x': 0}], [0]) for _ in range(10)], [None] * 10)
+            self.model.model_id = 'model-c'
+            sampled = sum(log.log(self.model, [{'x': 0}], [0]) is not None for _ in range(400))
+        self.assertLess(abs(sampled - 200), 40)
+        log.flush()
+        records = self.lines()
+        self.assertEqual(len(records), 2 + sampled)
+        self.assertEqual((records[1]['input_data'], records[1]['predictions']), ([{'x': 0}, {'x': 1}], [0, 1]))
+        self.assertEqual(log.stats(), {'pending': 0, 'written': 2 + sampled, 'dropped': 0, 'failed': 0})
+
+    @override_settings(PREDICTION_LOG_FILE_MAX_BYTES=1000, PREDICTION_LOG_FILE_BACKUP_COUNT=2)
+    def test_file_rotation(self):
+        log = self.logger()
+        for i in range(50):
+            log.log(self.model, [{'x': i}], [i])
+        log.flush()
+        names = sorted(os.listdir(self.tmp))
+        self.assertEqual(names, ['predictions.ndjson', 'predictions.ndjson.1', 'predictions.ndjson.2'])
+        for name in names:
+            self.assertLessEqual(os.path.getsize(os.path.join(self.tmp, name)), 1000)
+        # The newest records are in the current file; the oldest rotated out past the backups.
+        self.assertEqual(self.lines()[-1]['predictions'], [49])
+        self.assertEqual(log.stats()['written'], 51)
+
+    def test_flush_at_exit(self):
+        log = self.logger()
+        for i in range(3):
+            log.log(self.model, [{'x': i}], [i])
+        self.assertEqual(log.stats()['pending'], 4)
+        # What the interpreter runs on shutdown, before the writer thread gets its next turn.
+        self.at_exit()
+        self.assertEqual(log.stats()['pending'], 0)
+        self.assertEqual(len(self.lines()), 4)
+
+
+class ModelCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.X = np.arange(20, dtype=float).reshape(10, 2)
+
+    def write(self, name, slope):
+        from sklearn.linear_model import LinearRegression
+
+        from .utils.artifacts import save_artifact
+
+        path = os.path.join(self.tmp, f'{name}.joblib')
+        save_artifact(LinearRegression().fit(self.X, self.X[:, 0] * slope), path)
+        return path
+
+    def test_rewritten_model_is_reloaded(self):
+        from .utils.model_cache import ModelCache
+
+        cache = ModelCache(max_bytes=None)
+        path = self.write('model', 1.0)
+        first = cache.get('m', path, {})
+        self.assertIs(cache.get('m', path, {}), first)
+        self.write('model', 2.0)
+        # In case the rewrite landed within the filesystem's timestamp resolution.
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        second = cache.get('m', path, {})
+        self.assertIsNot(second, first)
+        self.assertAlmostEqual(second.model.coef_[0] + second.model.coef_[1], 2.0)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['invalidations'], stats['entries']), (1, 2, 1, 1))
+
+    def test_least_recently_used_models_are_evicted(self):
+        from .utils.model_cache import ModelCache
+
+        paths = {name: self.write(name, 1.0) for name in 'abc'}
+        size = os.path.getsize(paths['a'])
+        cache = ModelCache(max_bytes=int(size * 2.5))
+        cache.get('a', paths['a'], {})
+        cache.get('b', paths['b'], {})
+        cache.get('a', paths['a'], {})
+        cache.get('c', paths['c'], {})
+        self.assertEqual(list(cache._entries), ['a', 'c'])
+        stats = cache.stats()
+        self.assertEqual((stats['evictions'], stats['entries'], stats['bytes']), (1, 2, 2 * size))
+        # Larger than the whole cache: served but never kept.
+        self.assertEqual(ModelCache(max_bytes=size - 1).get('a', paths['a'], {}).size_bytes, size)
+
+    def test_concurrent_misses_load_once(self):
+        import threading
+        from unittest import mock
+
+        from .utils import model_cache as module
+
+        path = self.write('model', 1.0)
+        cache = module.ModelCache(max_bytes=None)
+        load = module.load_model
+
+        def slow_load(*args):
+            time.sleep(0.2)
+            return load(*args)
+
+        with mock.patch.object(module, 'load_model', side_effect=slow_load) as loader:
+            threads = [threading.Thread(target=cache.get, args=('m', path, {})) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual((cache.stats()['misses'], cache.stats()['hits']), (1, 0))
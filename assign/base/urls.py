@@ -1,12 +1,29 @@
 from django.urls import path
-from .views import UploadFileView, ProfileDataView, TrainModelView, PredictView, SummaryView
+from .async_views import AsyncUploadFileView, AsyncProfileDataView, AsyncPredictView, AsyncSummaryView
+from .views import UploadFileView, ChunkedUploadView, ChunkedUploadChunkView, ChunkedUploadCompleteView, ProfileDataView, TrainModelView, TrainingJobView, PredictView, BatchPredictView, SummaryView, MetricsView, HealthView, ModelPinView, AppendRowsView, ModelRetrainView
 
 urlpatterns = [
     path('upload/', UploadFileView.as_view(), name='upload'),
+    path('uploads/', ChunkedUploadView.as_view(), name='chunked-upload'),
+    path('uploads/<str:upload_id>/', ChunkedUploadChunkView.as_view(), name='chunked-upload-chunk'),
+    path('uploads/<str:upload_id>/complete/', ChunkedUploadCompleteView.as_view(), name='chunked-upload-complete'),
     path('profile/<str:session_id>/', ProfileDataView.as_view(), name='profile'),
+    path('append/<str:session_id>/', AppendRowsView.as_view(), name='append'),
 
     path('train/<str:session_id>/', TrainModelView.as_view(), name='train'),
+    path('jobs/<str:job_id>/', TrainingJobView.as_view(), name='training-job'),
 
     path('predict/<str:model_id>/', PredictView.as_view(), name='predict'),
+    path('predict/<str:model_id>/batch/', BatchPredictView.as_view(), name='predict-batch'),
     path('summary/<str:model_id>/', SummaryView.as_view(), name='summary'),
+    path('models/<str:model_id>/pin/', ModelPinView.as_view(), name='model-pin'),
+    path('models/<str:model_id>/retrain/', ModelRetrainView.as_view(), name='model-retrain'),
+
+    path('async/upload/', AsyncUploadFileView.as_view(), name='async-upload'),
+    path('async/profile/<str:session_id>/', AsyncProfileDataView.as_view(), name='async-profile'),
+    path('async/predict/<str:model_id>/', AsyncPredictView.as_view(), name='async-predict'),
+    path('async/summary/<str:model_id>/', AsyncSummaryView.as_view(), name='async-summary'),
+
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('health/', HealthView.as_view(), name='health'),
 ]
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""Appending rows to an existing session instead of re-uploading its whole history.
+
+An append never changes files in place: blobs and columnar caches are shared
+by every session with the same content hash, so the grown data gets its own.
+The new blob is the old one with the delta's rows after it, hashed while it is
+copied. The new columnar cache hard-links the old segments and adds the delta
+as one more segment. The profile is updated by feeding only the delta to the
+profiler state saved with the old cache, so old rows are not profiled again;
+caches profiled before that state was kept are profiled in full once.
+
+The session then points at the new blob, cache and profile, and remembers how
+many rows the append added for warm-start retraining; the old files are
+released like those of a deleted session.
+"""
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from .artifact_storage import enforce_quotas, record_upload, release_upload
+from .blob_store import BLOB_SUBDIR, commit_blob, delete_blob, reusable_session
+from .columnar_cache import append_columnar_cache, delete_columnar_cache, fork_columnar_cache, iter_chunks
+from .data_profiling import load_profiler_state, profile_chunks, profile_upload, save_profiler_state
+from .profile_store import copy_profile, save_profile
+
+COPY_BUFFER_BYTES = 1024 * 1024
+
+
+def _write_delta(uploaded_file, tmp_dir):
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False, suffix='.csv') as tmp:
+        for chunk in uploaded_file.chunks():
+            tmp.write(chunk)
+    return tmp.name
+
+
+def _check_delta(delta_path, columns):
+    first = pd.read_csv(delta_path, nrows=1)
+    if list(first.columns) != columns:
+        raise ValueError(f"Appended data must have the same columns as the original upload: expected {columns}, got {list(first.columns)}")
+    if first.empty:
+        raise ValueError("The appended file has no rows")
+
+
+def _grown_blob(blob_path, delta_path, tmp_dir):
+    """Write the old blob followed by the delta's rows to a temporary file; returns ``(path, content_hash)``."""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        try:
+            last = b'\n'
+            with open(blob_path, 'rb') as f:
+                while block := f.read(COPY_BUFFER_BYTES):
+                    digest.update(block)
+                    tmp.write(block)
+                    last = block[-1:]
+            if last != b'\n':
+                digest.update(b'\n')
+                tmp.write(b'\n')
+            with open(delta_path, 'rb') as f:
+                f.readline()  # the header, already checked against the session's columns
+                while block := f.read(COPY_BUFFER_BYTES):
+                    digest.update(block)
+                    tmp.write(block)
+        except Exception:
+            os.remove(tmp.name)
+            raise
+    return tmp.name, digest.hexdigest()
+
+
+def _grown_profile(metadata, blob_path, delta_path, content_hash):
+    """The schema of the grown data, with its columnar cache, profiling only the delta where possible."""
+    old_cache = metadata.get('columnar_cache')
+    profiler = load_profiler_state(old_cache) if old_cache else None
+    if profiler is None:
+        return profile_upload(blob_path, content_hash)
+
+    cache = fork_columnar_cache(old_cache, content_hash)
+    try:
+        chunk_size = getattr(settings, 'PROFILE_CHUNK_SIZE', 50000)
+        append_columnar_cache(cache, pd.read_csv(delta_path, chunksize=chunk_size))
+        schema = profile_chunks(iter_chunks(cache, first_segment=len(old_cache['segments'])), profiler)
+        save_profiler_state(cache, profiler)
+    except Exception:
+        delete_columnar_cache(cache)
+        raise
+    schema['columnar_cache'] = cache
+    return schema
+
+
+def append_rows(file_obj, uploaded_file):
+    """Append the rows of ``uploaded_file``, a CSV with the session's header, to ``file_obj``.
+
+    Returns ``{'appended_rows', 'row_count', 'content_hash'}``. Raises
+    ValueError for a delta that does not fit the session, and refuses while a
+    training job is reading the session's current files.
+    """
+    from ..models import FileUpload, TrainingJob
+
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, BLOB_SUBDIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    delta_path = _write_delta(uploaded_file, tmp_dir)
+    try:
+        with transaction.atomic():
+            file_obj = FileUpload.objects.select_for_update().get(pk=file_obj.pk)
+            if file_obj.training_jobs.filter(status__in=[TrainingJob.STATUS_QUEUED, TrainingJob.STATUS_RUNNING]).exists():
+                raise ValueError("The session has a training job in progress; append once it has finished")
+            old_name, old_metadata = file_obj.file.name, file_obj.metadata or {}
+            old_rows = old_metadata.get('row_count', 0)
+            _check_delta(delta_path, list(file_obj.column_profiles.values_list('name', flat=True)))
+
+            tmp_path, content_hash = _grown_blob(file_obj.file.path, delta_path, tmp_dir)
+            file_name, content_hash, created = commit_blob(tmp_path, content_hash, os.path.splitext(old_name)[1])
+            cache = None
+            try:
+                file_obj.file.name, file_obj.content_hash = file_name, content_hash
+                previous = reusable_session(content_hash)
+                if previous is not None:
+                    copy_profile(previous, file_obj)
+                else:
+                    schema = _grown_profile(old_metadata, file_obj.file.path, delta_path, content_hash)
+                    cache = schema.get('columnar_cache')
+                    save_profile(file_obj, schema)
+                file_obj.appended_rows = (file_obj.metadata or {}).get('row_count', 0) - old_rows
+                file_obj.save(update_fields=['appended_rows'])
+            except Exception:
+                delete_columnar_cache(cache)
+                if created:
+                    delete_blob(file_name)
+                raise
+            transaction.on_commit(lambda: release_upload(old_name, old_metadata))
+    finally:
+        os.remove(delta_path)
+
+    record_upload(file_obj)
+    enforce_quotas(file_obj)
+    row_count = (file_obj.metadata or {}).get('row_count', 0)
+    return {'appended_rows': file_obj.appended_rows, 'row_count': row_count, 'content_hash': content_hash}
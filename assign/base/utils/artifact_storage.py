@@ -0,0 +1,386 @@
+"""Where artifacts live on disk, what they take up, and when they are removed.
+
+Model files go under ``ARTIFACT_ROOT/models/<aa>/``, sharded on the first two
+hex digits of their id like the upload blobs under ``MEDIA_ROOT/blobs/<aa>/``.
+Every upload blob, columnar cache and model file has an ``Artifact`` row with
+its size. Deleting a session or model removes its files once the transaction
+commits (see ``base.signals``); a blob or cache shared by identical uploads
+goes with the last session that uses it.
+
+Quotas evict the least recently used first: a session's models while it holds
+more than ``ARTIFACT_SESSION_QUOTA``, whole sessions while everything together
+is over ``ARTIFACT_GLOBAL_QUOTA``. ``manage.py gc_artifacts`` also expires
+sessions idle for ``ARTIFACT_TTL`` and reconciles the files on disk with the
+rows.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .blob_store import BLOB_SUBDIR
+from .chunked_uploads import discard_part, part_path
+from .columnar_cache import CACHE_SUBDIR
+
+logger = logging.getLogger(__name__)
+
+MODEL_SUBDIR = 'models'
+LEGACY_UPLOAD_SUBDIR = 'uploads'  # where FileField put uploads before the blob store
+# Rows created, deleted or resized per query by reconcile().
+BULK_BATCH_SIZE = 500
+# Sessions and models remembered by touch() before its memo is reset.
+TOUCH_MEMO_SIZE = 10000
+
+_touched = {}
+_touch_lock = threading.Lock()
+
+
+def artifact_root():
+    return str(getattr(settings, 'ARTIFACT_ROOT', os.path.join(settings.BASE_DIR, 'artifacts')))
+
+
+def new_model_path():
+    """A fresh, sharded path for a model's main file; its companion files are named after it."""
+    token = str(uuid.uuid4())
+    directory = os.path.join(artifact_root(), MODEL_SUBDIR, token[:2])
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'model_{token}.joblib')
+
+
+def media_path(name):
+    return os.path.abspath(os.path.join(settings.MEDIA_ROOT, name))
+
+
+def disk_size(path):
+    if not os.path.isdir(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def model_files(model_path):
+    from .artifacts import forest_path_for
+    from .model_cache import encoder_path_for, preprocessor_path_for
+
+    paths = (model_path, forest_path_for(model_path), encoder_path_for(model_path), preprocessor_path_for(model_path))
+    return [os.path.abspath(path) for path in paths]
+
+
+def upload_files(file_name, metadata):
+    """``{path: kind}`` for a session's blob and columnar cache."""
+    from ..models import Artifact
+
+    files = {media_path(file_name): Artifact.KIND_UPLOAD} if file_name else {}
+    cache = (metadata or {}).get('columnar_cache')
+    if cache:
+        files[media_path(cache['path'])] = Artifact.KIND_COLUMNAR
+    return files
+
+
+def _record(files, trained_model=None):
+    from ..models import Artifact
+
+    for path, kind in files.items():
+        if os.path.exists(path):
+            Artifact.objects.update_or_create(
+                path=path, defaults={'kind': kind, 'size': disk_size(path), 'trained_model': trained_model},
+            )
+        else:
+            Artifact.objects.filter(path=path).delete()
+
+
+def record_upload(file_obj):
+    """Create or refresh the Artifact rows of a session's blob and columnar cache."""
+    _record(upload_files(file_obj.file.name, file_obj.metadata))
+
+
+def record_model(trained_model):
+    """Create or refresh the Artifact rows of a trained model's files."""
+    from ..models import Artifact
+
+    _record({path: Artifact.KIND_MODEL for path in model_files(trained_model.model_path)}, trained_model)
+
+
+def touch(obj):
+    """Mark a session or model (and the model's session) as used now.
+
+    Writes at most once per ARTIFACT_TOUCH_INTERVAL per object and process,
+    with ``update()`` so that ``updated_at``, and the ETags built on it, stay
+    as they are.
+    """
+    from ..models import FileUpload, TrainedModel
+
+    key = (obj._meta.label, obj.pk)
+    now = time.monotonic()
+    with _touch_lock:
+        if now - _touched.get(key, float('-inf')) < getattr(settings, 'ARTIFACT_TOUCH_INTERVAL', 300):
+            return
+        if len(_touched) >= TOUCH_MEMO_SIZE:
+            _touched.clear()
+        _touched[key] = now
+    used_at = timezone.now()
+    type(obj).objects.filter(pk=obj.pk).update(last_used_at=used_at)
+    if isinstance(obj, TrainedModel):
+        FileUpload.objects.filter(models=obj.pk).update(last_used_at=used_at)
+
+
+def release_upload(file_name, metadata):
+    """Remove a deleted session's blob and columnar cache unless another session still uses them."""
+    from ..models import Artifact, FileUpload
+
+    released = []
+    if file_name and not FileUpload.objects.filter(file=file_name).exists():
+        released.append(media_path(file_name))
+    cache = (metadata or {}).get('columnar_cache')
+    if cache and not FileUpload.objects.filter(metadata__columnar_cache__path=cache['path']).exists():
+        released.append(media_path(cache['path']))
+    for path in released:
+        _remove(path)
+    Artifact.objects.filter(path__in=released).delete()
+
+
+def release_model(model_path):
+    for path in model_files(model_path):
+        _remove(path)
+
+
+def total_usage():
+    from ..models import Artifact
+
+    return Artifact.objects.aggregate(total=Sum('size'))['total'] or 0
+
+
+def session_usage(file_obj):
+    """Bytes held by a session: its blob and columnar cache (even if shared) and its models."""
+    from ..models import Artifact
+
+    paths = list(upload_files(file_obj.file.name, file_obj.metadata))
+    artifacts = Artifact.objects.filter(Q(path__in=paths) | Q(trained_model__session=file_obj))
+    return artifacts.aggregate(total=Sum('size'))['total'] or 0
+
+
+def _evictable_sessions(protect=()):
+    from ..models import FileUpload, TrainingJob
+
+    # Sessions with a job in flight would lose their data under the worker; pinned models keep theirs.
+    busy = TrainingJob.objects.filter(status__in=[TrainingJob.STATUS_QUEUED, TrainingJob.STATUS_RUNNING]).values('session')
+    return FileUpload.objects.exclude(pk__in=list(protect)).exclude(pk__in=busy).exclude(models__pinned=True)
+
+
+def evict_session_models(file_obj, quota=None, protect=(), dry_run=False):
+    """Delete a session's least recently used models until it holds at most ``quota`` bytes.
+
+    ``quota`` defaults to ARTIFACT_SESSION_QUOTA (None: no limit). Models in
+    ``protect`` (pks) and pinned models are kept. Returns the models deleted, or that would be.
+    """
+    from ..models import Artifact
+
+    quota = getattr(settings, 'ARTIFACT_SESSION_QUOTA', None) if quota is None else quota
+    if quota is None:
+        return []
+    used = session_usage(file_obj)
+    evicted = []
+    candidates = file_obj.models.exclude(pk__in=list(protect)).exclude(pinned=True).only('id', 'model_id', 'model_path').order_by('last_used_at')
+    for trained_model in list(candidates):
+        if used <= quota:
+            break
+        used -= Artifact.objects.filter(trained_model=trained_model).aggregate(total=Sum('size'))['total'] or 0
+        if not dry_run:
+            trained_model.delete()
+        evicted.append(trained_model)
+    return evicted
+
+
+def evict_sessions(quota=None, protect=(), dry_run=False):
+    """Delete the least recently used sessions until all artifacts together fit in ``quota`` bytes.
+
+    ``quota`` defaults to ARTIFACT_GLOBAL_QUOTA (None: no limit). Sessions in
+    ``protect`` (pks), with a training job in flight or holding a pinned model
+    are kept. Returns the sessions deleted, or that would be; a dry run counts shared
+    blobs against every session using them, so it may list a few too many.
+    """
+    from ..models import FileUpload
+
+    quota = getattr(settings, 'ARTIFACT_GLOBAL_QUOTA', None) if quota is None else quota
+    if quota is None:
+        return []
+    used = total_usage()
+    evicted = []
+    for pk in list(_evictable_sessions(protect).order_by('last_used_at').values_list('pk', flat=True)):
+        if used <= quota:
+            break
+        file_obj = FileUpload.objects.only('id', 'session_id', 'file', 'metadata').get(pk=pk)
+        if dry_run:
+            used -= session_usage(file_obj)
+        else:
+            file_obj.delete()
+            used = total_usage()
+        evicted.append(file_obj)
+    return evicted
+
+
+def expire_sessions(ttl=None, protect=(), dry_run=False):
+    """Delete sessions not used for ``ttl`` seconds (ARTIFACT_TTL; None keeps them); returns them."""
+    ttl = getattr(settings, 'ARTIFACT_TTL', None) if ttl is None else ttl
+    if ttl is None:
+        return []
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    expired = list(_evictable_sessions(protect).filter(last_used_at__lt=cutoff).only('id', 'session_id', 'file', 'metadata'))
+    if not dry_run:
+        for file_obj in expired:
+            file_obj.delete()
+    return expired
+
+
+def enforce_quotas(file_obj, keep_model=None):
+    """Apply the session and global quotas after ``file_obj`` gained an artifact.
+
+    The session itself and ``keep_model`` are never evicted here. Failures
+    are logged rather than raised, so they cannot fail the upload or job
+    that triggered them.
+    """
+    try:
+        evict_session_models(file_obj, protect=[keep_model.pk] if keep_model is not None else ())
+        evict_sessions(protect=[file_obj.pk])
+    except Exception:
+        logger.exception("Enforcing artifact quotas for session %s failed", file_obj.session_id)
+
+
+def expire_chunked_uploads(ttl=None, dry_run=False):
+    """Fail resumable uploads idle for longer than ``ttl`` seconds (CHUNKED_UPLOAD_TTL) and drop their parts."""
+    from ..models import ChunkedUpload
+
+    ttl = getattr(settings, 'CHUNKED_UPLOAD_TTL', 24 * 3600) if ttl is None else ttl
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    stale = list(ChunkedUpload.objects.filter(status=ChunkedUpload.STATUS_ACTIVE, updated_at__lt=cutoff).only('id', 'upload_id'))
+    if not dry_run:
+        for upload in stale:
+            discard_part(upload)
+        ChunkedUpload.objects.filter(pk__in=[upload.pk for upload in stale]).update(
+            status=ChunkedUpload.STATUS_FAILED, error=f"Upload expired after {ttl} seconds without a chunk",
+        )
+    return stale
+
+
+def _entries(directory, depth):
+    # depth 1: the entries of ``directory``; 2: the entries of its shard subdirectories.
+    try:
+        children = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    for entry in children:
+        if depth > 1:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _entries(entry.path, depth - 1)
+        else:
+            yield entry
+
+
+def _on_disk():
+    """``{path: mtime}`` of every managed file or cache directory."""
+    roots = [
+        (media_path(BLOB_SUBDIR), 2),
+        (media_path(LEGACY_UPLOAD_SUBDIR), 1),
+        (media_path(CACHE_SUBDIR), 1),
+        (os.path.join(artifact_root(), MODEL_SUBDIR), 2),
+    ]
+    return {
+        os.path.abspath(entry.path): entry.stat(follow_symlinks=False).st_mtime
+        for root, depth in roots
+        for entry in _entries(root, depth)
+    }
+
+
+def _referenced():
+    """``{path: (kind, trained_model_pk)}`` of everything a row points at; kind is None for upload parts."""
+    from ..models import Artifact, ChunkedUpload, FileUpload, TrainedModel
+
+    referenced = {}
+    for file_name, metadata in FileUpload.objects.values_list('file', 'metadata').iterator():
+        for path, kind in upload_files(file_name, metadata).items():
+            referenced[path] = (kind, None)
+    for model_pk, model_path in TrainedModel.objects.values_list('pk', 'model_path').iterator():
+        for path in model_files(model_path):
+            referenced[path] = (Artifact.KIND_MODEL, model_pk)
+    for upload in ChunkedUpload.objects.filter(status=ChunkedUpload.STATUS_ACTIVE).only('id', 'upload_id'):
+        referenced[os.path.abspath(part_path(upload))] = (None, None)
+    return referenced
+
+
+def reconcile(grace=None, dry_run=False):
+    """Bring the files on disk and the Artifact rows in line with the sessions and models that exist.
+
+    Managed files and cache directories that no row references are deleted
+    once they are older than ``grace`` seconds (ARTIFACT_GC_GRACE), which
+    spares uploads, caches and models still being written. Rows whose file
+    is gone are dropped, referenced files without a row get one, and sizes
+    that changed on disk are updated. Returns counts of what was (or would
+    be) done, and the bytes of orphaned files.
+    """
+    from ..models import Artifact
+
+    grace = getattr(settings, 'ARTIFACT_GC_GRACE', 3600) if grace is None else grace
+    cutoff = time.time() - grace
+    referenced = _referenced()
+    on_disk = _on_disk()
+
+    orphans = [path for path, mtime in on_disk.items() if path not in referenced and mtime < cutoff]
+    orphan_bytes = sum(disk_size(path) for path in orphans)
+    if not dry_run:
+        for path in orphans:
+            _remove(path)
+
+    # Legacy model paths may lie outside the scanned roots; check those one by one.
+    existing = {
+        path: info for path, info in referenced.items()
+        if info[0] is not None and (path in on_disk or os.path.exists(path))
+    }
+    rows = {path: (pk, size) for pk, path, size in Artifact.objects.values_list('pk', 'path', 'size').iterator()}
+    stale = [pk for path, (pk, _) in rows.items() if path not in existing]
+    created = []
+    resized = []
+    for path, (kind, model_pk) in existing.items():
+        size = disk_size(path)
+        if path not in rows:
+            created.append(Artifact(path=path, kind=kind, size=size, trained_model_id=model_pk))
+        elif rows[path][1] != size:
+            resized.append(Artifact(pk=rows[path][0], size=size))
+    if not dry_run:
+        for start in range(0, len(stale), BULK_BATCH_SIZE):
+            Artifact.objects.filter(pk__in=stale[start:start + BULK_BATCH_SIZE]).delete()
+        Artifact.objects.bulk_create(created, batch_size=BULK_BATCH_SIZE)
+        Artifact.objects.bulk_update(resized, ['size'], batch_size=BULK_BATCH_SIZE)
+
+    return {
+        'orphans': len(orphans),
+        'orphan_bytes': orphan_bytes,
+        'stale_rows': len(stale),
+        'created_rows': len(created),
+        'resized_rows': len(resized),
+    }
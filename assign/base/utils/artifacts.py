@@ -0,0 +1,157 @@
+"""Model artifacts that worker processes can memory-map instead of unpickling.
+
+Artifacts are written uncompressed by default (``MODEL_ARTIFACT_COMPRESS = 0``)
+and loaded with ``joblib.load(mmap_mode='r')``, so the numpy arrays inside
+them are backed by the page cache and every worker serving a model shares a
+single copy. A compression level trades that for smaller files, for models
+kept in cold storage; such artifacts still load, just privately per process.
+
+scikit-learn's tree objects copy their node arrays into their own buffers
+when unpickled, so forests also get a flat layout next to the model pickle:
+every tree's nodes concatenated into contiguous arrays, which ``FlatForest``
+traverses directly from the memory map.
+"""
+import os
+import warnings
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from sklearn.ensemble import ExtraTreesClassifier, ExtraTreesRegressor, RandomForestClassifier, RandomForestRegressor
+
+from .forest_inference import KERNELS
+
+FOREST_TYPES = (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor)
+# Rows of a sparse batch densified at a time for the flat traversal.
+SPARSE_BLOCK_ROWS = 1024
+
+
+def forest_path_for(model_path):
+    return model_path.replace('.joblib', '_forest.joblib')
+
+
+def compress_level():
+    return getattr(settings, 'MODEL_ARTIFACT_COMPRESS', 0)
+
+
+def save_artifact(obj, path, compress=None):
+    """Dump ``obj`` to ``path`` atomically, uncompressed unless a level is given or configured."""
+    compress = compress_level() if compress is None else compress
+    tmp_path = f'{path}.tmp'
+    joblib.dump(obj, tmp_path, compress=compress)
+    os.replace(tmp_path, path)
+    return [path]
+
+
+def load_artifact(path):
+    with warnings.catch_warnings():
+        # Compressed artifacts cannot be memory-mapped; joblib loads them normally.
+        warnings.filterwarnings('ignore', message='.*mmap_mode.*', category=UserWarning)
+        return joblib.load(path, mmap_mode='r')
+
+
+class FlatForest:
+    """A fitted random forest as contiguous node arrays, predicting like the estimator it came from.
+
+    ``left``/``right`` hold global node indices (-1 at leaves) and ``roots``
+    the first node of each tree. Batches are scored by one of the kernels in
+    ``forest_inference``, which match sklearn's predictions exactly.
+    """
+
+    def __init__(self, arrays, backend='numpy'):
+        self.arrays = arrays
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.missing_left = arrays['missing_left']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.n_features_in_ = int(arrays['n_features'])
+        self.is_classifier = 'classes' in arrays
+        if self.is_classifier:
+            self.classes_ = arrays['classes']
+        self.backend = backend
+        self._kernel = KERNELS[backend]
+
+    @classmethod
+    def from_estimator(cls, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        def children(tree, offset, side):
+            nodes = getattr(tree, side).astype(np.int64)
+            return np.where(nodes >= 0, nodes + offset, -1)
+
+        arrays = {
+            'n_features': model.n_features_in_,
+            'roots': offsets,
+            'feature': np.concatenate([tree.feature for tree in trees]).astype(np.int32),
+            'threshold': np.concatenate([tree.threshold for tree in trees]).astype(np.float64),
+            'left': np.concatenate([children(tree, offset, 'children_left') for tree, offset in zip(trees, offsets)]),
+            'right': np.concatenate([children(tree, offset, 'children_right') for tree, offset in zip(trees, offsets)]),
+            'missing_left': np.concatenate([tree.missing_go_to_left for tree in trees]).astype(bool),
+        }
+        if hasattr(model, 'classes_'):
+            arrays['classes'] = model.classes_
+            arrays['value'] = np.concatenate([tree.value[:, 0, :model.n_classes_] for tree in trees])
+        else:
+            arrays['value'] = np.concatenate([tree.value[:, 0, 0] for tree in trees])
+        return cls(arrays)
+
+    @classmethod
+    def load(cls, path, backend='numpy'):
+        return cls(load_artifact(path), backend)
+
+    def save(self, path, compress=None):
+        return save_artifact(self.arrays, path, compress)
+
+    def _validate(self, X):
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model is expecting {self.n_features_in_} features as input.")
+        if sp.issparse(X):
+            return X.tocsr().astype(np.float32)
+        # Trees compare float32 inputs with float64 thresholds, as sklearn does.
+        return np.asarray(X, dtype=np.float32)
+
+    def _output(self, X):
+        if not sp.issparse(X):
+            return self._kernel(X, self)
+        blocks = [
+            self._kernel(X[start:start + SPARSE_BLOCK_ROWS].toarray(), self)
+            for start in range(0, X.shape[0], SPARSE_BLOCK_ROWS)
+        ]
+        return np.concatenate(blocks) if blocks else self._kernel(np.empty((0, X.shape[1]), dtype=np.float32), self)
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._output(self._validate(X))
+
+    def predict(self, X):
+        output = self._output(self._validate(X))
+        if self.is_classifier:
+            return self.classes_.take(np.argmax(output, axis=1), axis=0)
+        return output
+
+
+def write_model_artifacts(model, model_path, compress=None):
+    """Persist a trained model, plus its flat forest layout when it is a forest; returns the paths written."""
+    paths = save_artifact(model, model_path, compress)
+    if isinstance(model, FOREST_TYPES):
+        paths += FlatForest.from_estimator(model).save(forest_path_for(model_path), compress)
+    return paths
+
+
+def convert_model_artifacts(model_path, compress=None):
+    """Rewrite an existing model's artifacts in the current layout at ``compress``; returns the paths written."""
+    from .model_cache import encoder_path_for, preprocessor_path_for
+
+    model = joblib.load(model_path)
+    paths = write_model_artifacts(model, model_path, compress)
+    for path in (encoder_path_for(model_path), preprocessor_path_for(model_path)):
+        if os.path.exists(path):
+            paths += save_artifact(joblib.load(path), path, compress)
+    return paths
@@ -0,0 +1,309 @@
+import math
+import multiprocessing
+import multiprocessing.util
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier, HistGradientBoostingRegressor,
+    RandomForestClassifier, RandomForestRegressor,
+)
+from sklearn.inspection import permutation_importance
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.metrics import f1_score, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+try:
+    import xgboost
+except ImportError:
+    xgboost = None
+
+# Workers are spawned, and this module must stay importable there without django.setup():
+# everything a candidate evaluation needs is passed in explicitly.
+
+DEFAULT_CANDIDATE = {'family': 'random_forest', 'params': {'n_estimators': 100}}
+
+PARAM_GRID = {
+    'random_forest': [
+        {'n_estimators': 100},
+        {'n_estimators': 300, 'min_samples_leaf': 2},
+        {'n_estimators': 200, 'max_features': 0.5},
+    ],
+    'hist_gradient_boosting': [
+        {'learning_rate': 0.1, 'max_leaf_nodes': 31},
+        {'learning_rate': 0.05, 'max_leaf_nodes': 63},
+        {'learning_rate': 0.1, 'max_leaf_nodes': 15, 'l2_regularization': 1.0},
+    ],
+    'linear': [
+        {'C': 1.0},
+        {'C': 0.1},
+    ],
+    'xgboost': [
+        {'n_estimators': 300, 'max_depth': 6, 'learning_rate': 0.1},
+        {'n_estimators': 300, 'max_depth': 4, 'learning_rate': 0.05},
+    ],
+}
+
+
+class LabelEncodedClassifier:
+    """Fits an estimator that only accepts 0..k-1 labels (XGBoost) on arbitrary class labels."""
+
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def fit(self, X, y):
+        self.classes_, codes = np.unique(np.asarray(y), return_inverse=True)
+        self.estimator.fit(X, codes)
+        return self
+
+    def predict(self, X):
+        return self.classes_[np.asarray(self.estimator.predict(X)).astype(np.int64)]
+
+    @property
+    def feature_importances_(self):
+        return self.estimator.feature_importances_
+
+    def get_params(self, deep=True):
+        return self.estimator.get_params(deep)
+
+    def set_params(self, **params):
+        self.estimator.set_params(**params)
+        return self
+
+
+def build_estimator(candidate, is_classification, sparse=False, n_jobs=None):
+    family = candidate['family']
+    params = dict(candidate['params'])
+    if family == 'random_forest':
+        cls = RandomForestClassifier if is_classification else RandomForestRegressor
+        return cls(random_state=42, n_jobs=n_jobs, **params)
+    if family == 'hist_gradient_boosting':
+        cls = HistGradientBoostingClassifier if is_classification else HistGradientBoostingRegressor
+        return cls(random_state=42, **params)
+    if family == 'linear':
+        scaler = StandardScaler(with_mean=not sparse)
+        if is_classification:
+            return make_pipeline(scaler, LogisticRegression(max_iter=1000, **params))
+        return make_pipeline(scaler, Ridge(alpha=1.0 / params['C']))
+    if family == 'xgboost':
+        if is_classification:
+            return LabelEncodedClassifier(xgboost.XGBClassifier(tree_method='hist', random_state=42, n_jobs=n_jobs, **params))
+        return xgboost.XGBRegressor(tree_method='hist', random_state=42, n_jobs=n_jobs, **params)
+    raise ValueError(f"Unknown model family '{family}'")
+
+
+def candidate_space(is_classification, sparse=False, families=None):
+    families = families or getattr(settings, 'AUTOML_CANDIDATES', list(PARAM_GRID))
+    candidates = []
+    for family in families:
+        if family not in PARAM_GRID:
+            raise ValueError(f"Unknown model family '{family}' in AUTOML_CANDIDATES")
+        if family == 'xgboost' and xgboost is None:
+            continue
+        if family == 'hist_gradient_boosting' and sparse:
+            continue
+        candidates.extend({'family': family, 'params': params} for params in PARAM_GRID[family])
+    return candidates or [DEFAULT_CANDIDATE]
+
+
+def score(y_true, y_pred, is_classification):
+    if is_classification:
+        return float(f1_score(y_true, y_pred, average='weighted', zero_division=0))
+    return float(r2_score(y_true, y_pred))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _candidate_pool():
+    """The process pool candidates are evaluated in, started on first use and kept for later searches."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or getattr(_pool, '_broken', False):
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'AUTOML_WORKERS', None) or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# Training runs inside the training job workers, and a multiprocessing child joins its own
+# children as it exits: the pool's idle workers would wait for work forever and the job
+# worker for them. This finalizer stops the pool first, ahead of the queue finalizers
+# (priority 10) that would otherwise close its call queue before the stop is sent.
+multiprocessing.util.Finalize(None, _shutdown_pool, exitpriority=20)
+
+
+def _terminate_pool(pool):
+    """Kill ``pool``'s workers, including candidates still fitting; the next search starts a new pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    processes = list((pool._processes or {}).values())
+    for process in processes:
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.join(timeout=5)
+
+
+def evaluate_candidate(data_path, candidate, n_rows, is_classification, sparse):
+    # Mapping the split is cheap and the pages are shared through the OS cache; a worker keeps
+    # nothing between candidates, so a finished search's temporary file is not held open.
+    X_fit, y_fit, X_val, y_val = joblib.load(data_path, mmap_mode='r')
+    start = time.perf_counter()
+    try:
+        estimator = build_estimator(candidate, is_classification, sparse, n_jobs=1)
+        # Rows were shuffled before the split was written, so a prefix is a random sample
+        # and slicing it out of the memmap does not copy.
+        estimator.fit(X_fit[:n_rows], y_fit[:n_rows])
+        value = score(y_val, estimator.predict(X_val), is_classification)
+        error = None
+    except Exception as e:
+        value, error = None, str(e)
+    return {'score': value, 'seconds': time.perf_counter() - start, 'error': error}
+
+
+def _rank_key(result):
+    return result['score'] if result['score'] is not None else -math.inf
+
+
+def successive_halving(X, y, is_classification, time_budget, candidates):
+    """Race ``candidates`` on growing row budgets, keeping the best 1/eta each round.
+
+    Returns ``(best_candidate, summary)``. A round is only started when the
+    previous one suggests it will finish, together with the final refit,
+    inside ``time_budget`` seconds. Candidates still running at the deadline
+    are dropped and the pool's workers are killed with them, so they do not
+    compete with the refit; otherwise the pool is reused by the next search.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget
+    eta = getattr(settings, 'AUTOML_HALVING_FACTOR', 3)
+    sparse = sp.issparse(X)
+
+    X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+    n_fit = X_fit.shape[0]
+    rounds = max(1, math.ceil(math.log(len(candidates), eta)))
+    min_rows = min(n_fit, getattr(settings, 'AUTOML_MIN_ROWS', 200))
+    n_rows = max(min_rows, n_fit // eta ** (rounds - 1))
+
+    temp_dir = tempfile.mkdtemp(prefix='automl_', dir=getattr(settings, 'AUTOML_TEMP_DIR', None))
+    data_path = os.path.join(temp_dir, 'split.joblib')
+    joblib.dump((X_fit, np.asarray(y_fit), X_val, np.asarray(y_val)), data_path)
+    executor = _candidate_pool()
+
+    leaderboard = {i: {**candidate, 'rounds': []} for i, candidate in enumerate(candidates)}
+    alive = list(leaderboard)
+    best = None
+    last_round_seconds = None
+    pending = set()
+    try:
+        while alive:
+            if last_round_seconds is not None:
+                expected = last_round_seconds * eta + last_round_seconds * n_fit / max(n_rows, 1)
+                if time.perf_counter() + expected > deadline:
+                    break
+            futures = {
+                executor.submit(evaluate_candidate, data_path, candidates[i], n_rows, is_classification, sparse): i
+                for i in alive
+            }
+            done, pending = wait(futures, timeout=max(0.0, deadline - time.perf_counter()))
+            if pending:
+                _terminate_pool(executor)
+            results = []
+            for future in done:
+                i = futures[future]
+                result = {'rows': n_rows, **future.result()}
+                leaderboard[i]['rounds'].append(result)
+                if result['score'] is not None:
+                    results.append((i, result))
+            if not results:
+                break
+            results.sort(key=lambda item: _rank_key(item[1]), reverse=True)
+            best = results[0][0]
+            last_round_seconds = max(result['seconds'] for _, result in results)
+            if pending or len(results) == 1 or (n_rows >= n_fit and len(results) <= eta):
+                break
+            alive = [i for i, _ in results[:max(1, len(results) // eta)]]
+            n_rows = min(n_fit, n_rows * eta)
+    finally:
+        if any(not future.done() for future in pending):
+            _terminate_pool(executor)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    summary = {
+        'time_budget': time_budget,
+        'search_seconds': time.perf_counter() - start,
+        'candidates': [
+            {
+                'family': entry['family'],
+                'params': entry['params'],
+                'rounds': entry['rounds'],
+                'best_score': max((r['score'] for r in entry['rounds'] if r['score'] is not None), default=None),
+            }
+            for entry in leaderboard.values()
+        ],
+    }
+    return (candidates[best] if best is not None else None), summary
+
+
+def select_model(X_train, y_train, is_classification, time_budget=None):
+    """Search for the best candidate within ``time_budget`` seconds and refit it on all of ``X_train``.
+
+    A budget of 0 skips the search and fits the default random forest.
+    Returns ``(fitted_model, search_results)``.
+    """
+    if time_budget is None:
+        time_budget = getattr(settings, 'AUTOML_TIME_BUDGET', 60)
+    sparse = sp.issparse(X_train)
+    candidates = candidate_space(is_classification, sparse)
+
+    best, summary = None, {'time_budget': time_budget, 'search_seconds': 0.0, 'candidates': []}
+    if time_budget > 0 and len(candidates) > 1:
+        best, summary = successive_halving(X_train, y_train, is_classification, time_budget, candidates)
+    best = best or DEFAULT_CANDIDATE
+
+    start = time.perf_counter()
+    model = build_estimator(best, is_classification, sparse, n_jobs=getattr(settings, 'AUTOML_N_JOBS', -1))
+    model.fit(X_train, y_train)
+    # Serving predicts a handful of rows at a time; a thread pool per call would cost more than it saves.
+    if 'n_jobs' in model.get_params(deep=False):
+        model.set_params(n_jobs=None)
+    summary['refit_seconds'] = time.perf_counter() - start
+    summary['best'] = best
+    return model, summary
+
+
+def feature_importances(model, X, y, max_rows=2000):
+    estimator = model.steps[-1][1] if hasattr(model, 'steps') else model
+    if hasattr(estimator, 'feature_importances_'):
+        values = np.asarray(estimator.feature_importances_, dtype=np.float64)
+    elif hasattr(estimator, 'coef_'):
+        # Inputs are standardized, so coefficient magnitudes are comparable across features.
+        values = np.abs(np.atleast_2d(estimator.coef_)).mean(axis=0)
+    else:
+        result = permutation_importance(model, X[:max_rows], np.asarray(y)[:max_rows], n_repeats=3, random_state=42)
+        values = np.clip(result.importances_mean, 0, None)
+    total = values.sum()
+    return values / total if total > 0 else values
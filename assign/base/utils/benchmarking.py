@@ -0,0 +1,270 @@
+"""Synthetic data and microbenchmarks for the profiling and ML pipeline functions.
+
+Every benchmark case runs in its own freshly spawned process, so peak RSS
+is not inflated by earlier cases. Wall time is the median over
+``repeat`` timed runs after one warm-up. Allocations are measured with
+tracemalloc in one extra run, because tracing slows the code down.
+"""
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from .forest_inference import numba
+
+SIZES = {
+    'small': {'rows': 1000, 'numeric_cols': 5, 'categorical_cols': 3, 'cardinality': 10},
+    'medium': {'rows': 20000, 'numeric_cols': 10, 'categorical_cols': 5, 'cardinality': 50},
+    'large': {'rows': 100000, 'numeric_cols': 20, 'categorical_cols': 8, 'cardinality': 200},
+}
+
+# Rows per batch in the forest_predict cases, small enough that per-tree dispatch dominates.
+FOREST_BATCH_ROWS = 10
+
+# Metrics compared against a baseline; all of them are "lower is better".
+COMPARED_METRICS = ['wall_seconds', 'tracemalloc_peak_bytes', 'rss_delta_bytes']
+
+
+def generate_csv(path, rows=1000, numeric_cols=5, categorical_cols=3, cardinality=10,
+                 null_rate=0.05, datetime_cols=1, seed=0):
+    """Write a CSV with a binary 'target' column that depends on the features."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    signal = np.zeros(rows)
+    for i in range(numeric_cols):
+        values = rng.normal(loc=i, scale=1 + i, size=rows)
+        signal += values / (1 + i)
+        data[f'num_{i}'] = values
+    for i in range(categorical_cols):
+        codes = rng.integers(0, cardinality, size=rows)
+        signal += (codes % 2) - 0.5
+        data[f'cat_{i}'] = np.char.add(f'c{i}_', codes.astype(str)).astype(object)
+    start = np.datetime64('2020-01-01')
+    for i in range(datetime_cols):
+        data[f'date_{i}'] = (start + rng.integers(0, 1500, size=rows).astype('timedelta64[D]')).astype(str).astype(object)
+    frame = pd.DataFrame(data)
+    if null_rate:
+        for col in frame.columns:
+            frame.loc[rng.random(rows) < null_rate, col] = None
+    frame['target'] = np.where(signal + rng.normal(scale=0.5, size=rows) > np.median(signal), 'yes', 'no')
+    frame.to_csv(path, index=False)
+    return path
+
+
+# Each case is (setup, run): setup(csv_path) returns the argument run() is timed with.
+
+def _setup_path(path):
+    return path
+
+
+def _run_infer_schema(path):
+    from .data_profiling import infer_schema_and_metadata
+    infer_schema_and_metadata(path)
+
+
+def _setup_columns(path):
+    return pd.read_csv(path)
+
+
+def _run_infer_column_type(frame):
+    from .data_profiling import infer_column_type
+    for col in frame.columns:
+        infer_column_type(frame[col])
+
+
+def _run_detect_outliers(frame):
+    from .data_profiling import detect_outliers
+    for col in frame.columns:
+        detect_outliers(frame[col])
+
+
+def _run_train_model(path):
+    from .ml_pipeline import train_model
+    # A zero time budget fits the single default model, which keeps timings comparable.
+    train_model(path, 'target', time_budget=0)
+
+
+def _setup_trained_model(path, rows=None):
+    from .ml_pipeline import train_model, predict
+    model_path, _, _, steps, _ = train_model(path, 'target', time_budget=0)
+    records = pd.read_csv(path, nrows=rows or 1).drop(columns=['target'])
+    records = [{k: (None if v != v else v) for k, v in r.items()} for r in records.to_dict('records')]
+    predict(model_path, steps, records[0], model_id='benchmark')
+    return model_path, steps, records
+
+
+def _setup_batch_model(path):
+    return _setup_trained_model(path, rows=1000)
+
+
+def _run_predict(args):
+    from .ml_pipeline import predict
+    model_path, steps, records = args
+    predict(model_path, steps, records[0] if len(records) == 1 else records, model_id='benchmark')
+
+
+def _setup_forest(path, backend):
+    from .artifacts import FlatForest, forest_path_for, load_artifact
+    from .ml_pipeline import train_model
+    from .model_cache import preprocessor_path_for
+    model_path, _, _, steps, _ = train_model(path, 'target', time_budget=0)
+    records = pd.read_csv(path, nrows=FOREST_BATCH_ROWS).drop(columns=['target']).to_dict('records')
+    matrix = load_artifact(preprocessor_path_for(model_path)).transform(records)
+    estimator = load_artifact(model_path)
+    if backend == 'sklearn':
+        return estimator, matrix
+    forest = FlatForest.load(forest_path_for(model_path), backend)
+    if not np.array_equal(forest.predict_proba(matrix), estimator.predict_proba(matrix)):
+        raise ValueError(f"The {backend} forest backend does not match sklearn's predict_proba")
+    return forest, matrix
+
+
+def _run_forest_predict(args):
+    model, matrix = args
+    model.predict_proba(matrix)
+
+
+CASES = {
+    'infer_schema_and_metadata': (_setup_path, _run_infer_schema),
+    'infer_column_type': (_setup_columns, _run_infer_column_type),
+    'detect_outliers': (_setup_columns, _run_detect_outliers),
+    'train_model': (_setup_path, _run_train_model),
+    'predict_single': (_setup_trained_model, _run_predict),
+    'predict_batch': (_setup_batch_model, _run_predict),
+    # The same trained forest scored by each inference backend.
+    'forest_predict_sklearn': (partial(_setup_forest, backend='sklearn'), _run_forest_predict),
+    'forest_predict_numpy': (partial(_setup_forest, backend='numpy'), _run_forest_predict),
+}
+if numba is not None:
+    CASES['forest_predict_numba'] = (partial(_setup_forest, backend='numba'), _run_forest_predict)
+
+
+def _max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _init_worker(artifact_root):
+    import django
+    from django.conf import settings
+    django.setup()
+    # Models the cases train go to a scratch directory, not among the real, quota-tracked ones.
+    settings.ARTIFACT_ROOT = artifact_root
+
+
+def run_case(name, csv_path, repeat):
+    setup, run = CASES[name]
+    arg = setup(csv_path)
+    run(arg)
+    rss_before = _max_rss_bytes()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(arg)
+        timings.append(time.perf_counter() - start)
+    rss_after = _max_rss_bytes()
+
+    tracemalloc.start()
+    run(arg)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'wall_seconds': statistics.median(timings),
+        'wall_min_seconds': min(timings),
+        'repeat': repeat,
+        'peak_rss_bytes': rss_after,
+        'rss_delta_bytes': rss_after - rss_before,
+        'tracemalloc_peak_bytes': traced_peak,
+    }
+
+
+def environment():
+    import sklearn
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def run_benchmarks(cases=None, sizes=None, repeat=5, null_rate=0.05, datetime_cols=1, log=None):
+    cases = cases or list(CASES)
+    sizes = sizes or ['small', 'medium']
+    unknown = [case for case in cases if case not in CASES] + [size for size in sizes if size not in SIZES]
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases or sizes: {unknown}")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='benchmark_') as work_dir:
+        for size in sizes:
+            csv_path = generate_csv(
+                os.path.join(work_dir, f'{size}.csv'), null_rate=null_rate, datetime_cols=datetime_cols, **SIZES[size]
+            )
+            for case in cases:
+                artifact_root = tempfile.mkdtemp(prefix='artifacts_', dir=work_dir)
+                try:
+                    with ProcessPoolExecutor(
+                        max_workers=1,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(artifact_root,),
+                    ) as executor:
+                        result = executor.submit(run_case, case, csv_path, repeat).result()
+                finally:
+                    shutil.rmtree(artifact_root, ignore_errors=True)
+                key = f'{case}[{size}]'
+                results[key] = result
+                if log:
+                    log(key, result)
+    return {'environment': environment(), 'results': results}
+
+
+def compare(current, baseline, threshold=0.2):
+    """Return one row per shared benchmark and metric, flagging ratios above ``1 + threshold``."""
+    rows = []
+    for key, result in current['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            ratio = new / old
+            rows.append({
+                'benchmark': key,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'ratio': ratio,
+                'regression': ratio > 1 + threshold,
+            })
+    return rows
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,68 @@
+"""Content-addressed storage for uploaded files.
+
+Uploads are streamed to a temporary file under MEDIA_ROOT while their
+SHA-256 is computed, then moved to ``blobs/<aa>/<sha256><ext>``. A file
+whose content is already stored is dropped and the existing blob is
+reused, so every distinct upload is kept once however often it is sent.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+BLOB_SUBDIR = 'blobs'
+
+
+def blob_name_for(content_hash, extension=''):
+    return os.path.join(BLOB_SUBDIR, content_hash[:2], content_hash + extension.lower())
+
+
+def store_upload(uploaded_file):
+    """Write ``uploaded_file`` to the blob store; return ``(name, content_hash, created)``."""
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, BLOB_SUBDIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        try:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+                tmp.write(chunk)
+        except Exception:
+            os.remove(tmp.name)
+            raise
+    return commit_blob(tmp.name, digest.hexdigest(), os.path.splitext(uploaded_file.name)[1])
+
+
+def commit_blob(tmp_path, content_hash, extension=''):
+    """Move a fully written temporary file into the store under its content hash."""
+    name = blob_name_for(content_hash, extension)
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return name, content_hash, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Same filesystem, so the blob appears atomically and concurrent identical uploads are harmless.
+    os.replace(tmp_path, path)
+    return name, content_hash, True
+
+
+def reusable_session(content_hash):
+    """An earlier, profiled upload of the same content whose columnar cache is still there, if any."""
+    from ..models import FileUpload
+
+    previous = (FileUpload.objects.filter(content_hash=content_hash, metadata__isnull=False)
+                .only('id', 'metadata').order_by('-uploaded_at').first())
+    if previous is None:
+        return None
+    cache = previous.metadata.get('columnar_cache')
+    if cache and not os.path.isdir(os.path.join(settings.MEDIA_ROOT, cache['path'])):
+        return None
+    return previous
+
+
+def delete_blob(name):
+    try:
+        os.remove(os.path.join(settings.MEDIA_ROOT, name))
+    except FileNotFoundError:
+        pass
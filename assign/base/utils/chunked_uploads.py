@@ -0,0 +1,145 @@
+"""Resumable uploads sent as a sequence of raw byte ranges.
+
+Each PUT is streamed straight into ``blobs/tmp/<upload_id>.part`` in
+fixed-size reads, so memory use does not depend on the chunk or file size.
+The committed offset and a running CRC32 only advance by what was actually
+written; a client whose connection dropped asks for the offset and carries
+on from there. The first bytes are sniffed so that files which are not
+comma-separated UTF-8 text are rejected before the rest is sent.
+"""
+import codecs
+import csv
+import hashlib
+import os
+import re
+import zlib
+
+from django.conf import settings
+
+from .blob_store import BLOB_SUBDIR
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected):
+        super().__init__(f"Chunk must start at offset {expected}")
+        self.expected = expected
+
+
+def part_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, BLOB_SUBDIR, 'tmp', f'{upload.upload_id}.part')
+
+
+def parse_offset(content_range, offset_param):
+    """Return ``(offset, length, total)`` from a Content-Range header or an ``offset`` query parameter."""
+    if content_range:
+        match = CONTENT_RANGE.match(content_range.strip())
+        if not match:
+            raise ValueError(f"Malformed Content-Range header '{content_range}', expected 'bytes start-end/total'")
+        start, end, total = match.groups()
+        start, end = int(start), int(end)
+        if end < start:
+            raise ValueError("Content-Range end is before its start")
+        return start, end - start + 1, None if total == '*' else int(total)
+    if offset_param in (None, ''):
+        raise ValueError("Send a Content-Range header or an offset query parameter")
+    try:
+        return int(offset_param), None, None
+    except ValueError:
+        raise ValueError(f"offset must be an integer, got '{offset_param}'")
+
+
+def sniff_csv(head, complete):
+    """Validate the start of an upload; return the detected dialect details.
+
+    ``complete`` says whether ``head`` is the whole file, so a header line
+    without a trailing newline can be told apart from a truncated one.
+    """
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        raise ValueError("File is UTF-16 encoded; upload UTF-8 CSV instead")
+    if b'\x00' in head:
+        raise ValueError("File looks binary, not like a CSV")
+    try:
+        # A multi-byte character may be cut off at the end of the sniffed bytes.
+        text = codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=complete)
+    except UnicodeDecodeError as e:
+        raise ValueError(f"File is not UTF-8 encoded: {e.reason} at byte {e.start}")
+
+    lines = text.splitlines()
+    if not complete and not text.endswith(('\n', '\r')):
+        lines = lines[:-1]
+    if not lines:
+        if complete:
+            raise ValueError("File is empty")
+        return {'encoding': 'utf-8', 'delimiter': None, 'columns': None}
+
+    header = next(csv.reader([lines[0]]))
+    sample = '\n'.join(lines[:50])
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        delimiter = ','
+    if delimiter != ',' and lines[0].count(delimiter) > lines[0].count(','):
+        raise ValueError(f"File appears to be separated by {delimiter!r}; only comma-separated files are supported")
+    if len(header) < 2:
+        raise ValueError("CSV header must name at least two columns")
+    if any(not name.strip() for name in header):
+        raise ValueError("CSV header has an empty column name")
+    return {'encoding': 'utf-8', 'delimiter': ',', 'columns': header}
+
+
+def append_chunk(upload, offset, read, length=None):
+    """Write the request body at ``offset`` and advance ``upload`` by the bytes received.
+
+    ``read(size)`` is the request stream. Returns the number of bytes written.
+    The caller holds a lock on the upload row and saves it afterwards.
+    """
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)
+    block_size = getattr(settings, 'CHUNKED_UPLOAD_READ_SIZE', 1024 * 1024)
+    limit = upload.total_size if upload.total_size is not None else getattr(settings, 'CHUNKED_UPLOAD_MAX_BYTES', None)
+
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    crc = upload.crc32
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        # Bytes past the committed offset are from a chunk that never finished; overwrite them.
+        f.seek(offset)
+        f.truncate()
+        while length is None or written < length:
+            data = read(block_size if length is None else min(block_size, length - written))
+            if not data:
+                break
+            if limit is not None and offset + written + len(data) > limit:
+                raise ValueError(f"Upload exceeds its size of {limit} bytes")
+            f.write(data)
+            crc = zlib.crc32(data, crc)
+            written += len(data)
+
+    # Sniff until a full header line has been seen, which is normally on the first chunk.
+    sniff_bytes = getattr(settings, 'CHUNKED_UPLOAD_SNIFF_BYTES', 64 * 1024)
+    if written and offset < sniff_bytes and (upload.dialect or {}).get('columns') is None:
+        with open(path, 'rb') as f:
+            head = f.read(sniff_bytes)
+        upload.dialect = sniff_csv(head, complete=upload.total_size == offset + written)
+
+    upload.offset = offset + written
+    upload.crc32 = crc
+    return written
+
+
+def sha256_file(path, block_size=8 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discard_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,263 @@
+"""Typed, per-column .npy cache of an uploaded CSV.
+
+Each upload is parsed once into one memory-mappable array per column, grouped
+in row segments (one per build or append). Numeric and boolean columns are
+stored as-is; text columns are dictionary-encoded into int32 codes (-1 for
+missing) with their categories kept in a JSON file next to the segments.
+Readers get back the same frame ``pd.read_csv`` would have produced, but only
+for the columns they ask for and, for single-segment numeric columns, backed
+directly by the memory map.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+CACHE_SUBDIR = 'columnar'
+
+
+def cache_path_for(cache_key):
+    return os.path.join(CACHE_SUBDIR, str(cache_key))
+
+
+def _root(cache):
+    return os.path.join(settings.MEDIA_ROOT, cache['path'])
+
+
+def _chunk_kind(series):
+    if series.dtype.kind == 'b':
+        return 'bool'
+    if series.dtype.kind in 'iuf':
+        return 'numeric'
+    return 'category'
+
+
+def _as_text(values):
+    # A column that turned out to hold text may have numeric chunks; spell them the
+    # way read_csv would have (booleans stay booleans, NaN stays missing).
+    text = []
+    for value in values.tolist():
+        if isinstance(value, float) and np.isnan(value):
+            text.append(None)
+        elif isinstance(value, bool):
+            text.append(value)
+        else:
+            text.append(str(value))
+    return np.array(text, dtype=object)
+
+
+class _ColumnWriter:
+    def __init__(self, spec, staging_dir, categories):
+        self.spec = spec
+        self.staging_dir = staging_dir
+        self.categories = categories
+        self.lookup = {value: code for code, value in enumerate(categories)}
+        self.parts = []
+
+    def _encode(self, values):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = -1
+        for i, value in enumerate(uniques.tolist()):
+            if value not in self.lookup:
+                self.lookup[value] = len(self.categories)
+                self.categories.append(value)
+            mapping[i] = self.lookup[value]
+        return mapping[codes]
+
+    def add(self, series):
+        kind = _chunk_kind(series)
+        if kind == 'category':
+            values = self._encode(series.to_numpy(dtype=object))
+        else:
+            values = series.to_numpy()
+        path = os.path.join(self.staging_dir, f"{self.spec['file']}_{len(self.parts)}.npy")
+        np.save(path, values)
+        self.parts.append((kind, path))
+
+    def finalize(self, segment_dir, rows):
+        kinds = {kind for kind, _ in self.parts}
+        kind = self.spec.get('kind')
+        if 'category' in kinds or kind == 'category':
+            if kind in ('numeric', 'bool'):
+                raise ValueError(f"Column '{self.spec['name']}' holds text values but is cached as {kind}")
+            kind, dtype = 'category', 'int32'
+        elif kinds == {'bool'} and kind in (None, 'bool'):
+            kind, dtype = 'bool', 'bool'
+        else:
+            # Segments keep their own numeric dtype; readers let NumPy promote across them.
+            dtypes = [np.load(path, mmap_mode='r').dtype for _, path in self.parts]
+            kind, dtype = 'numeric', (np.result_type(*dtypes).name if dtypes else 'float64')
+        self.spec['kind'], self.spec['dtype'] = kind, dtype
+
+        out = np.lib.format.open_memmap(os.path.join(segment_dir, self.spec['file'] + '.npy'), mode='w+', dtype=dtype, shape=(rows,))
+        offset = 0
+        for kind, path in self.parts:
+            values = np.load(path)
+            if self.spec['kind'] == 'category' and kind != 'category':
+                values = self._encode(_as_text(values))
+            out[offset:offset + len(values)] = values
+            offset += len(values)
+            os.remove(path)
+        out.flush()
+        del out
+        self.spec['categories'] = len(self.categories)
+
+
+def _write_segment(cache, chunks):
+    root = _root(cache)
+    segment = f"seg{len(cache['segments']):04d}"
+    segment_dir = os.path.join(root, segment)
+    staging_dir = os.path.join(root, segment + '.staging')
+    os.makedirs(segment_dir, exist_ok=True)
+    os.makedirs(staging_dir, exist_ok=True)
+
+    writers = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if writers is None:
+                if not cache['columns']:
+                    cache['columns'] = [{'name': col, 'file': f'col{i:05d}', 'kind': None, 'dtype': None} for i, col in enumerate(chunk.columns)]
+                elif list(chunk.columns) != [col['name'] for col in cache['columns']]:
+                    raise ValueError("Appended data must have the same columns as the original upload")
+                writers = [_ColumnWriter(spec, staging_dir, _load_categories(root, spec)) for spec in cache['columns']]
+            for writer, col in zip(writers, chunk.columns):
+                writer.add(chunk[col])
+            rows += len(chunk)
+
+        for writer in writers or []:
+            writer.finalize(segment_dir, rows)
+            if writer.spec['kind'] == 'category':
+                with open(os.path.join(root, writer.spec['file'] + '.categories.json'), 'w') as f:
+                    json.dump(writer.categories, f)
+    except Exception:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+        raise
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    cache['segments'].append({'name': segment, 'rows': rows})
+    cache['row_count'] += rows
+    return cache
+
+
+def build_columnar_cache(file_path, cache_key, chunk_size=None):
+    chunk_size = chunk_size or getattr(settings, 'PROFILE_CHUNK_SIZE', 50000)
+    cache = {'path': cache_path_for(cache_key), 'row_count': 0, 'segments': [], 'columns': []}
+    shutil.rmtree(_root(cache), ignore_errors=True)
+    try:
+        return _write_segment(cache, pd.read_csv(file_path, chunksize=chunk_size))
+    except Exception:
+        delete_columnar_cache(cache)
+        raise
+
+
+def fork_columnar_cache(cache, cache_key):
+    """A copy of ``cache`` under ``cache_key`` that can be appended to without touching the original.
+
+    Segments never change once written, so their arrays are hard-linked; the
+    category lists, which appends rewrite, are copied.
+    """
+    fork = json.loads(json.dumps(cache))
+    fork['path'] = cache_path_for(cache_key)
+    source, target = _root(cache), _root(fork)
+    shutil.rmtree(target, ignore_errors=True)
+    try:
+        for segment in cache['segments']:
+            os.makedirs(os.path.join(target, segment['name']))
+            for spec in cache['columns']:
+                name = os.path.join(segment['name'], spec['file'] + '.npy')
+                os.link(os.path.join(source, name), os.path.join(target, name))
+        for spec in cache['columns']:
+            if spec['kind'] == 'category':
+                name = spec['file'] + '.categories.json'
+                shutil.copyfile(os.path.join(source, name), os.path.join(target, name))
+    except Exception:
+        delete_columnar_cache(fork)
+        raise
+    return fork
+
+
+def append_columnar_cache(cache, chunks):
+    """Add ``chunks`` to ``cache`` as a new segment; returns the updated cache."""
+    return _write_segment(cache, chunks)
+
+
+def delete_columnar_cache(cache):
+    if cache:
+        shutil.rmtree(_root(cache), ignore_errors=True)
+
+
+def _load_categories(root, spec):
+    path = os.path.join(root, spec['file'] + '.categories.json')
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+class _Reader:
+    def __init__(self, cache, columns=None):
+        self.cache = cache
+        self.root = _root(cache)
+        specs = {spec['name']: spec for spec in cache['columns']}
+        names = [spec['name'] for spec in cache['columns']] if columns is None else list(columns)
+        missing = [name for name in names if name not in specs]
+        if missing:
+            raise ValueError(f"Columns not in cache: {missing}")
+        self.specs = [specs[name] for name in names]
+        self.categories = {}
+        for spec in self.specs:
+            if spec['kind'] == 'category':
+                # Trailing NaN lets code -1 index straight into the missing value.
+                values = _load_categories(self.root, spec) + [np.nan]
+                self.categories[spec['name']] = np.array(values, dtype=object)
+
+    def array(self, spec, segment):
+        return np.load(os.path.join(self.root, segment['name'], spec['file'] + '.npy'), mmap_mode='r')
+
+    def decode(self, spec, values):
+        if spec['kind'] == 'category':
+            return self.categories[spec['name']].take(values)
+        return values
+
+    def frame(self, arrays):
+        return pd.DataFrame({spec['name']: self.decode(spec, values) for spec, values in zip(self.specs, arrays)}, copy=False)
+
+
+def read_columns(cache, columns=None, last_rows=None):
+    """The cached columns as a frame; ``last_rows`` keeps only that many rows from the end."""
+    reader = _Reader(cache, columns)
+    segments = [(segment, 0) for segment in cache['segments']]
+    if last_rows is not None:
+        segments, needed = [], last_rows
+        for segment in reversed(cache['segments']):
+            if needed <= 0:
+                break
+            segments.insert(0, (segment, max(segment['rows'] - needed, 0)))
+            needed -= segment['rows']
+    arrays = []
+    for spec in reader.specs:
+        parts = [reader.array(spec, segment)[start:] for segment, start in segments]
+        arrays.append(parts[0] if len(parts) == 1 else np.concatenate(parts) if parts else np.empty(0, dtype=spec['dtype']))
+    frame = reader.frame(arrays)
+    if last_rows is not None:
+        frame.index = pd.RangeIndex(cache['row_count'] - len(frame), cache['row_count'])
+    return frame
+
+
+def iter_chunks(cache, chunk_size=None, columns=None, first_segment=0):
+    chunk_size = chunk_size or getattr(settings, 'PROFILE_CHUNK_SIZE', 50000)
+    reader = _Reader(cache, columns)
+    offset = sum(segment['rows'] for segment in cache['segments'][:first_segment])
+    for segment in cache['segments'][first_segment:]:
+        arrays = [reader.array(spec, segment) for spec in reader.specs]
+        for start in range(0, segment['rows'], chunk_size):
+            chunk = reader.frame([values[start:start + chunk_size] for values in arrays])
+            chunk.index = pd.RangeIndex(offset + start, offset + start + len(chunk))
+            yield chunk
+        offset += segment['rows']
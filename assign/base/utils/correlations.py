@@ -0,0 +1,230 @@
+"""Bounded correlation and target-leakage reports for wide tables.
+
+Correlations are read off the profiler's ``CovarianceAccumulator`` one block
+of rows at a time in float32 and only the strongest pairs are kept, so the
+report for a 2,000-column file is at most ``CORRELATION_MAX_PAIRS`` entries
+rather than a 4M-cell matrix. The accumulator itself multiplies its column
+blocks in float32 but keeps its running sums in float64 (see its docstring).
+
+Leakage is scored against the column a model is actually trained on, over a
+sample of rows drawn evenly from the whole upload (a sorted or time-ordered
+file would give misleading scores on its first rows alone): Pearson
+correlation when the column and the target are both numeric, otherwise the
+share of the target's entropy the column explains (mutual information
+divided by the target entropy), with numeric sides cut into quantile bins.
+"""
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+# Cells (rows x columns) of codes handed to one bincount when scoring mutual information.
+MI_BLOCK_CELLS = 1 << 22
+# Numeric targets with fewer distinct values are scored as classes, as in train_model.
+CLASS_TARGET_MAX_VALUES = 10
+SAMPLE_SEED = 42
+
+
+def top_correlations(accumulator, columns, threshold=None, max_pairs=None):
+    """Strongest correlated pairs among ``columns``, strongest first.
+
+    Pairs with ``|r|`` below ``threshold`` are dropped and at most
+    ``max_pairs`` are kept; both default to the CORRELATION_* settings.
+    """
+    if threshold is None:
+        threshold = getattr(settings, 'CORRELATION_THRESHOLD', 0.5)
+    if max_pairs is None:
+        max_pairs = getattr(settings, 'CORRELATION_MAX_PAIRS', 500)
+    if accumulator is None or not max_pairs:
+        return []
+    position = {col: i for i, col in enumerate(accumulator.columns)}
+    columns = [col for col in columns if col in position]
+    index = np.array([position[col] for col in columns], dtype=np.intp)
+    block_size = accumulator.block_size
+
+    strengths = np.empty(0, dtype=np.float32)
+    values = np.empty(0, dtype=np.float32)
+    first = np.empty(0, dtype=np.intp)
+    second = np.empty(0, dtype=np.intp)
+    for start in range(0, len(index), block_size):
+        rows = np.arange(start, min(start + block_size, len(index)))
+        corr = accumulator.correlation(index[rows], index).astype(np.float32)
+        strength = np.abs(corr)
+        # Upper triangle only; NaN strengths compare False and drop out.
+        i, j = np.nonzero((np.arange(len(index))[None, :] > rows[:, None]) & (strength >= threshold))
+        strengths = np.concatenate([strengths, strength[i, j]])
+        values = np.concatenate([values, corr[i, j]])
+        first = np.concatenate([first, rows[i]])
+        second = np.concatenate([second, j])
+        if strengths.size > max_pairs:
+            keep = np.argpartition(-strengths, max_pairs - 1)[:max_pairs]
+            strengths, values, first, second = strengths[keep], values[keep], first[keep], second[keep]
+
+    order = np.lexsort((second, first, -strengths))
+    return [
+        {'columns': [columns[first[k]], columns[second[k]]], 'correlation': round(float(values[k]), 6)}
+        for k in order
+    ]
+
+
+def read_sample(file_path, columnar_cache=None, rows=None, total_rows=None):
+    """About ``rows`` rows (LEAKAGE_SAMPLE_ROWS by default) spread evenly over an upload.
+
+    Every chunk keeps each row with the same probability, drawn from a seeded
+    generator, so the sample is the same on every call. ``total_rows`` is the
+    upload's row count; it is counted when neither it nor a cache is given.
+    """
+    from .columnar_cache import iter_chunks
+
+    rows = rows or getattr(settings, 'LEAKAGE_SAMPLE_ROWS', 200000)
+    chunk_size = getattr(settings, 'PROFILE_CHUNK_SIZE', 50000)
+    if columnar_cache:
+        total_rows = sum(segment['rows'] for segment in columnar_cache['segments'])
+    elif total_rows is None:
+        total_rows = sum(len(chunk) for chunk in pd.read_csv(file_path, usecols=[0], chunksize=chunk_size))
+    chunks = iter_chunks(columnar_cache, chunk_size) if columnar_cache else pd.read_csv(file_path, chunksize=chunk_size)
+
+    fraction = rows / total_rows if total_rows > rows else 1.0
+    rng = np.random.default_rng(SAMPLE_SEED)
+    sample = []
+    for chunk in chunks:
+        sample.append(chunk if fraction == 1.0 else chunk[rng.random(len(chunk)) < fraction])
+    return pd.concat(sample) if sample else pd.DataFrame()
+
+
+def _quantile_codes(values, bins):
+    """Quantile bin of each value (-1 for NaN), and the number of bins used."""
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    if not present.any():
+        return np.full(values.shape, -1, dtype=np.int64), 0
+    edges = np.unique(np.quantile(values[present], np.linspace(0, 1, bins + 1)[1:-1]))
+    codes = np.where(present, np.searchsorted(edges, values, side='right'), -1)
+    return codes.astype(np.int64), edges.size + 1
+
+
+def _codes(series, bins, max_categories):
+    if series.dtype.kind in 'iufb':
+        return _quantile_codes(series.to_numpy(dtype=np.float64, na_value=np.nan), bins)
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    if len(uniques) > max_categories:
+        return None, 0
+    return codes.astype(np.int64), len(uniques)
+
+
+def mutual_information(codes, levels, target_codes, target_levels):
+    """Mutual information of each code column with the target over ``target``'s entropy.
+
+    ``codes`` is a rows x columns int array (-1 for missing) and ``levels``
+    the number of codes per column. Every column's contingency table is
+    counted by one ``bincount`` over offset joint codes; rows missing either
+    side are left out of that column's table.
+    """
+    levels = np.asarray(levels, dtype=np.int64)
+    sizes = levels * target_levels
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    valid = (codes >= 0) & (target_codes >= 0)[:, None]
+    joint = offsets[None, :] + codes * target_levels + target_codes[:, None]
+    counts = np.bincount(joint[valid], minlength=int(sizes.sum())).astype(np.float64)
+
+    scores = np.zeros(len(levels))
+    for k, (offset, size) in enumerate(zip(offsets, sizes)):
+        table = counts[offset:offset + size].reshape(levels[k], target_levels)
+        total = table.sum()
+        if not total:
+            continue
+        p_xy = table / total
+        p_x = p_xy.sum(axis=1, keepdims=True)
+        p_y = p_xy.sum(axis=0, keepdims=True)
+        nonzero = p_xy > 0
+        h_y = -np.sum(p_y[p_y > 0] * np.log(p_y[p_y > 0]))
+        if h_y <= 0:
+            continue
+        mi = np.sum(p_xy[nonzero] * np.log(p_xy[nonzero] / (p_x @ p_y)[nonzero]))
+        scores[k] = min(max(mi / h_y, 0.0), 1.0)
+    return scores
+
+
+def _pearson(frame, target):
+    """Pairwise-complete Pearson correlation of every column of ``frame`` with ``target``, in float32."""
+    x = frame.to_numpy(dtype=np.float32, na_value=np.nan)
+    y = target.to_numpy(dtype=np.float32, na_value=np.nan)[:, None]
+    present = ~np.isnan(x) & ~np.isnan(y)
+    n = present.sum(axis=0)
+    with np.errstate(all='ignore'):
+        x = np.where(present, x, np.float32(0))
+        y = np.where(present, y, np.float32(0))
+        x = np.where(present, x - x.sum(axis=0) / n, np.float32(0))
+        y = np.where(present, y - y.sum(axis=0) / n, np.float32(0))
+        corr = np.einsum('ij,ij->j', x, y) / np.sqrt(np.einsum('ij,ij->j', x, x) * np.einsum('ij,ij->j', y, y))
+    corr[n < 2] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def leakage_scores(frame, target_column, threshold=None, max_columns=None):
+    """Columns of ``frame`` that predict ``target_column`` suspiciously well, strongest first.
+
+    Returns ``[{'column', 'method', 'score'}]`` (plus the signed
+    ``correlation`` for Pearson scores) for scores of at least ``threshold``,
+    at most ``max_columns`` of them; both default to the LEAKAGE_* settings.
+    Text columns with a distinct value for most rows are skipped, since an
+    identifier trivially "explains" any target.
+    """
+    if threshold is None:
+        threshold = getattr(settings, 'LEAKAGE_THRESHOLD', 0.8)
+    if max_columns is None:
+        max_columns = getattr(settings, 'LEAKAGE_MAX_COLUMNS', 20)
+    bins = getattr(settings, 'LEAKAGE_BINS', 16)
+    max_categories = getattr(settings, 'LEAKAGE_MAX_CATEGORIES', 1000)
+
+    names = {str(col).lower(): col for col in frame.columns}
+    if target_column is None or target_column.lower() not in names:
+        return []
+    target = frame[names[target_column.lower()]]
+    features = [col for col in frame.columns if col != target.name]
+    if not features or not len(frame):
+        return []
+
+    results = []
+    numeric = [col for col in features if frame[col].dtype.kind in 'iufb']
+    block = max(1, MI_BLOCK_CELLS // len(frame))
+    if target.dtype.kind in 'iufb' and target.nunique() >= CLASS_TARGET_MAX_VALUES:
+        target_codes, target_levels = _quantile_codes(target.to_numpy(dtype=np.float64, na_value=np.nan), bins)
+        for start in range(0, len(numeric), block):
+            columns = numeric[start:start + block]
+            for col, r in zip(columns, _pearson(frame[columns], target)):
+                if not np.isnan(r):
+                    results.append({'column': col, 'method': 'pearson', 'score': abs(float(r)), 'correlation': float(r)})
+        numeric = set(numeric)
+        scored_by_mi = [col for col in features if col not in numeric]
+    else:
+        target_codes, target_levels = pd.factorize(target, use_na_sentinel=True)
+        target_codes, target_levels = target_codes.astype(np.int64), len(target_levels)
+        scored_by_mi = features
+
+    candidates = []
+    for col in scored_by_mi:
+        series = frame[col]
+        if series.dtype.kind not in 'iufb' and series.nunique() > 0.5 * len(frame):
+            continue
+        candidates.append(col)
+    if target_levels > 1:
+        for start in range(0, len(candidates), block):
+            columns, codes, levels = [], [], []
+            for col in candidates[start:start + block]:
+                col_codes, col_levels = _codes(frame[col], bins, max_categories)
+                if col_codes is not None and col_levels:
+                    columns.append(col)
+                    codes.append(col_codes)
+                    levels.append(col_levels)
+            if not columns:
+                continue
+            scores = mutual_information(np.column_stack(codes), levels, target_codes, target_levels)
+            results.extend({'column': col, 'method': 'mutual_info', 'score': float(score)} for col, score in zip(columns, scores))
+
+    results = [result for result in results if result['score'] >= threshold]
+    results.sort(key=lambda result: result['score'], reverse=True)
+    for result in results:
+        result['score'] = round(result['score'], 6)
+        if 'correlation' in result:
+            result['correlation'] = round(result['correlation'], 6)
+    return results[:max_columns]
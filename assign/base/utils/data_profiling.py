@@ -2,68 +2,281 @@ import pandas as pd
 import numpy as np
 from scipy import stats
 import os
+import joblib
+from pandas.tseries.api import guess_datetime_format
+from django.conf import settings
+from .correlations import top_correlations
+from .metrics import span
+from .sketches import OnlineMoments, QuantileSketch, HyperLogLog, FrequentItems, Extremes, CovarianceAccumulator
 
-def infer_schema_and_metadata(file_path):s
-    chunk_size = 1000
-    df_chunks = pd.read_csv(file_path, chunksize=chunk_size)
-    df_list = []
-    
-    for chunk in df_chunks:
-        df_list.append(chunk)
-        if len(df_list) * chunk_size >= 10000:  
-            break
-    
-    df = pd.concat(df_list, ignore_index=True)
-    
-    schema = {
-        'columns': [],
-        'row_count': len(df),
-    }
-    
-    for col in df.columns:
-        col_info = {
-            'name': col,
-            'type': infer_column_type(df[col]),
-            'unique_count': df[col].nunique(),
-            'null_percentage': df[col].isna().mean() * 100,
-            'is_high_cardinality': df[col].nunique() > len(df) * 0.5,
-            'is_constant': df[col].nunique() == 1,
+NUMERIC_TYPES = ['numerical', 'integer']
+# The type of a column, or chunk of one, without a single value: it says nothing about the others.
+EMPTY_TYPE = 'empty'
+HLL_PRECISION = 12
+QUANTILE_SKETCH_K = 512
+# The pickled StreamingProfiler kept in each columnar cache directory.
+PROFILER_STATE_FILE = 'profiler.joblib'
+
+
+def merge_column_types(current, new):
+    if current in (None, EMPTY_TYPE):
+        return new
+    if new in (None, EMPTY_TYPE) or current == new:
+        return current
+    if {current, new} == set(NUMERIC_TYPES):
+        return 'numerical'
+    return 'categorical'
+
+
+def _is_numeric_series(series):
+    return series.dtype.kind in 'iuf'
+
+
+class ColumnState:
+    def __init__(self, name):
+        self.name = name
+        self.type = None
+        self.rows = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog(HLL_PRECISION)
+        self.values = FrequentItems(getattr(settings, 'PROFILE_MAX_TRACKED_VALUES', 1000))
+        # Numeric sketches are kept only while every chunk so far had a numeric dtype.
+        self.moments = OnlineMoments()
+        self.quantiles = QuantileSketch(QUANTILE_SKETCH_K)
+        self.extremes = Extremes()
+        # What typed loading needs: whether every value is a string, and one format that parses every date.
+        self.text = True
+        self.date_format = None
+
+    @property
+    def numeric(self):
+        return self.moments is not None
+
+    def _drop_numeric(self):
+        self.moments = self.quantiles = self.extremes = None
+
+    def _update_date_format(self, non_null):
+        if self.date_format is False or not len(non_null):
+            return
+        values = non_null.astype(str)
+        if self.date_format is None:
+            self.date_format = guess_datetime_format(values.iloc[0]) or False
+        if self.date_format and pd.to_datetime(values, format=self.date_format, errors='coerce').isna().any():
+            self.date_format = False
+
+    def update(self, series):
+        chunk_type = infer_column_type(series)
+        self.type = merge_column_types(self.type, chunk_type)
+        non_null = series.dropna()
+        if len(non_null) and pd.api.types.infer_dtype(non_null, skipna=False) != 'string':
+            self.text = False
+        if chunk_type == 'datetime':
+            self._update_date_format(non_null)
+        self.rows += len(series)
+        self.nulls += len(series) - len(non_null)
+        self.distinct.update(non_null)
+        self.values.update(non_null)
+        if not len(non_null):
+            # Whatever dtype pandas gave an all-null chunk, it has no values to keep or rule out.
+            return
+        if self.numeric and _is_numeric_series(series):
+            values = non_null.to_numpy(dtype=np.float64)
+            self.moments.update(values)
+            self.quantiles.update(values)
+            self.extremes.update(values)
+        else:
+            self._drop_numeric()
+
+    def merge(self, other):
+        self.type = merge_column_types(self.type, other.type)
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        self.values.merge(other.values)
+        self.text = self.text and other.text
+        if self.date_format is None or other.date_format in (None, self.date_format):
+            self.date_format = self.date_format if other.date_format is None else other.date_format
+        else:
+            self.date_format = False
+        if self.numeric and other.numeric:
+            self.moments.merge(other.moments)
+            self.quantiles.merge(other.quantiles)
+            self.extremes.merge(other.extremes)
+        else:
+            self._drop_numeric()
+
+    def outliers(self):
+        q1 = self.quantiles.quantile(0.25)
+        q3 = self.quantiles.quantile(0.75)
+        if q1 is None:
+            return []
+        iqr = q3 - q1
+        outliers = self.extremes.beyond(q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+        if self.type == 'integer':
+            outliers = [int(v) for v in outliers]
+        return outliers
+
+
+class StreamingProfiler:
+    """Profiles a table chunk by chunk, holding only mergeable per-column state."""
+
+    def __init__(self):
+        self.columns = {}
+        self.row_count = 0
+        self.covariance = None
+
+    def update(self, chunk):
+        if self.covariance is None:
+            self.covariance = CovarianceAccumulator(
+                [col for col in chunk.columns if _is_numeric_series(chunk[col])],
+                block_size=getattr(settings, 'CORRELATION_BLOCK_SIZE', 256),
+            )
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns[col] = ColumnState(col)
+            self.columns[col].update(chunk[col])
+        if self.covariance.columns:
+            matrix = chunk.reindex(columns=self.covariance.columns)
+            text = [col for col in matrix.columns if not _is_numeric_series(matrix[col])]
+            if text:
+                matrix[text] = matrix[text].apply(pd.to_numeric, errors='coerce')
+            self.covariance.update(matrix)
+        self.row_count += len(chunk)
+
+    def merge(self, other):
+        for col, state in other.columns.items():
+            if col in self.columns:
+                self.columns[col].merge(state)
+            else:
+                self.columns[col] = state
+        if self.covariance is None:
+            self.covariance = other.covariance
+        elif other.covariance is not None:
+            self.covariance.merge(other.covariance)
+        self.row_count += other.row_count
+
+    def _target_correlations(self, target, columns):
+        position = {col: i for i, col in enumerate(self.covariance.columns)}
+        columns = [col for col in columns if col in position and col != target]
+        row = self.covariance.correlation([position[target]], [position[col] for col in columns])[0]
+        return {col: float(corr) for col, corr in zip(columns, row) if not np.isnan(corr)}
+
+    def finalize(self):
+        schema = {
+            'columns': [],
+            'row_count': self.row_count,
         }
-        
-
-        if col_info['type'] in ['numerical', 'integer']:
-            col_info['outliers'] = detect_outliers(df[col])
-            col_info['skewness'] = float(df[col].skew()) if not df[col].isna().all() else None
-        
-        schema['columns'].append(col_info)
-    
-    numerical_cols = [col['name'] for col in schema['columns'] if col['type'] in ['numerical', 'integer']]
-    if numerical_cols:
-        corr_matrix = df[numerical_cols].corr().to_dict()
-        schema['correlations'] = {col: {k: float(v) for k, v in corr.items()} for col, corr in corr_matrix.items()}
-    
-    categorical_cols = [col['name'] for col in schema['columns'] if col['type'] == 'categorical']
-    schema['imbalanced_columns'] = {}
-    for col in categorical_cols:
-        value_counts = df[col].value_counts(normalize=True)
-        if value_counts.max() > 0.9: 
-            schema['imbalanced_columns'][col] = value_counts.to_dict()
-    
-    target_candidates = [col for col in df.columns if col.lower() in ['target', 'label', 'churn']]
-    if target_candidates:
-        target = target_candidates[0]
-        correlations = df.corr()[target].to_dict() if target in numerical_cols else {}
-        schema['potential_leakage'] = {col: float(corr) for col, corr in correlations.items() if abs(corr) > 0.8 and col != target}
-    
-    return schema
+
+        for col, state in self.columns.items():
+            unique_count = state.distinct.count()
+            col_info = {
+                'name': col,
+                'type': state.type,
+                'unique_count': unique_count,
+                'null_percentage': state.nulls / state.rows * 100 if state.rows else 0.0,
+                'is_high_cardinality': unique_count > self.row_count * 0.5,
+                'is_constant': unique_count == 1,
+                'is_text': state.text and state.type == 'categorical',
+            }
+            if state.type == 'datetime' and state.date_format:
+                col_info['datetime_format'] = state.date_format
+
+            if col_info['type'] in NUMERIC_TYPES:
+                col_info['outliers'] = state.outliers() if state.numeric else []
+                col_info['skewness'] = state.moments.skewness() if state.numeric else None
+
+            schema['columns'].append(col_info)
+
+        numerical_cols = [col['name'] for col in schema['columns'] if col['type'] in NUMERIC_TYPES and self.columns[col['name']].numeric]
+        if numerical_cols:
+            schema['correlations'] = top_correlations(self.covariance, numerical_cols)
+
+        categorical_cols = [col['name'] for col in schema['columns'] if col['type'] == 'categorical']
+        schema['imbalanced_columns'] = {}
+        for col in categorical_cols:
+            frequencies = self.columns[col].values.frequencies()
+            if frequencies and max(frequencies.values()) > 0.9:
+                schema['imbalanced_columns'][col] = frequencies
+
+        target_candidates = [col for col in self.columns if col.lower() in ['target', 'label', 'churn']]
+        if target_candidates:
+            target = target_candidates[0]
+            # A first look for the conventionally named target; training scores the chosen target properly.
+            correlations = self._target_correlations(target, numerical_cols) if target in numerical_cols else {}
+            schema['potential_leakage'] = {col: corr for col, corr in correlations.items() if abs(corr) > 0.8}
+
+        return schema
+
+
+def profile_chunks(chunks, profiler=None):
+    """Profile ``chunks``; given a ``profiler``, they are added to the rows it has already seen."""
+    profiler = profiler or StreamingProfiler()
+    chunks = iter(chunks)
+    while True:
+        with span('profile.read'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with span('profile.update'):
+            profiler.update(chunk)
+    with span('profile.finalize'):
+        return profiler.finalize()
+
+
+def profiler_state_path(columnar_cache):
+    return os.path.join(settings.MEDIA_ROOT, columnar_cache['path'], PROFILER_STATE_FILE)
+
+
+def save_profiler_state(columnar_cache, profiler):
+    """Keep the profiler's sketches with the cache, so appended rows can be profiled on their own.
+
+    Not kept for more than PROFILER_STATE_MAX_COLUMNS correlated columns, whose
+    covariance sums grow with the square of their count: appends to those
+    sessions are profiled in full instead.
+    """
+    limit = getattr(settings, 'PROFILER_STATE_MAX_COLUMNS', 1000)
+    if limit is not None and profiler.covariance is not None and len(profiler.covariance.columns) > limit:
+        return
+    joblib.dump(profiler, profiler_state_path(columnar_cache))
+
+
+def load_profiler_state(columnar_cache):
+    """The profiler state saved with ``columnar_cache``, or None for caches profiled before it was kept."""
+    path = profiler_state_path(columnar_cache)
+    return joblib.load(path) if os.path.exists(path) else None
+
+
+def profile_upload(file_path, cache_key):
+    """Build an upload's columnar cache and profile it from there; returns the session metadata."""
+    from .columnar_cache import build_columnar_cache, delete_columnar_cache, iter_chunks
+
+    columnar_cache = build_columnar_cache(file_path, cache_key)
+    try:
+        profiler = StreamingProfiler()
+        metadata = profile_chunks(iter_chunks(columnar_cache), profiler)
+        save_profiler_state(columnar_cache, profiler)
+    except Exception:
+        delete_columnar_cache(columnar_cache)
+        raise
+    metadata['columnar_cache'] = columnar_cache
+    return metadata
+
+
+def infer_schema_and_metadata(file_path):
+    chunk_size = getattr(settings, 'PROFILE_CHUNK_SIZE', 50000)
+    return profile_chunks(pd.read_csv(file_path, chunksize=chunk_size))
 
 def infer_column_type(series):
     try:
-        if pd.to_numeric(series, errors='coerce').notna().all():
+        # Missing values say nothing about the type; only values that fail to parse do.
+        present = series.notna().sum()
+        if not present:
+            return EMPTY_TYPE
+        if pd.to_numeric(series, errors='coerce').notna().sum() == present:
             if series.dtype in ['int64', 'int32']:
                 return 'integer'
             return 'numerical'
-        if pd.to_datetime(series, errors='coerce').notna().all():
+        if pd.to_datetime(series, errors='coerce').notna().sum() == present:
             return 'datetime'
         unique_vals = series.dropna().unique()
         if set(unique_vals).issubset({True, False, 0, 1, 'True', 'False'}):
@@ -0,0 +1,96 @@
+"""Bounded pools for the CPU-bound and blocking work of the async endpoints.
+
+Each pool accepts at most ``workers + queue depth`` tasks at a time and
+raises ``Saturated`` for the rest, so a burst of slow requests turns into
+429 responses instead of an ever-growing queue in front of the event loop.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class Saturated(Exception):
+    pass
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+class BoundedExecutor:
+    def __init__(self, name, kind, workers_setting, depth_setting, default_workers, default_depth):
+        self.name = name
+        self.kind = kind
+        self.workers_setting = workers_setting
+        self.depth_setting = depth_setting
+        self.default_workers = default_workers
+        self.default_depth = default_depth
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    @property
+    def workers(self):
+        return getattr(settings, self.workers_setting, self.default_workers)
+
+    @property
+    def capacity(self):
+        return self.workers + getattr(settings, self.depth_setting, self.default_depth)
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                # spawn keeps the parent's open DB connections and threads out of the workers
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max(1, self.workers),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix=f'async-{self.name}')
+        return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise Saturated(f"The {self.name} pool is busy ({self.in_flight} tasks in flight), retry shortly")
+            self.in_flight += 1
+            try:
+                future = self._get_executor().submit(fn, *args, **kwargs)
+            except Exception:
+                self.in_flight -= 1
+                raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            # A worker process that died takes the whole pool with it; start a fresh one next time.
+            if self._executor is not None and getattr(self._executor, '_broken', False):
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'capacity': self.capacity,
+                'workers': self.workers,
+                'rejected': self.rejected,
+            }
+
+
+# Profiling and other pandas-heavy work, in separate processes.
+cpu_executor = BoundedExecutor('cpu', 'process', 'ASYNC_CPU_WORKERS', 'ASYNC_CPU_QUEUE_DEPTH', 2, 4)
+# Predictions against models cached in this process, and blocking file I/O.
+thread_executor = BoundedExecutor('thread', 'thread', 'ASYNC_THREAD_WORKERS', 'ASYNC_THREAD_QUEUE_DEPTH', 8, 32)
@@ -0,0 +1,85 @@
+"""Kernels that score a ``FlatForest`` batch without per-estimator Python dispatch.
+
+``numpy`` walks every (row, tree) pair of a batch down one level per step
+with fancy indexing, so the number of Python-level steps is the forest's
+depth rather than rows x trees. ``numba`` compiles the plain nested loop
+when numba is installed. Both add the per-tree outputs in estimator order
+and then divide by the number of trees, exactly as sklearn's forests do, so
+results are bit-identical to ``predict``/``predict_proba`` on the estimator.
+"""
+import numpy as np
+from django.conf import settings
+
+try:
+    import numba
+except ImportError:  # optional: the numpy kernel is used instead
+    numba = None
+
+BACKENDS = ('auto', 'sklearn', 'numpy', 'numba')
+# (row, tree) pairs walked together by the numpy kernel; bounds its index arrays.
+VECTORIZED_BLOCK_PAIRS = 1 << 20
+
+
+def inference_backend():
+    """The configured forest backend, with 'auto' and an unavailable 'numba' resolved."""
+    backend = getattr(settings, 'FOREST_INFERENCE_BACKEND', 'auto')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown FOREST_INFERENCE_BACKEND '{backend}', expected one of {list(BACKENDS)}")
+    if backend in ('auto', 'numba'):
+        return 'numba' if numba is not None else 'numpy'
+    return backend
+
+
+def accumulate_numpy(X, forest):
+    n_trees = forest.roots.size
+    total = np.zeros((X.shape[0],) + forest.value.shape[1:], dtype=np.float64)
+    block_rows = max(1, VECTORIZED_BLOCK_PAIRS // max(n_trees, 1))
+    for start in range(0, X.shape[0], block_rows):
+        block = X[start:start + block_rows]
+        # Pair p is row p // n_trees in tree p % n_trees.
+        node = np.tile(forest.roots, len(block))
+        row = np.repeat(np.arange(len(block)), n_trees)
+        active = np.flatnonzero(forest.left[node] >= 0)
+        while active.size:
+            current = node[active]
+            values = block[row[active], forest.feature[current]]
+            go_left = np.where(np.isnan(values), forest.missing_left[current], values <= forest.threshold[current])
+            node[active] = np.where(go_left, forest.left[current], forest.right[current])
+            active = active[forest.left[node[active]] >= 0]
+        leaves = node.reshape(len(block), n_trees)
+        out = total[start:start + len(block)]
+        for tree in range(n_trees):
+            out += forest.value[leaves[:, tree]]
+    total /= n_trees
+    return total
+
+
+if numba is not None:
+    @numba.njit(cache=True, nogil=True)
+    def _accumulate_kernel(X, feature, threshold, left, right, missing_left, value, roots, out):
+        for i in range(X.shape[0]):
+            for tree in range(roots.shape[0]):
+                node = roots[tree]
+                while left[node] >= 0:
+                    x = X[i, feature[node]]
+                    if np.isnan(x):
+                        go_left = missing_left[node]
+                    else:
+                        go_left = x <= threshold[node]
+                    node = left[node] if go_left else right[node]
+                for k in range(value.shape[1]):
+                    out[i, k] += value[node, k]
+
+
+def accumulate_numba(X, forest):
+    value = forest.value if forest.value.ndim == 2 else forest.value.reshape(-1, 1)
+    total = np.zeros((X.shape[0], value.shape[1]), dtype=np.float64)
+    _accumulate_kernel(
+        np.ascontiguousarray(X), forest.feature, forest.threshold, forest.left, forest.right,
+        forest.missing_left, value, forest.roots, total,
+    )
+    total /= forest.roots.size
+    return total if forest.value.ndim == 2 else total[:, 0]
+
+
+KERNELS = {'numpy': accumulate_numpy, 'numba': accumulate_numba}
@@ -0,0 +1,44 @@
+def generate_insights(target_column, metrics, feature_importance, leakage=None):
+    """Plain-language findings for a trained model, stored with it so SummaryView can serve them as-is."""
+    feature_importance = feature_importance or {}
+    insights = []
+
+    top_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)[:3]
+    insights.append({
+        "insight": f"Key drivers of {target_column}",
+        "details": f"The top features influencing {target_column} are: {', '.join([f'{k} ({v:.3f})' for k, v in top_features])}. Focus on optimizing these factors to improve outcomes."
+    })
+
+    high_importance_features = [(k, v) for k, v in feature_importance.items() if v > 0.1]
+    if high_importance_features:
+        insights.append({
+            "insight": "High impact features identified",
+            "details": f"Features with high importance (>0.1): {', '.join([f'{k} ({v:.3f})' for k, v in high_importance_features])}. These are critical for accurate predictions."
+        })
+
+    if len(feature_importance) > 5:
+        insights.append({
+            "insight": "Feature importance analysis",
+            "details": f"Model analyzed {len(feature_importance)} features. The top 3 features account for {sum([v for k, v in top_features]):.1%} of the total importance."
+        })
+
+    if leakage:
+        suspects = ', '.join([f"{item['column']} ({item['score']:.3f})" for item in leakage[:5]])
+        insights.append({
+            "insight": "Possible target leakage",
+            "details": f"These columns predict {target_column} almost perfectly: {suspects}. Check that they are known before {target_column} is, otherwise drop them before training."
+        })
+
+    if metrics:
+        if 'accuracy' in metrics:
+            insights.append({
+                "insight": "Model performance",
+                "details": f"Model accuracy: {metrics['accuracy']:.3f}. This indicates how well the model predicts {target_column}."
+            })
+        elif 'r2' in metrics:
+            insights.append({
+                "insight": "Model performance",
+                "details": f"Model R² score: {metrics['r2']:.3f}. This indicates how well the model explains the variance in {target_column}."
+            })
+
+    return insights
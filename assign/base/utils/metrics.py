@@ -0,0 +1,172 @@
+"""In-process counters, latency histograms and named spans, rendered in Prometheus text format.
+
+``span('train.fit')`` times a block, records it in the ``stage_duration_seconds``
+histogram and, inside ``collect_stages()``, adds it to that run's stage timings.
+Metrics are per process: training spans recorded in the job workers reach this
+registry through the stage timings each job returns.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f'{self.name}{_format_labels(key)} {_format_value(value)}' for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(key, {"le": _format_value(bound)})} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+        return metric
+
+    def counter(self, name, help_text):
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def register_collector(self, collector):
+        """Add a callable returning ``[(name, help, labels, value), ...]`` gauges, read at render time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        gauges = {}
+        for collector in collectors:
+            for name, help_text, labels, value in collector():
+                gauges.setdefault(name, (help_text, []))[1].append((_label_key(labels), value))
+        for name, (help_text, values) in gauges.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.extend(f'{name}{_format_labels(key)} {_format_value(value)}' for key, value in values)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_duration = registry.histogram('stage_duration_seconds', 'Time spent in a named pipeline stage.')
+request_duration = registry.histogram('http_request_duration_seconds', 'HTTP request latency by endpoint.')
+requests_total = registry.counter('http_requests_total', 'HTTP requests by endpoint, method and status.')
+
+_current_stages = ContextVar('current_stages', default=None)
+
+
+@contextmanager
+def collect_stages():
+    """Collect the seconds spent in each span opened inside the block into a dict."""
+    stages = {}
+    token = _current_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _current_stages.reset(token)
+
+
+def record_stage(name, seconds):
+    stage_duration.observe(seconds, stage=name)
+    stages = _current_stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def stats_gauges(prefix, help_text, stats, **labels):
+    """Turn the numeric entries of a ``stats()`` dict into gauges for ``register_collector``."""
+    return [
+        (f'{prefix}_{key}', help_text, labels, value)
+        for key, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
@@ -0,0 +1,193 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+
+from .ml_pipeline import predict
+
+# Upper bounds of the batch size histogram buckets; the last bucket is open-ended.
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class BatchTimeout(Exception):
+    pass
+
+
+def batching_config(model_id):
+    """Return ``(window_ms, max_batch_size)`` for a model, or None if it is not opted in."""
+    models = getattr(settings, 'MICRO_BATCH_MODELS', {})
+    config = models.get(str(model_id), models.get('*'))
+    if config is None:
+        return None
+    config = config if isinstance(config, dict) else {}
+    return (
+        config.get('window_ms', getattr(settings, 'MICRO_BATCH_WINDOW_MS', 2)),
+        config.get('max_batch_size', getattr(settings, 'MICRO_BATCH_MAX_SIZE', 64)),
+    )
+
+
+def single_row(input_data):
+    if isinstance(input_data, dict):
+        return input_data
+    if isinstance(input_data, list) and len(input_data) == 1 and isinstance(input_data[0], dict):
+        return input_data[0]
+    return None
+
+
+class MicroBatcher:
+    """Coalesces single-row predictions for one model into vectorized calls.
+
+    Callers enqueue a record and wait on a Future. A dispatcher thread takes
+    the first waiting record, keeps collecting until ``window_ms`` has passed
+    since it arrived or ``max_batch_size`` records are in hand, then runs one
+    ``predict`` over all of them and resolves each Future with its own row.
+    A caller gives up ``MICRO_BATCH_TIMEOUT_MS`` after its batch window has
+    closed; a record whose caller has given up is dropped from its batch.
+    """
+
+    def __init__(self, model_obj, window_ms, max_batch_size):
+        self.model_id = str(model_obj.model_id)
+        self.model_path = model_obj.model_path
+        self.preprocessing_steps = model_obj.preprocessing_steps
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.timeout = self.window + getattr(settings, 'MICRO_BATCH_TIMEOUT_MS', 5000) / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.timeouts = 0
+        self.max_batch = 0
+        self.batch_size_histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+        self._thread = threading.Thread(target=self._run, name=f'micro-batcher-{self.model_id}', daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        future = Future()
+        self._queue.put((record, future, time.perf_counter()))
+        return future
+
+    def timed_out(self, future):
+        """Give up on ``future``; returns the BatchTimeout to raise to its caller."""
+        future.cancel()
+        with self._stats_lock:
+            self.timeouts += 1
+        return BatchTimeout(f"No prediction from the micro-batcher of model {self.model_id} within {self.timeout:.3f}s")
+
+    def result(self, record):
+        """Predict ``record`` in a batch and wait for its prediction, at most ``timeout`` seconds."""
+        future = self.submit(record)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise self.timed_out(future) from None
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Claims each Future; those whose caller timed out are already cancelled and skipped.
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            records = [record for record, _, _ in batch]
+            try:
+                predictions = predict(self.model_path, self.preprocessing_steps, records, model_id=self.model_id)
+            except Exception:
+                predictions = None
+            failed = predictions is None or len(predictions) != len(batch)
+            if not failed:
+                for (_, future, _), prediction in zip(batch, predictions):
+                    future.set_result(prediction)
+            else:
+                # One bad record must not fail the rows batched with it; score them one by one.
+                for record, future, _ in batch:
+                    try:
+                        future.set_result(predict(self.model_path, self.preprocessing_steps, [record], model_id=self.model_id)[0])
+                    except Exception as e:
+                        future.set_exception(e)
+            self._record(batch, started, failed)
+
+    def _record(self, batch, started, failed):
+        size = len(batch)
+        delays = [started - enqueued for _, _, enqueued in batch]
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if size <= bound), len(BATCH_SIZE_BUCKETS))
+        with self._stats_lock:
+            self.failed_batches += failed
+            self.requests += size
+            self.batches += 1
+            self.max_batch = max(self.max_batch, size)
+            self.batch_size_histogram[bucket] += 1
+            self.queue_delay_total += sum(delays)
+            self.queue_delay_max = max(self.queue_delay_max, max(delays))
+
+    def stats(self):
+        with self._stats_lock:
+            labels = [f'<={bound}' for bound in BATCH_SIZE_BUCKETS] + [f'>{BATCH_SIZE_BUCKETS[-1]}']
+            return {
+                'window_ms': self.window * 1000.0,
+                'max_batch_size': self.max_batch_size,
+                'pending': self._queue.qsize(),
+                'requests': self.requests,
+                'batches': self.batches,
+                'failed_batches': self.failed_batches,
+                'timeouts': self.timeouts,
+                'mean_batch_size': self.requests / self.batches if self.batches else None,
+                'max_batch': self.max_batch,
+                'batch_size_histogram': dict(zip(labels, self.batch_size_histogram)),
+                'mean_queue_delay_ms': 1000.0 * self.queue_delay_total / self.requests if self.requests else None,
+                'max_queue_delay_ms': 1000.0 * self.queue_delay_max,
+            }
+
+
+class MicroBatchRegistry:
+    """One MicroBatcher per opted-in model, created on first use."""
+
+    def __init__(self):
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def batcher_for(self, model_obj):
+        config = batching_config(model_obj.model_id)
+        if config is None:
+            return None
+        key = str(model_obj.model_id)
+        with self._lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                batcher = self._batchers[key] = MicroBatcher(model_obj, *config)
+        return batcher
+
+    def predict(self, model_obj, input_data):
+        """Predict through the model's batcher when it has one and the input is a single row.
+
+        Returns the same list-of-predictions shape as ``ml_pipeline.predict``.
+        """
+        record = single_row(input_data)
+        batcher = self.batcher_for(model_obj) if record is not None else None
+        if batcher is None:
+            return predict(model_obj.model_path, model_obj.preprocessing_steps, input_data, model_id=model_obj.model_id)
+        return [batcher.result(record)]
+
+    def stats(self):
+        with self._lock:
+            batchers = dict(self._batchers)
+        return {key: batcher.stats() for key, batcher in batchers.items()}
+
+
+micro_batcher = MicroBatchRegistry()
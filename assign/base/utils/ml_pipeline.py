@@ -1,17 +1,82 @@
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, mean_squared_error, r2_score
-import joblib
-import os
-import uuid
+import time
+from .model_cache import model_cache, encoder_path_for, preprocessor_path_for
+from .artifacts import save_artifact, write_model_artifacts
+from .artifact_storage import new_model_path
+from .preprocessing import FittedPreprocessor
+from .columnar_cache import read_columns
+from .typed_csv import read_typed_csv, parse_datetimes
+from .automl import select_model, feature_importances
+from .out_of_core import use_out_of_core, train_out_of_core
+from .metrics import record_stage, span
 
-def train_model(file_path, target_column=None):
+TARGET_CANDIDATES = ['target', 'label', 'churn', 'status']
+
+def read_training_frame(file_path, target_column=None, columnar_cache=None, columns=None, last_rows=None):
+    """The upload as a frame; ``columns`` (its stored profile) types a CSV read and parses dates.
+
+    ``last_rows`` keeps only the newest rows, for retraining on a window.
+    """
+    # Text columns with more distinct values than half the rows are excluded from the
+    # features below, so unless one of them is the target there is no need to decode them.
+    wanted = {target_column.lower()} if target_column else set(TARGET_CANDIDATES)
+    if not columnar_cache:
+        if not columns:
+            df = pd.read_csv(file_path)
+        else:
+            skip = {
+                col['name'] for col in columns
+                if col['name'].lower() not in wanted and col.get('is_text') and col.get('is_high_cardinality')
+            }
+            df = read_typed_csv(file_path, columns, keep=lambda name: name not in skip, target_column=target_column)
+        return df if last_rows is None else df.iloc[-last_rows:]
+    # Dates are cached as text but become numeric parts, whatever their cardinality.
+    dates = {col['name'] for col in columns or [] if col['type'] == 'datetime'}
+    names = [
+        col['name'] for col in columnar_cache['columns']
+        if col['name'].lower() in wanted or col['name'] in dates
+        or not (col['kind'] == 'category' and col['categories'] > 0.5 * columnar_cache['row_count'])
+    ]
+    return parse_datetimes(read_columns(columnar_cache, names, last_rows), columns or [])
+
+def evaluate(model, X_test, y_test, is_classification):
+    y_pred = model.predict(X_test)
+    if is_classification:
+        return {
+            'accuracy': float(accuracy_score(y_test, y_pred)),
+            'precision': float(precision_score(y_test, y_pred, average='weighted', zero_division=0)),
+            'recall': float(recall_score(y_test, y_pred, average='weighted', zero_division=0)),
+            'f1_score': float(f1_score(y_test, y_pred, average='weighted', zero_division=0))
+        }
+    return {
+        'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        'r2': float(r2_score(y_test, y_pred))
+    }
+
+def use_sparse_features(n_numerical, cardinalities):
+    # Each row has at most one non-zero per categorical column, so the one-hot
+    # matrix density is known before encoding anything.
+    width = n_numerical + sum(cardinalities)
+    if not cardinalities or not width:
+        return False
+    density = (n_numerical + len(cardinalities)) / width
+    return density < getattr(settings, 'SPARSE_FEATURE_DENSITY_THRESHOLD', 0.1)
+
+def train_model(file_path, target_column=None, columnar_cache=None, time_budget=None, columns=None, last_rows=None):
+    # A window is read into memory whatever the size of the whole file.
+    if last_rows is None and use_out_of_core(file_path):
+        return train_out_of_core(file_path, target_column, columnar_cache)
+    
     try:
-        df = pd.read_csv(file_path)
+        with span('train.read'):
+            df = read_training_frame(file_path, target_column, columnar_cache, columns, last_rows)
     except Exception as e:
         raise ValueError(f"Failed to read CSV file: {str(e)}")
     
@@ -20,7 +85,7 @@ def train_model(file_path, target_column=None):
         target_column = target_column.lower()
     
     if not target_column:
-        target_candidates = [col for col in df.columns if col.lower() in ['target', 'label', 'churn', 'status']]
+        target_candidates = [col for col in df.columns if col.lower() in TARGET_CANDIDATES]
         if target_candidates:
             target_column = target_candidates[0]
         else:
@@ -29,98 +94,125 @@ def train_model(file_path, target_column=None):
     if target_column not in df.columns:
         raise ValueError(f"Target column '{target_column}' not found in dataset. Available columns: {list(df.columns)}")
     
-    high_cardinality_cols = [col for col in df.columns if df[col].dtype == 'object' and df[col].nunique() > 0.5 * len(df)]
+    high_cardinality_cols = [col for col in df.columns if df[col].dtype in ['object', 'category'] and df[col].nunique() > 0.5 * len(df)]
     features = [col for col in df.columns if col != target_column and col not in high_cardinality_cols]
     
     X = df[features]
     y = df[target_column]
     
+    datetime_parts = {}
     for col in X.columns:
         if pd.api.types.is_datetime64_any_dtype(X[col]):
             X[col + '_year'] = X[col].dt.year
             X[col + '_month'] = X[col].dt.month
             X = X.drop(columns=[col])
+            datetime_parts[col] = ['year', 'month']
     
-    numerical_cols = X.select_dtypes(include=['int64', 'float64']).columns
-    categorical_cols = [col for col in X.select_dtypes(include=['object']).columns]
+    # Typed reads give float32 and category columns, and datetime parts are int32.
+    numerical_cols = X.select_dtypes(include='number').columns
+    categorical_cols = [col for col in X.select_dtypes(include=['object', 'category']).columns]
     
-    if numerical_cols.size:
-        num_imputer = SimpleImputer(strategy='mean')
-        X[numerical_cols] = num_imputer.fit_transform(X[numerical_cols])
+    num_imputer = None
+    encoder = None
+    with span('train.impute'):
+        if numerical_cols.size:
+            num_imputer = SimpleImputer(strategy='mean')
+            X[numerical_cols] = num_imputer.fit_transform(X[numerical_cols])
     
-    if categorical_cols:
-        cat_imputer = SimpleImputer(strategy='constant', fill_value='missing')
-        X[categorical_cols] = cat_imputer.fit_transform(X[categorical_cols])
+        if categorical_cols:
+            cat_imputer = SimpleImputer(strategy='constant', fill_value='missing')
+            X[categorical_cols] = cat_imputer.fit_transform(X[categorical_cols])
     
-    if categorical_cols:
-        try:
-            encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
-            encoded_cats = encoder.fit_transform(X[categorical_cols])
-            encoded_cols = encoder.get_feature_names_out(categorical_cols)
-            X_encoded = pd.DataFrame(encoded_cats, columns=encoded_cols, index=X.index)
-            X = pd.concat([X[numerical_cols], X_encoded], axis=1)
-        except Exception as e:
-            raise ValueError(f"Error encoding categorical columns: {str(e)}")
-    else:
-        X = X[numerical_cols]
+    with span('train.encode'):
+        sparse = use_sparse_features(len(numerical_cols), [X[col].nunique() for col in categorical_cols])
+        if categorical_cols:
+            try:
+                encoder = OneHotEncoder(sparse_output=sparse, handle_unknown='ignore')
+                encoded_cats = encoder.fit_transform(X[categorical_cols])
+                encoded_cols = encoder.get_feature_names_out(categorical_cols)
+                if sparse:
+                    X = sp.hstack([sp.csr_matrix(X[numerical_cols].to_numpy(dtype=np.float64)), encoded_cats], format='csr')
+                else:
+                    X_encoded = pd.DataFrame(encoded_cats, columns=encoded_cols, index=X.index)
+                    X = pd.concat([X[numerical_cols], X_encoded], axis=1)
+            except Exception as e:
+                raise ValueError(f"Error encoding categorical columns: {str(e)}")
+            feature_names = list(numerical_cols) + list(encoded_cols)
+        else:
+            X = X[numerical_cols]
+            feature_names = list(numerical_cols)
+        
+        # Fit on plain arrays: prediction feeds the model NumPy rows from the fitted preprocessor.
+        if not sp.issparse(X):
+            X = X.to_numpy(dtype=np.float64)
     
     try:
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        with span('train.split'):
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     except Exception as e:
         raise ValueError(f"Error splitting data: {str(e)}")
     
     is_classification = df[target_column].dtype in ['object', 'category'] or df[target_column].nunique() < 10
-    if is_classification:
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        metrics = {
-            'accuracy': float(accuracy_score(y_test, y_pred)),
-            'precision': float(precision_score(y_test, y_pred, average='weighted', zero_division=0)),
-            'recall': float(recall_score(y_test, y_pred, average='weighted', zero_division=0)),
-            'f1_score': float(f1_score(y_test, y_pred, average='weighted', zero_division=0))
-        }
-    else:
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
-        metrics = {
-            'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
-            'r2': float(r2_score(y_test, y_pred))
-        }
-    
-    feature_importance = {col: float(imp) for col, imp in zip(X.columns, model.feature_importances_)}
-    
-    model_path = f'models/model_{uuid.uuid4()}.joblib'
-    os.makedirs('models', exist_ok=True)
-    joblib.dump(model, model_path)
-    
-    preprocessing_steps = {
-        'numerical_cols': list(numerical_cols),
-        'categorical_cols': list(categorical_cols),
-        'encoded_cols': list(encoded_cols) if categorical_cols else [],
-        'num_imputer_strategy': 'mean',
-        'cat_imputer_strategy': 'constant',
-        'encoder': joblib.dump(encoder, model_path.replace('.joblib', '_encoder.joblib')) if categorical_cols else None,
-        'target_column': target_column,
-        'training_features': list(X.columns)
-    }
-    
-    return model_path, metrics, feature_importance, preprocessing_steps
-
-import pandas as pd
-import joblib
-from sklearn.impute import SimpleImputer
-
-def predict(model_path, preprocessing_steps, input_data):
     try:
-        model = joblib.load(model_path)
+        with span('train.fit'):
+            model, search_results = select_model(X_train, y_train, is_classification, time_budget)
     except Exception as e:
-        raise ValueError(f"Failed to load model: {str(e)}")
+        raise ValueError(f"Error training model: {str(e)}")
+    with span('train.evaluate'):
+        metrics = evaluate(model, X_test, y_test, is_classification)
+        metrics['model'] = search_results['best']['family']
+        
+        feature_importance = {col: float(imp) for col, imp in zip(feature_names, feature_importances(model, X_test, y_test))}
+    
+    with span('train.save'):
+        model_path = new_model_path()
+        write_model_artifacts(model, model_path)
+        
+        preprocessor = FittedPreprocessor.from_fitted(
+            numerical_cols, num_imputer, categorical_cols, encoder,
+            datetime_parts=datetime_parts, sparse=bool(sparse and categorical_cols),
+        )
+        
+        preprocessing_steps = {
+            'numerical_cols': list(numerical_cols),
+            'categorical_cols': list(categorical_cols),
+            'encoded_cols': list(encoded_cols) if categorical_cols else [],
+            'num_imputer_strategy': 'mean',
+            'cat_imputer_strategy': 'constant',
+            'encoder': save_artifact(encoder, encoder_path_for(model_path)) if categorical_cols else None,
+            'preprocessor': save_artifact(preprocessor, preprocessor_path_for(model_path)),
+            'datetime_parts': datetime_parts,
+            'target_column': target_column,
+            'training_features': feature_names,
+            'sparse': bool(sparse and categorical_cols),
+        }
     
+    return model_path, metrics, feature_importance, preprocessing_steps, search_results
 
+def predict(model_path, preprocessing_steps, input_data, model_id=None):
+    with span('predict.load_model'):
+        loaded = model_cache.get(model_id or model_path, model_path, preprocessing_steps)
+    model = loaded.model
+    plan = loaded.plan
+    
+    if loaded.preprocessor is not None:
+        try:
+            with span('predict.preprocess'):
+                matrix = loaded.preprocessor.transform(input_data)
+        except Exception as e:
+            raise ValueError(f"Error applying preprocessing: {str(e)}")
+        try:
+            with span('predict.model'):
+                return model.predict(matrix).tolist()
+        except Exception as e:
+            raise ValueError(f"Error making predictions: {str(e)}")
+    
+    # Models trained before the fitted preprocessor was persisted: re-derive the steps per call.
+    start = time.perf_counter()
     if isinstance(input_data, dict):
         df = pd.DataFrame([input_data])
+    elif isinstance(input_data, list):
+        df = pd.DataFrame(input_data)
     elif isinstance(input_data, pd.DataFrame):
         df = input_data
     else:
@@ -128,14 +220,9 @@ def predict(model_path, preprocessing_steps, input_data):
     
     df.columns = [col.lower() for col in df.columns]
     
-    target_column = preprocessing_steps.get('target_column', None)
-    
-    numerical_cols = preprocessing_steps.get('numerical_cols', [])
-    categorical_cols = preprocessing_steps.get('categorical_cols', [])
-    
-    raw_features = numerical_cols + categorical_cols
-    if target_column and target_column in raw_features:
-        raw_features.remove(target_column)
+    numerical_cols = plan['numerical_cols']
+    categorical_cols = plan['categorical_cols']
+    raw_features = plan['raw_features']
     
 
     for col in raw_features:
@@ -150,38 +237,47 @@ def predict(model_path, preprocessing_steps, input_data):
 
     existing_num_cols = [col for col in numerical_cols if col in current_numerical_cols]
     if existing_num_cols:
-        num_imputer = SimpleImputer(strategy=preprocessing_steps.get('num_imputer_strategy', 'mean'))
+        num_imputer = SimpleImputer(strategy=plan['num_imputer_strategy'])
         df[existing_num_cols] = num_imputer.fit_transform(df[existing_num_cols])
     
 
     existing_cat_cols = [col for col in categorical_cols if col in current_categorical_cols]
     if existing_cat_cols:
-        cat_imputer = SimpleImputer(strategy=preprocessing_steps.get('cat_imputer_strategy', 'constant'), fill_value='missing')
+        cat_imputer = SimpleImputer(strategy=plan['cat_imputer_strategy'], fill_value='missing')
         df[existing_cat_cols] = cat_imputer.fit_transform(df[existing_cat_cols])
     
 
+    matrix = None
     if existing_cat_cols:
-        encoder_path = model_path.replace('.joblib', '_encoder.joblib')
         try:
-            encoder = joblib.load(encoder_path)
-            encoded_cats = encoder.transform(df[existing_cat_cols])
-            encoded_cols = preprocessing_steps.get('encoded_cols', [])
-            df_encoded = pd.DataFrame(encoded_cats, columns=encoded_cols, index=df.index)
-            df = pd.concat([df[existing_num_cols], df_encoded], axis=1)
+            encoded_cats = loaded.encoder.transform(df[existing_cat_cols])
+            encoded_cols = plan['encoded_cols']
+            if sp.issparse(encoded_cats):
+                numeric = np.column_stack([
+                    df[col].to_numpy(dtype=np.float64) if col in existing_num_cols else np.zeros(len(df))
+                    for col in numerical_cols
+                ]) if numerical_cols else np.empty((len(df), 0))
+                matrix = sp.hstack([sp.csr_matrix(numeric), encoded_cats], format='csr')
+            else:
+                df_encoded = pd.DataFrame(encoded_cats, columns=encoded_cols, index=df.index)
+                df = pd.concat([df[existing_num_cols], df_encoded], axis=1)
         except Exception as e:
             raise ValueError(f"Error loading or applying encoder: {str(e)}")
     else:
         df = df[existing_num_cols]
     
 
-    expected_cols = preprocessing_steps.get('training_features', list(df.columns))
-    for col in expected_cols:
-        if col not in df.columns:
-            df[col] = 0
-    df = df[expected_cols]
+    if matrix is None:
+        expected_cols = plan['training_features'] or list(df.columns)
+        for col in expected_cols:
+            if col not in df.columns:
+                df[col] = 0
+        matrix = df[expected_cols]
     
+    record_stage('predict.preprocess', time.perf_counter() - start)
     try:
-        predictions = model.predict(df)
+        with span('predict.model'):
+            predictions = model.predict(matrix)
         return predictions.tolist()
     except Exception as e:
         raise ValueError(f"Error making predictions: {str(e)}")
@@ -0,0 +1,191 @@
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .artifacts import FlatForest, forest_path_for, load_artifact
+from .forest_inference import inference_backend
+
+
+def encoder_path_for(model_path):
+    return model_path.replace('.joblib', '_encoder.joblib')
+
+
+def preprocessor_path_for(model_path):
+    return model_path.replace('.joblib', '_preprocessor.joblib')
+
+
+def _file_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def artifact_fingerprint(model_path):
+    return (
+        _file_fingerprint(model_path),
+        _file_fingerprint(encoder_path_for(model_path)),
+        _file_fingerprint(preprocessor_path_for(model_path)),
+        _file_fingerprint(forest_path_for(model_path)),
+    )
+
+
+def build_plan(preprocessing_steps):
+    steps = preprocessing_steps or {}
+    target_column = steps.get('target_column', None)
+    numerical_cols = list(steps.get('numerical_cols', []))
+    categorical_cols = list(steps.get('categorical_cols', []))
+    raw_features = [col for col in numerical_cols + categorical_cols if col != target_column]
+    return {
+        'target_column': target_column,
+        'numerical_cols': numerical_cols,
+        'categorical_cols': categorical_cols,
+        'raw_features': raw_features,
+        'encoded_cols': list(steps.get('encoded_cols', [])),
+        'training_features': steps.get('training_features'),
+        'num_imputer_strategy': steps.get('num_imputer_strategy', 'mean'),
+        'cat_imputer_strategy': steps.get('cat_imputer_strategy', 'constant'),
+    }
+
+
+class LoadedModel:
+    def __init__(self, model, encoder, preprocessor, plan, fingerprint, size_bytes):
+        self.model = model
+        self.encoder = encoder
+        self.preprocessor = preprocessor
+        self.plan = plan
+        self.fingerprint = fingerprint
+        self.size_bytes = size_bytes
+
+
+def load_model(model_path, preprocessing_steps):
+    fingerprint = artifact_fingerprint(model_path)
+    try:
+        # Forests are served from their flat layout, whose arrays stay in the shared page cache.
+        backend = inference_backend()
+        if fingerprint[3] is not None and backend != 'sklearn':
+            model = FlatForest.load(forest_path_for(model_path), backend)
+        else:
+            model = load_artifact(model_path)
+    except Exception as e:
+        raise ValueError(f"Failed to load model: {str(e)}")
+
+    plan = build_plan(preprocessing_steps)
+    preprocessor = None
+    if fingerprint[2] is not None:
+        try:
+            preprocessor = load_artifact(preprocessor_path_for(model_path))
+        except Exception as e:
+            raise ValueError(f"Failed to load preprocessor: {str(e)}")
+
+    encoder = None
+    if plan['categorical_cols'] and preprocessor is None:
+        try:
+            encoder = load_artifact(encoder_path_for(model_path))
+        except Exception as e:
+            raise ValueError(f"Error loading or applying encoder: {str(e)}")
+
+    # Size on disk is a close enough proxy for the in-memory footprint of the
+    # tree arrays, and it is free to compute. Only the artifact actually loaded counts.
+    loaded = fingerprint[1:4] if isinstance(model, FlatForest) else fingerprint[:3]
+    size_bytes = sum(part[1] for part in loaded if part)
+    return LoadedModel(model, encoder, preprocessor, plan, fingerprint, size_bytes)
+
+
+class ModelCache:
+    """LRU cache of loaded models, encoders and preprocessing plans.
+
+    Entries are keyed by model id and revalidated against the artifact mtimes
+    on every lookup, so a rewritten model file is picked up on the next call.
+    """
+
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return getattr(settings, 'MODEL_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+    def get(self, key, model_path, preprocessing_steps):
+        key = str(key)
+        fingerprint = artifact_fingerprint(model_path)
+        entry = self._lookup(key, fingerprint)
+        if entry is not None:
+            return entry
+
+        # One loader per key, so a burst of requests for a cold model unpickles it once.
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self._lookup(key, fingerprint, count=False)
+            if entry is not None:
+                return entry
+            with self._lock:
+                self.misses += 1
+            entry = load_model(model_path, preprocessing_steps)
+            self._store(key, entry)
+        return entry
+
+    def _lookup(self, key, fingerprint, count=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.fingerprint != fingerprint:
+                del self._entries[key]
+                self.invalidations += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry
+
+    def _store(self, key, entry):
+        max_bytes = self.max_bytes
+        if max_bytes is not None and entry.size_bytes > max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if max_bytes is None:
+                return
+            total = sum(e.size_bytes for e in self._entries.values())
+            while total > max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.size_bytes
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(str(key), None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': sum(e.size_bytes for e in self._entries.values()),
+                'max_bytes': self.max_bytes,
+            }
+
+
+model_cache = ModelCache()
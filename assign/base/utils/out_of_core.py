@@ -0,0 +1,345 @@
+"""Training for uploads too large to load into memory at once.
+
+Three streaming passes over the upload, each holding one chunk at a time:
+
+1. statistics: column kinds, NaN-aware means and standard deviations,
+   category vocabularies and target classes;
+2. training: the fitted preprocessor turns each chunk into a feature matrix
+   and an SGD model is updated with ``partial_fit`` on the training rows
+   (a numeric target standardized with its mean and standard deviation from
+   the first pass, so a target in the tens of thousands does not swamp the
+   default learning rate);
+3. evaluation: the holdout rows are scored and reduced into a confusion
+   matrix (classification) or error sums (regression).
+
+Rows are assigned to the holdout by a seeded generator drawn in chunk
+order, so every pass sees the same split without storing it.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+
+from .artifact_storage import new_model_path
+from .artifacts import save_artifact, write_model_artifacts
+from .automl import feature_importances
+from .columnar_cache import iter_chunks
+from .metrics import record_stage
+from .model_cache import preprocessor_path_for
+from .preprocessing import MISSING_CATEGORY, FittedPreprocessor
+from .sketches import OnlineMoments
+
+HOLDOUT_FRACTION = 0.2
+SPLIT_SEED = 42
+
+
+def use_out_of_core(file_path):
+    threshold = getattr(settings, 'OUT_OF_CORE_THRESHOLD_BYTES', 1024 * 1024 * 1024)
+    try:
+        return threshold is not None and os.path.getsize(file_path) > threshold
+    except OSError:
+        return False
+
+
+def _chunk_source(file_path, columnar_cache, chunk_size):
+    def chunks():
+        source = iter_chunks(columnar_cache, chunk_size) if columnar_cache else pd.read_csv(file_path, chunksize=chunk_size)
+        for chunk in source:
+            chunk.columns = [str(col).lower() for col in chunk.columns]
+            yield chunk
+    return chunks
+
+
+def _chunk_kind(series):
+    if series.dtype.kind == 'b':
+        return 'bool'
+    if series.dtype.kind in 'iuf':
+        return 'numeric'
+    return 'category'
+
+
+class _ColumnStats:
+    def __init__(self, max_categories):
+        self.kinds = set()
+        self.moments = OnlineMoments()
+        self.counts = {}
+        self.missing = 0
+        self.max_categories = max_categories
+
+    def update(self, series, text_keys):
+        kind = _chunk_kind(series)
+        self.kinds.add(kind)
+        if kind == 'numeric':
+            self.moments.update(series.to_numpy(dtype=np.float64, na_value=np.nan))
+        self.missing += int(series.isna().sum())
+        if self.counts is None:
+            return
+        for value, count in series.value_counts(dropna=True).items():
+            if text_keys and not isinstance(value, str):
+                value = str(value)
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        if len(self.counts) > self.max_categories:
+            # Too many distinct values to one-hot encode; stop counting.
+            self.counts = None
+
+    def stringify_counts(self):
+        """Key the counts by text, merging values counted before the column turned out to be text."""
+        if self.counts is None:
+            return
+        counts = {}
+        for value, count in self.counts.items():
+            value = value if isinstance(value, str) else str(value)
+            counts[value] = counts.get(value, 0) + count
+        self.counts = counts
+
+    @property
+    def kind(self):
+        if 'category' in self.kinds:
+            return 'category'
+        if self.kinds == {'bool'}:
+            return 'bool'
+        return 'numeric'
+
+
+class StandardizedTargetRegressor:
+    """Fits an incremental regressor on ``(y - center) / scale`` and predicts on the original scale."""
+
+    def __init__(self, estimator, center, scale):
+        self.estimator = estimator
+        self.center = center
+        self.scale = scale
+
+    def partial_fit(self, X, y):
+        self.estimator.partial_fit(X, (np.asarray(y, dtype=np.float64) - self.center) / self.scale)
+        return self
+
+    def predict(self, X):
+        return self.estimator.predict(X) * self.scale + self.center
+
+    @property
+    def coef_(self):
+        return self.estimator.coef_
+
+    def get_params(self, deep=True):
+        return self.estimator.get_params(deep)
+
+    def set_params(self, **params):
+        self.estimator.set_params(**params)
+        return self
+
+
+def _holdout_masks(chunks):
+    rng = np.random.default_rng(SPLIT_SEED)
+    for chunk in chunks:
+        yield chunk, rng.random(len(chunk)) < HOLDOUT_FRACTION
+
+
+def _target_values(chunk, target_column, target_kind):
+    y = chunk[target_column]
+    if target_kind == 'category' and y.dtype.kind != 'O':
+        y = y.astype(object).where(y.isna(), y.astype(str))
+    return y
+
+
+def collect_statistics(chunks, target_column=None):
+    max_categories = getattr(settings, 'OUT_OF_CORE_MAX_CATEGORIES', 1000)
+    stats = None
+    rows = 0
+    for chunk in chunks():
+        if stats is None:
+            if not target_column:
+                from .ml_pipeline import TARGET_CANDIDATES
+                candidates = [col for col in chunk.columns if col in TARGET_CANDIDATES]
+                if not candidates:
+                    raise ValueError("No target column specified and none inferred (tried 'target', 'label', 'churn', 'status')")
+                target_column = candidates[0]
+            if target_column not in chunk.columns:
+                raise ValueError(f"Target column '{target_column}' not found in dataset. Available columns: {list(chunk.columns)}")
+            stats = {col: _ColumnStats(max_categories) for col in chunk.columns}
+        for col, column_stats in stats.items():
+            column_stats.update(chunk[col], text_keys=col != target_column)
+        rows += len(chunk)
+    if stats is None:
+        raise ValueError("The uploaded file has no rows")
+    target_stats = stats[target_column]
+    if target_stats.kind == 'category':
+        # Labels are compared as text, as _target_values gives them, even from chunks that parsed as numbers.
+        target_stats.stringify_counts()
+    return target_column, stats, rows
+
+
+def build_preprocessor(stats, target_column):
+    from .ml_pipeline import use_sparse_features
+
+    numerical_cols, fill, scale = [], [], []
+    categorical_cols, categories = [], []
+    for col, column_stats in stats.items():
+        if col == target_column:
+            continue
+        if column_stats.kind == 'numeric':
+            moments = column_stats.moments
+            mean = moments.mean if moments.n else 0.0
+            std = np.sqrt(moments.m2 / moments.n) if moments.n else 0.0
+            numerical_cols.append(col)
+            fill.append(mean)
+            scale.append(std if std > 0 else 1.0)
+        elif column_stats.kind == 'category' and column_stats.counts is not None:
+            values = sorted(column_stats.counts)
+            if column_stats.missing and MISSING_CATEGORY not in column_stats.counts:
+                values = sorted(values + [MISSING_CATEGORY])
+            categorical_cols.append(col)
+            categories.append(values)
+    sparse = use_sparse_features(len(numerical_cols), [len(values) for values in categories])
+    return FittedPreprocessor(
+        numerical_cols, fill, categorical_cols, categories,
+        sparse=bool(sparse and categorical_cols), numerical_center=fill, numerical_scale=scale,
+    )
+
+
+class _StreamedMetrics:
+    def __init__(self, is_classification, classes=None):
+        self.is_classification = is_classification
+        if is_classification:
+            self.classes = np.asarray(classes)
+            self.confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+        else:
+            self.n = 0
+            self.sse = 0.0
+            self.y_sum = 0.0
+            self.y_sq_sum = 0.0
+
+    def update(self, y_true, y_pred):
+        if self.is_classification:
+            # searchsorted on the sorted class list maps labels to confusion matrix indices.
+            true_idx = np.searchsorted(self.classes, y_true)
+            pred_idx = np.searchsorted(self.classes, y_pred)
+            np.add.at(self.confusion, (true_idx, pred_idx), 1)
+        else:
+            y_true = np.asarray(y_true, dtype=np.float64)
+            errors = y_true - np.asarray(y_pred, dtype=np.float64)
+            self.n += y_true.size
+            self.sse += float(np.dot(errors, errors))
+            self.y_sum += float(y_true.sum())
+            self.y_sq_sum += float(np.dot(y_true, y_true))
+
+    def result(self):
+        if self.is_classification:
+            total = self.confusion.sum()
+            support = self.confusion.sum(axis=1)
+            predicted = self.confusion.sum(axis=0)
+            correct = np.diag(self.confusion)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                precision = np.where(predicted > 0, correct / predicted, 0.0)
+                recall = np.where(support > 0, correct / support, 0.0)
+                f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+            weights = support / total if total else support
+            return {
+                'accuracy': float(correct.sum() / total) if total else 0.0,
+                'precision': float(np.dot(weights, precision)),
+                'recall': float(np.dot(weights, recall)),
+                'f1_score': float(np.dot(weights, f1)),
+            }
+        sst = self.y_sq_sum - self.y_sum ** 2 / self.n if self.n else 0.0
+        return {
+            'rmse': float(np.sqrt(self.sse / self.n)) if self.n else 0.0,
+            'r2': float(1 - self.sse / sst) if sst > 0 else 0.0,
+        }
+
+
+def train_out_of_core(file_path, target_column=None, columnar_cache=None):
+    """Out-of-core counterpart of ``train_model`` with the same return value."""
+    chunk_size = getattr(settings, 'OUT_OF_CORE_CHUNK_SIZE', 50000)
+    epochs = getattr(settings, 'OUT_OF_CORE_EPOCHS', 1)
+    chunks = _chunk_source(file_path, columnar_cache, chunk_size)
+    start = time.perf_counter()
+
+    try:
+        target_column, stats, rows = collect_statistics(chunks, target_column.lower() if target_column else None)
+    except Exception as e:
+        raise ValueError(f"Failed to read CSV file: {str(e)}")
+    target_stats = stats[target_column]
+    target_kind = target_stats.kind
+    is_classification = target_kind == 'category' or (target_stats.counts is not None and len(target_stats.counts) < 10)
+    if is_classification and target_stats.counts is None:
+        raise ValueError(f"Target column '{target_column}' has too many classes to train a classifier on")
+    preprocessor = build_preprocessor(stats, target_column)
+    stats_seconds = time.perf_counter() - start
+    record_stage('train.statistics', stats_seconds)
+
+    if is_classification:
+        classes = np.array(sorted(target_stats.counts), dtype=object if target_kind == 'category' else None)
+        model = SGDClassifier(loss='log_loss', random_state=SPLIT_SEED)
+    else:
+        classes = None
+        moments = target_stats.moments
+        std = np.sqrt(moments.m2 / moments.n) if moments.n else 0.0
+        model = StandardizedTargetRegressor(
+            SGDRegressor(random_state=SPLIT_SEED), moments.mean if moments.n else 0.0, std if std > 0 else 1.0,
+        )
+
+    start = time.perf_counter()
+    train_rows = 0
+    for _ in range(epochs):
+        for chunk, holdout in _holdout_masks(chunks()):
+            y = _target_values(chunk, target_column, target_kind)
+            keep = ~holdout & y.notna().to_numpy()
+            if not keep.any():
+                continue
+            X = preprocessor.transform_frame(chunk[keep])
+            if is_classification:
+                model.partial_fit(X, y[keep].to_numpy(), classes=classes)
+            else:
+                model.partial_fit(X, y[keep].to_numpy(dtype=np.float64))
+            train_rows += int(keep.sum())
+    if not train_rows:
+        raise ValueError("No training rows with a target value")
+    training_seconds = time.perf_counter() - start
+    record_stage('train.fit', training_seconds)
+
+    start = time.perf_counter()
+    evaluation = _StreamedMetrics(is_classification, classes)
+    for chunk, holdout in _holdout_masks(chunks()):
+        y = _target_values(chunk, target_column, target_kind)
+        keep = holdout & y.notna().to_numpy()
+        if keep.any():
+            evaluation.update(y[keep].to_numpy(), model.predict(preprocessor.transform_frame(chunk[keep])))
+    metrics = evaluation.result()
+    metrics['model'] = 'sgd'
+    evaluation_seconds = time.perf_counter() - start
+    record_stage('train.evaluate', evaluation_seconds)
+
+    feature_names = preprocessor.feature_names
+    feature_importance = {col: float(imp) for col, imp in zip(feature_names, feature_importances(model, None, None))}
+
+    start = time.perf_counter()
+    model_path = new_model_path()
+    write_model_artifacts(model, model_path)
+
+    preprocessing_steps = {
+        'numerical_cols': list(preprocessor.numerical_cols),
+        'categorical_cols': list(preprocessor.categorical_cols),
+        'encoded_cols': feature_names[len(preprocessor.numerical_cols):],
+        'num_imputer_strategy': 'mean',
+        'cat_imputer_strategy': 'constant',
+        'encoder': None,
+        'preprocessor': save_artifact(preprocessor, preprocessor_path_for(model_path)),
+        'datetime_parts': {},
+        'target_column': target_column,
+        'training_features': feature_names,
+        'sparse': preprocessor.sparse,
+        'out_of_core': True,
+    }
+    record_stage('train.save', time.perf_counter() - start)
+    search_results = {
+        'mode': 'out_of_core',
+        'rows': rows,
+        'train_rows': train_rows,
+        'epochs': epochs,
+        'pass_seconds': {'statistics': stats_seconds, 'training': training_seconds, 'evaluation': evaluation_seconds},
+        'candidates': [],
+        'best': {'family': 'sgd', 'params': model.get_params()},
+    }
+    return model_path, metrics, feature_importance, preprocessing_steps, search_results
@@ -0,0 +1,162 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import random
+import threading
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, f'PREDICTION_LOG_{name}', default)
+
+
+def _truncate(payload, max_rows):
+    if isinstance(payload, list) and max_rows is not None and len(payload) > max_rows:
+        return payload[:max_rows]
+    return payload
+
+
+class DatabaseBackend:
+    def write(self, records):
+        from ..models import Prediction
+
+        Prediction.objects.bulk_create([
+            Prediction(
+                prediction_id=record['prediction_id'],
+                model_id=record['model_pk'],
+                input_data=record['input_data'],
+                predictions=record['predictions'],
+            )
+            for record in records
+        ])
+
+
+class FileBackend:
+    """Appends one JSON document per line to a size-rotated file."""
+
+    def __init__(self):
+        directory = _setting('DIR', os.path.join(settings.BASE_DIR, 'prediction_logs'))
+        os.makedirs(directory, exist_ok=True)
+        self.handler = logging.handlers.RotatingFileHandler(
+            os.path.join(directory, 'predictions.ndjson'),
+            maxBytes=_setting('FILE_MAX_BYTES', 100 * 1024 * 1024),
+            backupCount=_setting('FILE_BACKUP_COUNT', 5),
+        )
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def write(self, records):
+        for record in records:
+            line = json.dumps({
+                'prediction_id': str(record['prediction_id']),
+                'model_id': record['model_id'],
+                'created_at': record['created_at'],
+                'input_data': record['input_data'],
+                'predictions': record['predictions'],
+            }, default=str)
+            self.handler.emit(logging.makeLogRecord({'msg': line}))
+        self.handler.flush()
+
+
+BACKENDS = {
+    'db': DatabaseBackend,
+    'file': FileBackend,
+}
+
+
+class PredictionLogger:
+    """Buffers prediction records in memory and writes them from a background thread.
+
+    ``log`` only samples, truncates and appends to a bounded ring buffer, so
+    the request never waits on the database or disk. When the buffer is full
+    the oldest unwritten records are dropped and counted.
+    """
+
+    def __init__(self):
+        self._buffer = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._backend = None
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def _model_setting(self, model_id, name, default):
+        overrides = _setting('MODEL_OVERRIDES', {}).get(str(model_id), {})
+        return overrides.get(name, _setting(name.upper(), default))
+
+    def _start(self):
+        self._buffer = deque(maxlen=_setting('BUFFER_SIZE', 10000))
+        self._backend = BACKENDS[_setting('BACKEND', 'db')]()
+        self._thread = threading.Thread(target=self._run, name='prediction-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def log(self, model_obj, input_data, predictions):
+        if _setting('BACKEND', 'db') == 'none':
+            return None
+        if random.random() >= self._model_setting(model_obj.model_id, 'sample_rate', 1.0):
+            return None
+
+        max_rows = self._model_setting(model_obj.model_id, 'max_rows', 100)
+        record = {
+            'prediction_id': uuid.uuid4(),
+            'model_pk': model_obj.pk,
+            'model_id': str(model_obj.model_id),
+            'created_at': timezone.now().isoformat(),
+            'input_data': _truncate(input_data, max_rows),
+            'predictions': _truncate(predictions, max_rows),
+        }
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(record)
+            pending = len(self._buffer)
+        if pending >= _setting('BATCH_SIZE', 500):
+            self._wakeup.set()
+        return record['prediction_id']
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(_setting('FLUSH_INTERVAL', 2.0))
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        if self._buffer is None:
+            return
+        batch_size = _setting('BATCH_SIZE', 500)
+        while True:
+            with self._lock:
+                batch = [self._buffer.popleft() for _ in range(min(batch_size, len(self._buffer)))]
+            if not batch:
+                return
+            close_old_connections()
+            try:
+                self._backend.write(batch)
+            except Exception:
+                with self._lock:
+                    self.failed += len(batch)
+                logger.exception("Failed to write %d prediction log records", len(batch))
+            else:
+                with self._lock:
+                    self.written += len(batch)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._buffer) if self._buffer is not None else 0
+            return {'pending': pending, 'written': self.written, 'dropped': self.dropped, 'failed': self.failed}
+
+
+prediction_log = PredictionLogger()
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+MISSING_CATEGORY = 'missing'
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+class FittedPreprocessor:
+    """The fitted imputation + one-hot steps of a training run, flattened to lookups.
+
+    Output columns are the numerical columns (datetime parts included) in
+    training order followed by the one-hot columns, i.e. ``feature_names``.
+    ``transform_records`` is the per-request fast path: it fills one NumPy
+    row per record with plain dict lookups instead of building DataFrames.
+    Numerical columns are optionally standardized with ``numerical_center``
+    and ``numerical_scale`` after imputation.
+    """
+
+    # Class-level defaults keep preprocessors pickled before scaling existed loadable.
+    numerical_center = None
+    numerical_scale = None
+
+    def __init__(self, numerical_cols, numerical_fill, categorical_cols, categories,
+                 datetime_parts=None, sparse=False, numerical_center=None, numerical_scale=None):
+        self.numerical_cols = list(numerical_cols)
+        self.numerical_fill = np.asarray(numerical_fill, dtype=np.float64)
+        self.categorical_cols = list(categorical_cols)
+        self.categories = [list(values) for values in categories]
+        # {raw datetime column: ['year', 'month', ...]}; each part is a numerical column named <col>_<part>
+        self.datetime_parts = dict(datetime_parts or {})
+        self.sparse = sparse
+        if numerical_scale is not None:
+            self.numerical_center = np.asarray(numerical_center, dtype=np.float64)
+            self.numerical_scale = np.asarray(numerical_scale, dtype=np.float64)
+
+        self.offsets = []
+        self.lookups = []
+        offset = len(self.numerical_cols)
+        for values in self.categories:
+            self.offsets.append(offset)
+            self.lookups.append({value: offset + i for i, value in enumerate(values)})
+            offset += len(values)
+        self.n_features = offset
+
+        derived = {f'{col}_{part}': (col, part) for col, parts in self.datetime_parts.items() for part in parts}
+        self._numeric_sources = [derived.get(col, (col, None)) for col in self.numerical_cols]
+        self.raw_features = list(dict.fromkeys([source for source, _ in self._numeric_sources] + self.categorical_cols))
+
+    @classmethod
+    def from_fitted(cls, numerical_cols, num_imputer, categorical_cols, encoder, datetime_parts=None, sparse=False):
+        numerical_fill = num_imputer.statistics_ if num_imputer is not None else []
+        categories = encoder.categories_ if encoder is not None else []
+        return cls(numerical_cols, numerical_fill, categorical_cols, categories, datetime_parts, sparse)
+
+    @property
+    def feature_names(self):
+        names = list(self.numerical_cols)
+        for col, values in zip(self.categorical_cols, self.categories):
+            names.extend(f'{col}_{value}' for value in values)
+        return names
+
+    def _scale(self, numeric):
+        if self.numerical_scale is not None:
+            numeric -= self.numerical_center
+            numeric /= self.numerical_scale
+
+    def _output(self, dense):
+        return sp.csr_matrix(dense) if self.sparse else dense
+
+    def _category_index(self, j, value):
+        if _is_missing(value):
+            value = MISSING_CATEGORY
+        lookup = self.lookups[j]
+        index = lookup.get(value)
+        if index is None and not isinstance(value, str):
+            index = lookup.get(str(value))
+        return index
+
+    def transform_records(self, records):
+        out = np.zeros((len(records), self.n_features))
+        for r, record in enumerate(records):
+            record = {str(key).lower(): value for key, value in record.items()}
+            row = out[r]
+            for i, (source, part) in enumerate(self._numeric_sources):
+                value = record.get(source)
+                try:
+                    if part is not None:
+                        value = getattr(pd.Timestamp(value), part)
+                    value = float(value)
+                except (TypeError, ValueError):
+                    value = np.nan
+                row[i] = self.numerical_fill[i] if value != value else value
+            for j, col in enumerate(self.categorical_cols):
+                index = self._category_index(j, record.get(col))
+                if index is not None:
+                    row[index] = 1.0
+        self._scale(out[:, :len(self.numerical_cols)])
+        return self._output(out)
+
+    def transform_frame(self, frame):
+        frame = frame.rename(columns=lambda col: str(col).lower())
+        n = len(frame)
+        numeric = np.empty((n, len(self.numerical_cols)))
+        parsed_dates = {}
+        for i, (source, part) in enumerate(self._numeric_sources):
+            if source not in frame.columns:
+                numeric[:, i] = self.numerical_fill[i]
+                continue
+            if part is not None:
+                if source not in parsed_dates:
+                    parsed_dates[source] = pd.to_datetime(frame[source], errors='coerce')
+                values = getattr(parsed_dates[source].dt, part).to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = pd.to_numeric(frame[source], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            numeric[:, i] = np.where(np.isnan(values), self.numerical_fill[i], values)
+        self._scale(numeric)
+
+        rows, cols = [], []
+        for j, col in enumerate(self.categorical_cols):
+            if col not in frame.columns:
+                values = np.full(n, MISSING_CATEGORY, dtype=object)
+            else:
+                values = frame[col].astype(object).where(frame[col].notna(), MISSING_CATEGORY).to_numpy()
+            codes = pd.Categorical(values, categories=self.categories[j]).codes.astype(np.int64)
+            unmatched = np.flatnonzero(codes < 0)
+            if unmatched.size:
+                # Request values like 5 should still match a category read from CSV as '5'.
+                retry = pd.Categorical(values[unmatched].astype(str), categories=self.categories[j]).codes
+                codes[unmatched] = retry
+            hit = np.flatnonzero(codes >= 0)
+            rows.append(hit)
+            cols.append(self.offsets[j] + codes[hit])
+
+        if self.sparse:
+            numeric_part = sp.coo_matrix(numeric)
+            rows = np.concatenate([numeric_part.row] + rows)
+            cols = np.concatenate([numeric_part.col] + cols)
+            data = np.concatenate([numeric_part.data, np.ones(len(rows) - numeric_part.nnz)])
+            return sp.csr_matrix((data, (rows, cols)), shape=(n, self.n_features))
+
+        out = np.zeros((n, self.n_features))
+        out[:, :len(self.numerical_cols)] = numeric
+        for hit, index in zip(rows, cols):
+            out[hit, index] = 1.0
+        return out
+
+    def transform(self, input_data):
+        if isinstance(input_data, dict):
+            return self.transform_records([input_data])
+        if isinstance(input_data, list):
+            return self.transform_records(input_data)
+        if isinstance(input_data, pd.DataFrame):
+            return self.transform_frame(input_data)
+        raise ValueError("Input data must be a dictionary, list of dictionaries or DataFrame")
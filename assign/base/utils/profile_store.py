@@ -0,0 +1,179 @@
+"""Per-column profile storage, so a wide upload's profile is read a page of columns at a time.
+
+``profile_chunks`` still returns the whole schema as one dict. ``save_profile``
+splits it into a ``ColumnProfile`` row per column (outliers, skewness and the
+value counts of imbalanced columns go in its ``stats``) and a
+``ColumnCorrelation`` row per reported pair, leaving only table-level fields
+(row count, leakage preview, columnar cache) in ``FileUpload.metadata``.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+# Per-column fields a profile request can pick with ?fields=; the name is always returned.
+# 'correlations' selects the pairs touching the page's columns and 'value_frequencies'
+# the ``imbalanced_columns`` counts, both kept in the shape the full schema used.
+COLUMN_FIELDS = (
+    'name', 'type', 'unique_count', 'null_percentage', 'is_high_cardinality', 'is_constant',
+    'outliers', 'skewness', 'value_frequencies', 'correlations',
+)
+# Schema keys stored as rows rather than in FileUpload.metadata.
+ROW_KEYS = ('columns', 'correlations', 'imbalanced_columns')
+# Metadata kept off the profile response: the columnar cache lists every column's file.
+PRIVATE_KEYS = ('columnar_cache',)
+BULK_BATCH_SIZE = 500
+
+
+def split_schema(schema):
+    """``(metadata, columns, correlations)``: the table-level part of a schema and its unsaved rows."""
+    from ..models import ColumnProfile, ColumnCorrelation
+
+    imbalanced = schema.get('imbalanced_columns') or {}
+    columns = []
+    for position, col in enumerate(schema.get('columns', [])):
+        stats = {key: value for key, value in col.items() if key not in ('name', 'type')}
+        if col['name'] in imbalanced:
+            stats['value_frequencies'] = imbalanced[col['name']]
+        columns.append(ColumnProfile(position=position, name=str(col['name']), type=col['type'], stats=stats))
+    correlations = [
+        ColumnCorrelation(
+            column_a=str(pair['columns'][0]), column_b=str(pair['columns'][1]),
+            correlation=pair['correlation'], strength=abs(pair['correlation']),
+        )
+        for pair in schema.get('correlations', [])
+    ]
+    metadata = {key: value for key, value in schema.items() if key not in ROW_KEYS}
+    metadata['column_count'] = len(columns)
+    metadata['correlation_count'] = len(correlations)
+    return metadata, columns, correlations
+
+
+def _replace_rows(file_obj, columns, correlations):
+    from ..models import ColumnProfile, ColumnCorrelation
+
+    file_obj.column_profiles.all().delete()
+    file_obj.correlations.all().delete()
+    for row in columns + correlations:
+        row.pk = None
+        row.session = file_obj
+    ColumnProfile.objects.bulk_create(columns, batch_size=BULK_BATCH_SIZE)
+    ColumnCorrelation.objects.bulk_create(correlations, batch_size=BULK_BATCH_SIZE)
+
+
+def save_profile(file_obj, schema):
+    """Store a ``profile_chunks`` schema for a saved session, replacing any profile it had."""
+    metadata, columns, correlations = split_schema(schema)
+    with transaction.atomic():
+        _replace_rows(file_obj, columns, correlations)
+        file_obj.metadata = metadata
+        file_obj.save()
+
+
+def copy_profile(source, file_obj):
+    """Give ``file_obj`` the stored profile of ``source``, an earlier upload of the same content."""
+    with transaction.atomic():
+        _replace_rows(file_obj, list(source.column_profiles.all()), list(source.correlations.all()))
+        file_obj.metadata = source.metadata
+        file_obj.save()
+
+
+def schema_columns(session):
+    """The column entries of a stored profile (``name``, ``type`` and stats), in file order.
+
+    ``session`` is a FileUpload or its pk.
+    """
+    from ..models import ColumnProfile
+
+    return [
+        {'name': name, 'type': column_type, **stats}
+        for name, column_type, stats in ColumnProfile.objects.filter(session=session).values_list('name', 'type', 'stats')
+    ]
+
+
+def _names(values):
+    # Repeated and/or comma-separated query parameters.
+    names = [name.strip() for value in values for name in value.split(',') if name.strip()]
+    return names or None
+
+
+def page_options(params):
+    """``profile_page`` keyword arguments from a request's query parameters."""
+    return {
+        'fields': _names(params.getlist('fields')),
+        'columns': _names(params.getlist('columns')),
+        'column_type': params.get('type') or None,
+        'offset': params.get('offset', 0),
+        'limit': params.get('limit'),
+    }
+
+
+def _count(value, name, minimum):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+
+def profile_page(file_obj, fields=None, columns=None, column_type=None, offset=0, limit=None):
+    """One page of a session's profile, shaped like the schema ``profile_chunks`` returns.
+
+    ``columns`` (names) and ``column_type`` filter the columns and ``fields``
+    picks what is returned for them (all of ``COLUMN_FIELDS`` by default).
+    Correlations and value counts are limited to the page's columns, so the
+    payload grows with ``limit`` (PROFILE_PAGE_SIZE by default, at most
+    PROFILE_MAX_PAGE_SIZE) and not with the width of the table.
+    """
+    max_limit = getattr(settings, 'PROFILE_MAX_PAGE_SIZE', 1000)
+    limit = _count(getattr(settings, 'PROFILE_PAGE_SIZE', 100) if limit is None else limit, 'limit', 1)
+    if limit > max_limit:
+        raise ValueError(f"limit must be at most {max_limit}")
+    offset = _count(offset, 'offset', 0)
+    fields = list(COLUMN_FIELDS) if fields is None else fields
+    unknown = [field for field in fields if field not in COLUMN_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown profile fields {unknown}, expected some of {list(COLUMN_FIELDS)}")
+
+    queryset = file_obj.column_profiles.all()
+    if columns is not None:
+        queryset = queryset.filter(name__in=columns)
+    if column_type is not None:
+        queryset = queryset.filter(type=column_type)
+    stat_fields = [field for field in fields if field not in ('name', 'type', 'value_frequencies', 'correlations')]
+    if not stat_fields and 'value_frequencies' not in fields:
+        queryset = queryset.defer('stats')
+    total = queryset.count()
+    page = list(queryset[offset:offset + limit])
+
+    entries = []
+    for column in page:
+        entry = {'name': column.name}
+        if 'type' in fields:
+            entry['type'] = column.type
+        for field in stat_fields:
+            if field in column.stats:
+                entry[field] = column.stats[field]
+        entries.append(entry)
+
+    metadata = {key: value for key, value in (file_obj.metadata or {}).items() if key not in ROW_KEYS + PRIVATE_KEYS}
+    metadata['columns'] = entries
+    names = [column.name for column in page]
+    if 'correlations' in fields:
+        pairs = file_obj.correlations.filter(Q(column_a__in=names) | Q(column_b__in=names))[:limit]
+        metadata['correlations'] = [{'columns': [pair.column_a, pair.column_b], 'correlation': pair.correlation} for pair in pairs]
+    if 'value_frequencies' in fields:
+        metadata['imbalanced_columns'] = {
+            column.name: column.stats['value_frequencies'] for column in page if 'value_frequencies' in column.stats
+        }
+    return {
+        'session_id': file_obj.session_id,
+        'metadata': metadata,
+        'pagination': {
+            'offset': offset,
+            'limit': limit,
+            'total': total,
+            'next_offset': offset + limit if offset + limit < total else None,
+        },
+    }
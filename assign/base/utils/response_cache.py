@@ -0,0 +1,88 @@
+"""Cached payloads and ETag/Last-Modified validators for the read-only endpoints.
+
+Validators come from the row's ``updated_at``, so they change whenever the
+session or model is saved. Cached payloads are stored together with the
+validator they were built for: an entry left behind by a save in another
+process (e.g. a training worker) no longer matches and is rebuilt, and
+saves in this process drop the entry straight away (see ``base.signals``).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _version(request, model, lookup, value):
+    # condition() asks for the ETag and Last-Modified separately; look the row up once per request.
+    memo = request.__dict__.setdefault('_response_versions', {})
+    key = (model.__name__, value)
+    if key not in memo:
+        try:
+            updated_at = model.objects.filter(**{lookup: value}).values_list('updated_at', flat=True).first()
+        except (ValidationError, ValueError):
+            updated_at = None
+        memo[key] = updated_at
+    return memo[key]
+
+
+def validators(model, lookup, kwarg):
+    """``(etag_func, last_modified_func)`` for ``django.views.decorators.http.condition``."""
+
+    def last_modified(request, **kwargs):
+        return _version(request, model, lookup, kwargs[kwarg])
+
+    def etag(request, **kwargs):
+        updated_at = last_modified(request, **kwargs)
+        if updated_at is None:
+            return None
+        return _etag(kwargs[kwarg], updated_at)
+
+    return etag, last_modified
+
+
+def _etag(value, updated_at):
+    return f'{value}-{int(updated_at.timestamp() * 1000000)}'
+
+
+async def aconditional_response(request, model, lookup, value):
+    """Async counterpart of ``condition(*validators(...))``, whose validators would query synchronously.
+
+    Returns ``(response, headers)``: a 304/412 response when the request's
+    preconditions decide it (else None), and the validator headers to set on
+    the full response.
+    """
+    try:
+        updated_at = await model.objects.filter(**{lookup: value}).values_list('updated_at', flat=True).afirst()
+    except (ValidationError, ValueError):
+        updated_at = None
+    if updated_at is None:
+        return None, {}
+    etag = quote_etag(_etag(value, updated_at))
+    last_modified = int(updated_at.timestamp())
+    headers = {'ETag': etag, 'Last-Modified': http_date(last_modified)}
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None and request.method in ('GET', 'HEAD'):
+        for name, header in headers.items():
+            response.headers.setdefault(name, header)
+    return response, headers
+
+
+def cached_payload(kind, key, version, build):
+    """Return the payload cached for ``kind``/``key`` at ``version``, building and storing it if needed."""
+    cache = response_cache()
+    cache_key = f'{kind}:{key}'
+    entry = cache.get(cache_key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    payload = build()
+    cache.set(cache_key, (version, payload), getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 3600))
+    return payload
+
+
+def invalidate(kind, key):
+    response_cache().delete(f'{kind}:{key}')
@@ -0,0 +1,137 @@
+"""New versions of a trained model for a session that has grown by appended rows.
+
+Two strategies, both looking only at the newest rows:
+
+- ``warm_start`` keeps the parent forest's trees and fits
+  RETRAIN_WARM_START_ESTIMATORS more on the last ``rows`` rows (the views
+  default them to the session's last append), reusing the parent's fitted
+  preprocessing so the feature space stays the same;
+- ``window`` trains from scratch, like a first training run, on the last
+  ``rows`` rows (RETRAIN_WINDOW_ROWS by default, all rows when None).
+
+A warm start falls back to a window refit when the parent cannot grow: models
+other than random forests, models from before the fitted preprocessor was
+persisted, or appended rows whose classes differ from the parent's. Gradient
+boosting is refit too: its histogram bins are rebuilt on every fit, so the
+parent's trees would be scored, and new ones fitted, on the wrong bins.
+"""
+import logging
+import os
+
+import joblib
+import numpy as np
+from django.conf import settings
+from sklearn.model_selection import train_test_split
+
+from .artifact_storage import new_model_path
+from .artifacts import FOREST_TYPES, load_artifact, save_artifact, write_model_artifacts
+from .automl import feature_importances
+from .metrics import span
+from .ml_pipeline import evaluate, read_training_frame, train_model
+from .model_cache import encoder_path_for, preprocessor_path_for
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('warm_start', 'window')
+
+
+def warm_start(parent, file_path, columnar_cache=None, columns=None, rows=None):
+    """Grow ``parent``'s model on the last ``rows`` rows; None when it cannot be warm-started."""
+    steps = parent.preprocessing_steps or {}
+    preprocessor_path = preprocessor_path_for(parent.model_path)
+    if not steps.get('preprocessor') or not os.path.exists(preprocessor_path):
+        return None
+    with span('train.read'):
+        # Loaded without the memory map: the fitted estimators are extended in place.
+        model = joblib.load(parent.model_path)
+        if not isinstance(model, FOREST_TYPES):
+            return None
+        preprocessor = load_artifact(preprocessor_path)
+        target_column = steps['target_column']
+        df = read_training_frame(file_path, target_column, columnar_cache, columns, rows)
+        df.columns = [col.lower() for col in df.columns]
+    if target_column not in df.columns:
+        raise ValueError(f"Target column '{target_column}' not found in dataset. Available columns: {list(df.columns)}")
+
+    with span('train.encode'):
+        X = preprocessor.transform_frame(df.drop(columns=[target_column]))
+    y = df[target_column].to_numpy()
+    try:
+        with span('train.split'):
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    except Exception as e:
+        raise ValueError(f"Error splitting data: {str(e)}")
+
+    is_classification = hasattr(model, 'classes_')
+    # Every estimator must predict the same classes in the same order.
+    if is_classification and not np.array_equal(np.unique(y_train), model.classes_):
+        logger.info("Appended rows of model %s have different classes; refitting instead", parent.model_id)
+        return None
+
+    added = getattr(settings, 'RETRAIN_WARM_START_ESTIMATORS', 50)
+    try:
+        with span('train.fit'):
+            model.set_params(warm_start=True, n_estimators=model.n_estimators + added, n_jobs=getattr(settings, 'AUTOML_N_JOBS', -1))
+            model.fit(X_train, y_train)
+            # Served like any other model: no warm start left on, no thread pool per prediction.
+            model.set_params(warm_start=False, n_jobs=None)
+    except Exception as e:
+        raise ValueError(f"Error training model: {str(e)}")
+
+    with span('train.evaluate'):
+        metrics = evaluate(model, X_test, y_test, is_classification)
+        metrics['model'] = (parent.metrics or {}).get('model')
+        feature_names = steps.get('training_features') or preprocessor.feature_names
+        feature_importance = {col: float(imp) for col, imp in zip(feature_names, feature_importances(model, X_test, y_test))}
+
+    with span('train.save'):
+        model_path = new_model_path()
+        write_model_artifacts(model, model_path)
+        preprocessing_steps = dict(steps)
+        preprocessing_steps['preprocessor'] = save_artifact(preprocessor, preprocessor_path_for(model_path))
+        if steps.get('encoder') and os.path.exists(encoder_path_for(parent.model_path)):
+            preprocessing_steps['encoder'] = save_artifact(load_artifact(encoder_path_for(parent.model_path)), encoder_path_for(model_path))
+
+    search_results = {
+        'strategy': 'warm_start',
+        'parent': str(parent.model_id),
+        'rows': len(df),
+        'added_estimators': added,
+        'best': (parent.search_results or {}).get('best'),
+    }
+    return model_path, metrics, feature_importance, preprocessing_steps, search_results
+
+
+def parse_retrain_options(data):
+    """``(strategy, rows)`` from a request: ``strategy`` (default warm_start) and ``window_rows``."""
+    strategy = data.get('strategy') or 'warm_start'
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown retrain strategy '{strategy}', expected one of {list(STRATEGIES)}")
+    rows = data.get('window_rows')
+    if rows in (None, ''):
+        return strategy, None
+    try:
+        rows = int(rows)
+    except (TypeError, ValueError):
+        raise ValueError(f"window_rows must be a number of rows, got '{rows}'")
+    if rows < 1:
+        raise ValueError("window_rows must be a positive number of rows")
+    return strategy, rows
+
+
+def retrain_model(parent, file_path, columnar_cache=None, columns=None, strategy='warm_start', rows=None, time_budget=None):
+    """Train a new version of ``parent``; returns what ``train_model`` does."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown retrain strategy '{strategy}', expected one of {list(STRATEGIES)}")
+    if strategy == 'warm_start':
+        result = warm_start(parent, file_path, columnar_cache, columns, rows)
+        if result is not None:
+            return result
+        rows = None
+    rows = getattr(settings, 'RETRAIN_WINDOW_ROWS', None) if rows is None else rows
+    model_path, metrics, feature_importance, preprocessing_steps, search_results = train_model(
+        file_path, (parent.preprocessing_steps or {}).get('target_column') or parent.target_column,
+        columnar_cache=columnar_cache, time_budget=time_budget, columns=columns, last_rows=rows,
+    )
+    search_results.update(strategy='window', parent=str(parent.model_id), rows=rows)
+    return model_path, metrics, feature_importance, preprocessing_steps, search_results
@@ -0,0 +1,394 @@
+"""Mergeable summaries used by the streaming profiler.
+
+Every class here can be fed chunk by chunk with ``update`` and combined with
+``merge``, so a profile of a file is the same whether it was built in one
+pass or stitched together from pieces. Memory is bounded by the sketch
+parameters, not by the number of rows seen.
+"""
+import numpy as np
+import pandas as pd
+
+
+class OnlineMoments:
+    """Count, mean and 2nd/3rd central moment sums (Pebay's update formulas)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        other = OnlineMoments()
+        other.n = values.size
+        other.mean = float(values.mean())
+        deltas = values - other.mean
+        other.m2 = float(np.dot(deltas, deltas))
+        other.m3 = float(np.sum(deltas ** 3))
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other):
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m2, self.m3 = other.n, other.mean, other.m2, other.m3
+            self.min, self.max = other.min, other.max
+            return
+        na, nb = self.n, other.n
+        n = na + nb
+        delta = other.mean - self.mean
+        m3 = (self.m3 + other.m3
+              + delta ** 3 * na * nb * (na - nb) / n ** 2
+              + 3.0 * delta * (na * other.m2 - nb * self.m2) / n)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * na * nb / n
+        self.m3 = m3
+        self.mean = self.mean + delta * nb / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def variance(self):
+        if self.n < 2:
+            return None
+        return self.m2 / (self.n - 1)
+
+    def skewness(self):
+        # Same bias-adjusted estimator as pandas.Series.skew
+        if self.n < 3:
+            return None
+        if self.m2 == 0:
+            return 0.0
+        n = self.n
+        return float(n * (n - 1) ** 0.5 / (n - 2) * self.m3 / self.m2 ** 1.5)
+
+
+class QuantileSketch:
+    """KLL-style compactor hierarchy; level ``i`` items stand for ``2**i`` rows."""
+
+    def __init__(self, k=256, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.compacted = False
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for i, items in enumerate(other.levels):
+            self.levels[i] = np.concatenate([self.levels[i], items])
+        self.compacted = self.compacted or other.compacted
+        self._compress()
+
+    def _compress(self):
+        i = 0
+        while i < len(self.levels):
+            items = self.levels[i]
+            if items.size > self.k:
+                items = np.sort(items)
+                keep = items[-1:] if items.size % 2 else items[:0]
+                paired = items[:items.size - keep.size]
+                promoted = paired[self._rng.integers(2)::2]
+                if i + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[i + 1] = np.concatenate([self.levels[i + 1], promoted])
+                self.levels[i] = keep
+                self.compacted = True
+            i += 1
+
+    def count(self):
+        return int(sum(items.size << i for i, items in enumerate(self.levels)))
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 1 << i, dtype=np.int64) for i, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        if not self.compacted:
+            # Nothing has been summarised yet, so answer exactly (pandas' linear interpolation).
+            return float(np.quantile(self.levels[0], q)) if self.levels[0].size else None
+        items, cumulative = self._weighted()
+        if not items.size:
+            return None
+        position = q * cumulative[-1]
+        return float(items[min(np.searchsorted(cumulative, position, side='left'), items.size - 1)])
+
+    def rank(self, value):
+        """Approximate number of items strictly below ``value``."""
+        if not self.compacted:
+            return int(np.count_nonzero(self.levels[0] < value))
+        items, cumulative = self._weighted()
+        index = np.searchsorted(items, value, side='left')
+        return int(cumulative[index - 1]) if index else 0
+
+
+def hash_values(values):
+    """64-bit hashes that treat 1 and 1.0 alike, so dtype drift between chunks is harmless."""
+    values = pd.Series(values).dropna()
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        values = values.astype(np.float64)
+    return pd.util.hash_array(values.to_numpy())
+
+
+class HyperLogLog:
+    """Distinct counter that stays exact until ``2**p`` distinct hashes, then switches to HLL."""
+
+    def __init__(self, p=12):
+        if not 12 <= p <= 16:
+            raise ValueError("HyperLogLog precision must be between 12 and 16")
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+        self.exact = np.empty(0, dtype=np.uint64)
+
+    def update_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not hashes.size:
+            return
+        if self.exact is not None:
+            self.exact = np.union1d(self.exact, hashes)
+            if self.exact.size > self.m:
+                self.exact = None
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        # The low 64-p bits fit exactly in a float64 mantissa, so frexp gives their bit length.
+        rest = (hashes & np.uint64((1 << (64 - self.p)) - 1)).astype(np.float64)
+        bit_length = np.frexp(rest)[1]
+        rho = (64 - self.p - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rho)
+
+    def update(self, values):
+        self.update_hashes(hash_values(values))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        if self.exact is not None and other.exact is not None:
+            self.exact = np.union1d(self.exact, other.exact)
+            if self.exact.size > self.m:
+                self.exact = None
+        else:
+            self.exact = None
+
+    def count(self):
+        if self.exact is not None:
+            return int(self.exact.size)
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+
+class FrequentItems:
+    """Misra-Gries heavy hitters; counts are exact until more than ``capacity`` values show up."""
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+        self.exact = True
+
+    def update(self, values):
+        counts = pd.Series(values).value_counts(dropna=True)
+        self.total += int(counts.sum())
+        for value, count in zip(counts.index.tolist(), counts.tolist()):
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        self._prune()
+
+    def merge(self, other):
+        self.total += other.total
+        self.exact = self.exact and other.exact
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self._prune()
+
+    def _prune(self):
+        if len(self.counts) <= self.capacity:
+            return
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        floor = ranked[self.capacity][1]
+        self.counts = {value: count - floor for value, count in ranked[:self.capacity] if count > floor}
+        self.exact = False
+
+    def frequencies(self):
+        if not self.total:
+            return {}
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return {value: count / self.total for value, count in ranked}
+
+
+class Extremes:
+    """The ``k`` smallest and ``k`` largest values seen, for reporting raw outliers."""
+
+    def __init__(self, k=10):
+        self.k = k
+        self.low = np.empty(0)
+        self.high = np.empty(0)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size:
+            self._absorb(values, values)
+
+    def merge(self, other):
+        self._absorb(other.low, other.high)
+
+    def _absorb(self, low, high):
+        low = np.concatenate([self.low, low])
+        high = np.concatenate([self.high, high])
+        self.low = np.sort(low)[:self.k] if low.size > self.k else np.sort(low)
+        self.high = np.sort(high)[::-1][:self.k]
+
+    def beyond(self, lower_bound, upper_bound, limit=10):
+        low = [v for v in self.low.tolist() if v < lower_bound]
+        high = [v for v in self.high.tolist() if v > upper_bound]
+        picked = []
+        for i in range(max(len(low), len(high))):
+            picked.extend(side[i] for side in (low, high) if i < len(side))
+        return picked[:limit]
+
+
+class CovarianceAccumulator:
+    """Pairwise-complete co-moment sums over a fixed set of columns.
+
+    Values are shifted by the first chunk's column means before accumulating,
+    which keeps the plain sum-of-products formulas numerically well behaved.
+    Each chunk is processed in blocks of ``block_size`` columns whose products
+    are taken in float32, so the temporaries stay at a few float32 blocks
+    however wide the table is. Those per-chunk block products are added to
+    float64 totals, and merges are done in float64: float32 running sums over
+    millions of rows would lose the digits the correlations are computed from,
+    and row counts past 2**24 would stop being exact.
+
+    Pickled, the state is four k x k float64 matrices, or one when no column
+    had a missing value: then every pair saw every row, and ``n``, ``sx`` and
+    ``sxx`` are kept as one value per column.
+    """
+
+    def __init__(self, columns, block_size=256):
+        self.columns = list(columns)
+        self.block_size = block_size
+        k = len(self.columns)
+        self.shift = None
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.n.size and (self.n == self.n.flat[0]).all():
+            state.update(n=self.n.flat[0], sx=self.sx[:, 0].copy(), sxx=self.sxx[:, 0].copy())
+        return state
+
+    def __setstate__(self, state):
+        if np.ndim(state['n']) == 0:
+            k = len(state['columns'])
+            state.update(
+                n=np.full((k, k), state['n']),
+                sx=np.repeat(state['sx'][:, None], k, axis=1),
+                sxx=np.repeat(state['sxx'][:, None], k, axis=1),
+            )
+        self.__dict__.update(state)
+
+    @staticmethod
+    def _values(matrix, start, stop):
+        values = matrix.iloc[:, start:stop] if hasattr(matrix, 'iloc') else matrix[:, start:stop]
+        return np.asarray(values, dtype=np.float64)
+
+    def _block(self, matrix, start, stop):
+        values = self._values(matrix, start, stop)
+        present = ~np.isnan(values)
+        centered = np.where(present, values - self.shift[start:stop], 0.0).astype(np.float32)
+        dense = bool(present.all())
+        return centered, (None if dense else present.astype(np.float32))
+
+    def _add(self, a, b, block_a, block_b, rows):
+        centered_a, mask_a = block_a
+        centered_b, mask_b = block_b
+        self.sxy[a, b] += centered_a.T @ centered_b
+        if mask_a is None and mask_b is None:
+            # No missing values in either block: every pair saw every row.
+            self.n[a, b] += rows
+            self.sx[a, b] += centered_a.sum(axis=0, dtype=np.float64)[:, None]
+            self.sxx[a, b] += np.einsum('ij,ij->j', centered_a, centered_a, dtype=np.float64)[:, None]
+            return
+        if mask_a is None:
+            mask_a = np.ones_like(centered_a)
+        if mask_b is None:
+            mask_b = np.ones_like(centered_b)
+        self.n[a, b] += mask_a.T @ mask_b
+        self.sx[a, b] += centered_a.T @ mask_b
+        self.sxx[a, b] += (centered_a * centered_a).T @ mask_b
+
+    def update(self, matrix):
+        """Add the rows of a 2-D array or DataFrame whose columns are ``self.columns``."""
+        k = len(self.columns)
+        rows = matrix.shape[0]
+        bounds = [(start, min(start + self.block_size, k)) for start in range(0, k, self.block_size)]
+        if self.shift is None:
+            self.shift = np.zeros(k)
+            for start, stop in bounds:
+                if rows:
+                    with np.errstate(all='ignore'):
+                        self.shift[start:stop] = np.nan_to_num(np.nanmean(self._values(matrix, start, stop), axis=0))
+        for i, (a0, a1) in enumerate(bounds):
+            block_a = self._block(matrix, a0, a1)
+            self._add(slice(a0, a1), slice(a0, a1), block_a, block_a, rows)
+            for b0, b1 in bounds[i + 1:]:
+                block_b = self._block(matrix, b0, b1)
+                self._add(slice(a0, a1), slice(b0, b1), block_a, block_b, rows)
+                self._add(slice(b0, b1), slice(a0, a1), block_b, block_a, rows)
+
+    def merge(self, other):
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift, self.n, self.sx, self.sxx, self.sxy = other.shift, other.n.copy(), other.sx.copy(), other.sxx.copy(), other.sxy.copy()
+            return
+        # Re-express the other side's sums around this side's shift before adding.
+        d = other.shift - self.shift
+        sx = other.sx + d[:, None] * other.n
+        sxx = other.sxx + 2 * d[:, None] * other.sx + (d ** 2)[:, None] * other.n
+        sxy = other.sxy + d[:, None] * other.sx.T + d[None, :] * other.sx + np.outer(d, d) * other.n
+        self.n += other.n
+        self.sx += sx
+        self.sxx += sxx
+        self.sxy += sxy
+
+    def correlation(self, rows=None, cols=None):
+        """Correlation matrix, or the ``rows`` x ``cols`` block of it for index arrays into ``columns``."""
+        k = len(self.columns)
+        rows = np.arange(k) if rows is None else np.asarray(rows, dtype=np.intp)
+        cols = np.arange(k) if cols is None else np.asarray(cols, dtype=np.intp)
+        block = np.ix_(rows, cols)
+        with np.errstate(all='ignore'):
+            n = self.n[block]
+            sx = self.sx[block]
+            sy = self.sx.T[block]
+            cov = self.sxy[block] - sx * sy / n
+            var_x = self.sxx[block] - sx ** 2 / n
+            var_y = self.sxx.T[block] - sy ** 2 / n
+            corr = cov / np.sqrt(var_x * var_y)
+        corr[n < 2] = np.nan
+        diagonal = np.nonzero(rows[:, None] == cols[None, :])
+        valid = (self.n[rows, rows] >= 2) & (self.sxx[rows, rows] - self.sx[rows, rows] ** 2 / np.maximum(self.n[rows, rows], 1) > 0)
+        corr[diagonal] = np.where(valid[diagonal[0]], 1.0, np.nan)
+        return np.clip(corr, -1.0, 1.0)
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.utils import timezone
+
+from .ml_pipeline import train_model
+from .retraining import retrain_model
+from .metrics import collect_stages, record_stage, registry, span
+from .correlations import leakage_scores, read_sample
+from .insights import generate_insights
+from .artifact_storage import enforce_quotas, record_model
+from .profile_store import schema_columns
+
+# Models are imported inside the functions: spawned workers import this module
+# to unpickle the initializer, before django.setup() has populated the app registry.
+
+
+training_jobs_total = registry.counter('training_jobs_total', 'Finished training jobs by outcome.')
+
+
+class QueueFull(Exception):
+    pass
+
+
+def parse_time_budget(value):
+    if value in (None, ''):
+        return None
+    try:
+        time_budget = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"time_budget must be a number of seconds, got '{value}'")
+    if not time_budget >= 0:
+        raise ValueError("time_budget must be zero or a positive number of seconds")
+    return min(time_budget, getattr(settings, 'AUTOML_MAX_TIME_BUDGET', 600))
+
+
+# Bump when a pipeline change should stop earlier models from being reused.
+TRAINING_CONFIG_VERSION = 1
+
+TRAINING_CONFIG_SETTINGS = [
+    'AUTOML_CANDIDATES', 'AUTOML_HALVING_FACTOR', 'AUTOML_MIN_ROWS',
+    'SPARSE_FEATURE_DENSITY_THRESHOLD', 'OUT_OF_CORE_THRESHOLD_BYTES', 'OUT_OF_CORE_EPOCHS',
+    'OUT_OF_CORE_MAX_CATEGORIES',
+]
+
+
+def training_key(content_hash, target_column, time_budget):
+    """Identify a training run by its input content and everything that configures it."""
+    if not content_hash:
+        return None
+    if time_budget is None:
+        time_budget = getattr(settings, 'AUTOML_TIME_BUDGET', 60)
+    config = {
+        'version': TRAINING_CONFIG_VERSION,
+        'content_hash': content_hash,
+        'target_column': target_column.lower() if target_column else None,
+        'time_budget': float(time_budget),
+        'settings': {name: getattr(settings, name, None) for name in TRAINING_CONFIG_SETTINGS},
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def find_trained_model(key):
+    from ..models import TrainedModel
+
+    if key is None:
+        return None
+    return TrainedModel.objects.filter(training_key=key).order_by('-created_at').first()
+
+
+_executor = None
+_lock = threading.Lock()
+_in_flight = 0
+_futures = {}  # job pk -> future, for the jobs this process's executor holds
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn keeps the parent's open DB connections and threads out of the workers
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'TRAINING_JOB_WORKERS', 2),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def submit_training_job(job):
+    global _in_flight
+    max_in_flight = getattr(settings, 'TRAINING_JOB_WORKERS', 2) + getattr(settings, 'TRAINING_JOB_QUEUE_DEPTH', 8)
+    with _lock:
+        if _in_flight >= max_in_flight:
+            raise QueueFull(f"Training queue is full ({max_in_flight} jobs in flight)")
+        _in_flight += 1
+        try:
+            future = _get_executor().submit(run_training_job, job.pk)
+        except Exception:
+            _in_flight -= 1
+            raise
+        _futures[job.pk] = future
+    future.add_done_callback(lambda f: _on_job_done(job.pk, f))
+    return future
+
+
+def _on_job_done(job_pk, future):
+    global _executor, _in_flight
+    from ..models import TrainingJob
+
+    with _lock:
+        _in_flight -= 1
+        _futures.pop(job_pk, None)
+    error = future.exception()
+    if error is None:
+        # Spans recorded in the worker process only reach this process's metrics through the result.
+        result = future.result()
+        for stage, seconds in result['stage_timings'].items():
+            record_stage(stage, seconds)
+        training_jobs_total.inc(status=result['status'])
+        return
+    training_jobs_total.inc(status='crashed')
+    # The worker died before it could record the outcome itself (e.g. OOM kill).
+    TrainingJob.objects.filter(pk=job_pk).exclude(status=TrainingJob.STATUS_SUCCEEDED).update(
+        status=TrainingJob.STATUS_FAILED,
+        error=f"Training worker failed: {error}",
+        finished_at=timezone.now(),
+    )
+    with _lock:
+        if _executor is not None and getattr(_executor, '_broken', False):
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _owner_alive(owner):
+    """Whether the process that queued a job may still be running it; other hosts' are assumed to be."""
+    from ..models import process_owner
+
+    if owner == process_owner():
+        return None  # answered by this process's own futures
+    host, _, pid = owner.rpartition(':')
+    if not pid.isdigit():
+        return False
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def fail_orphaned_jobs(jobs=None, dry_run=False):
+    """Fail queued or running jobs whose process has exited, e.g. across a restart; returns them.
+
+    Such jobs would otherwise report progress forever and keep their session
+    from being evicted. ``jobs`` narrows the check to a queryset of jobs.
+    """
+    from ..models import TrainingJob
+
+    active = [TrainingJob.STATUS_QUEUED, TrainingJob.STATUS_RUNNING]
+    jobs = (TrainingJob.objects.all() if jobs is None else jobs).filter(status__in=active).only('id', 'job_id', 'owner')
+    with _lock:
+        held = set(_futures)
+    orphans = []
+    for job in jobs:
+        alive = _owner_alive(job.owner)
+        if not (job.pk in held if alive is None else alive):
+            orphans.append(job)
+    if orphans and not dry_run:
+        TrainingJob.objects.filter(pk__in=[job.pk for job in orphans], status__in=active).update(
+            status=TrainingJob.STATUS_FAILED,
+            error="Training was interrupted: the process running it exited",
+            finished_at=timezone.now(),
+        )
+    return orphans
+
+
+def run_training_job(job_pk):
+    from ..models import TrainingJob, TrainedModel
+
+    job = TrainingJob.objects.select_related('session', 'parent_model').get(pk=job_pk)
+    job.status = TrainingJob.STATUS_RUNNING
+    job.started_at = timezone.now()
+    job.timings = {'queued': (job.started_at - job.created_at).total_seconds()}
+    job.save(update_fields=['status', 'started_at', 'timings'])
+
+    stage_timings = {}
+    try:
+        start = time.perf_counter()
+        with collect_stages() as stage_timings:
+            if job.parent_model is not None:
+                model_path, metrics, feature_importance, preprocessing_steps, search_results = retrain_model(
+                    job.parent_model,
+                    job.session.file.path,
+                    columnar_cache=(job.session.metadata or {}).get('columnar_cache'),
+                    columns=schema_columns(job.session),
+                    strategy=job.retrain_strategy or TrainingJob.RETRAIN_WARM_START,
+                    rows=job.window_rows,
+                    time_budget=job.time_budget,
+                )
+            else:
+                model_path, metrics, feature_importance, preprocessing_steps, search_results = train_model(
+                    job.session.file.path,
+                    job.target_column,
+                    columnar_cache=(job.session.metadata or {}).get('columnar_cache'),
+                    time_budget=job.time_budget,
+                    columns=schema_columns(job.session),
+                )
+            with span('train.leakage'):
+                leakage = leakage_scores(
+                    read_sample(
+                        job.session.file.path, (job.session.metadata or {}).get('columnar_cache'),
+                        total_rows=(job.session.metadata or {}).get('row_count'),
+                    ),
+                    preprocessing_steps['target_column'],
+                )
+        job.timings['training'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        trained_model = TrainedModel.objects.create(
+            session=job.session,
+            model_path=model_path,
+            target_column=job.target_column or 'inferred',
+            metrics=metrics,
+            feature_importance=feature_importance,
+            preprocessing_steps=preprocessing_steps,
+            search_results=search_results,
+            stage_timings=stage_timings,
+            # Retrained versions depend on their parent, so identical requests do not reuse them.
+            training_key=training_key(job.session.content_hash, job.target_column, job.time_budget) if job.parent_model is None else None,
+            parent=job.parent_model,
+            version=job.parent_model.version + 1 if job.parent_model is not None else 1,
+            leakage=leakage,
+            insights=generate_insights(job.target_column or 'inferred', metrics, feature_importance, leakage),
+        )
+        record_model(trained_model)
+        job.timings['saving'] = time.perf_counter() - start
+        stage_timings['train.db_write'] = job.timings['saving']
+        enforce_quotas(job.session, keep_model=trained_model)
+
+        job.trained_model = trained_model
+        job.status = TrainingJob.STATUS_SUCCEEDED
+    except Exception as e:
+        job.status = TrainingJob.STATUS_FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.timings['total'] = (job.finished_at - job.created_at).total_seconds()
+    job.save(update_fields=['status', 'error', 'trained_model', 'timings', 'finished_at'])
+    return {'status': job.status, 'stage_timings': stage_timings}
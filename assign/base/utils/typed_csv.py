@@ -0,0 +1,106 @@
+"""``pd.read_csv`` with the types an upload's profile already worked out.
+
+Read without hints, pandas re-infers every column and keeps text as object
+strings, numbers as 64 bit and dates unparsed. ``read_options`` turns the
+stored column profiles into ``usecols``, ``dtype``, ``parse_dates`` and
+``date_format``:
+
+- text columns become ``category``, floats become ``CSV_FLOAT_DTYPE``
+  (the target keeps full precision);
+- datetime columns are parsed with the format profiling found for them;
+- only the columns the caller keeps are parsed at all.
+
+Profiles written before these hints existed still get the parts they
+support. A file that turns out not to fit its hints is read without them.
+"""
+import logging
+
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _floats_dtype():
+    return getattr(settings, 'CSV_FLOAT_DTYPE', 'float32') or None
+
+
+def read_options(columns, header, keep=None, target_column=None):
+    """``read_csv`` keyword arguments for a file with ``header`` profiled as ``columns``.
+
+    ``columns`` are profile entries (``name``, ``type`` and the column stats);
+    ``keep`` is a predicate on header names, the rest are not parsed. Header
+    names the profile does not know are read without hints.
+    """
+    float_dtype = _floats_dtype()
+    target = target_column.lower() if target_column else None
+    profiles = {col['name']: col for col in columns}
+    usecols, dtype, parse_dates, date_format = [], {}, [], {}
+    for name in header:
+        if keep is not None and not keep(name):
+            continue
+        usecols.append(name)
+        col = profiles.get(name)
+        if col is None:
+            continue
+        if col['type'] == 'datetime':
+            parse_dates.append(name)
+            if col.get('datetime_format'):
+                date_format[name] = col['datetime_format']
+        elif col['type'] == 'categorical' and col.get('is_text'):
+            dtype[name] = 'category'
+        elif col['type'] == 'numerical' and float_dtype and name.lower() != target:
+            dtype[name] = float_dtype
+    options = {'usecols': usecols, 'dtype': dtype, 'parse_dates': parse_dates}
+    if date_format:
+        options['date_format'] = date_format
+    return options
+
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def parse_datetimes(frame, columns):
+    """Convert the profiled datetime columns of ``frame`` that are still text, in place."""
+    for col in columns:
+        name = col['name']
+        if col['type'] != 'datetime' or name not in frame.columns or pd.api.types.is_datetime64_any_dtype(frame[name]):
+            continue
+        frame[name] = pd.to_datetime(frame[name], format=col.get('datetime_format'), errors='coerce')
+    return frame
+
+
+def read_typed_csv(file_path, columns, keep=None, target_column=None, **kwargs):
+    """Read ``file_path`` (a path or file object) typed by its profile; ``kwargs`` go to ``read_csv``.
+
+    With ``chunksize`` the chunks are typed the same way, each as it is read.
+    """
+    header = list(pd.read_csv(file_path, nrows=0).columns)
+    _rewind(file_path)
+    options = read_options(columns, header, keep, target_column)
+    if kwargs.get('chunksize'):
+        return _typed_chunks(file_path, columns, options, kwargs)
+    try:
+        return parse_datetimes(pd.read_csv(file_path, **options, **kwargs), columns)
+    except (ValueError, TypeError) as e:
+        logger.warning("Typed read of %s failed, reading without type hints: %s", file_path, e)
+        _rewind(file_path)
+        return parse_datetimes(pd.read_csv(file_path, usecols=options['usecols'], **kwargs), columns)
+
+
+def _typed_chunks(file_path, columns, options, kwargs):
+    # A chunk that does not fit the hints only shows up mid-stream, so the whole
+    # read is redone without them; rows already yielded are skipped, not repeated.
+    rows = 0
+    try:
+        for chunk in pd.read_csv(file_path, **options, **kwargs):
+            yield parse_datetimes(chunk, columns)
+            rows += len(chunk)
+        return
+    except (ValueError, TypeError) as e:
+        logger.warning("Typed read of %s failed after %d rows, continuing without type hints: %s", file_path, rows, e)
+    _rewind(file_path)
+    for chunk in pd.read_csv(file_path, usecols=options['usecols'], skiprows=range(1, rows + 1), **kwargs):
+        yield parse_datetimes(chunk, columns)
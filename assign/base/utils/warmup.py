@@ -0,0 +1,182 @@
+"""Preloading models into a worker's model cache before traffic reaches them.
+
+Without it the first request for each model after a deploy or worker recycle
+pays for ``joblib.load``, building the preprocessing plan and the first call
+into the estimator (the numba kernel's compilation, for forests). The models
+warmed are the pinned ones plus the ``MODEL_WARMUP_RECENT`` most recently
+used, loaded on ``MODEL_WARMUP_THREADS`` threads; each can also score one
+all-missing row so lazy initialization happens here rather than in a request.
+``base.apps`` starts this in the background when a server process boots, and
+``/api/health/`` answers 503 until it has finished.
+"""
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .ml_pipeline import predict
+from .model_cache import model_cache
+
+logger = logging.getLogger(__name__)
+
+# Programs that serve requests; scripts, shells and other manage.py commands skip the startup warm-up.
+SERVER_PROGRAMS = ('gunicorn', 'uvicorn', 'daphne', 'hypercorn', 'uwsgi')
+SERVER_COMMANDS = ('runserver',)  # of manage.py
+# How long the startup thread waits for the app registry before giving up.
+APPS_READY_TIMEOUT = 30
+
+
+def warmup_candidates(recent=None, pinned=True, model_ids=None):
+    """The models to warm: ``model_ids`` if given, else the pinned ones and the ``recent`` most recently used."""
+    from ..models import TrainedModel
+
+    models = TrainedModel.objects.only(*TrainedModel.SERVING_FIELDS)
+    if model_ids:
+        return list(models.filter(model_id__in=model_ids))
+    recent = getattr(settings, 'MODEL_WARMUP_RECENT', 10) if recent is None else recent
+    selected = {}
+    if pinned:
+        selected.update((m.pk, m) for m in models.filter(pinned=True).order_by('-last_used_at'))
+    if recent:
+        for m in models.order_by('-last_used_at')[:recent]:
+            selected.setdefault(m.pk, m)
+    return list(selected.values())
+
+
+def warm_model(model_obj, dummy_inference=True):
+    """Load one model into the cache and optionally score an all-missing row with it."""
+    if dummy_inference:
+        predict(model_obj.model_path, model_obj.preprocessing_steps, [{}], model_id=model_obj.model_id)
+    else:
+        model_cache.get(model_obj.model_id, model_obj.model_path, model_obj.preprocessing_steps)
+
+
+class ModelWarmup:
+    """Runs a warm-up over a set of models and keeps its progress for the health endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = 'idle'  # idle (never run), warming, ready
+        self.total = 0
+        self.loaded = 0
+        self.failed = 0
+        self.started = None
+        self.seconds = None
+        self.errors = {}
+
+    @property
+    def ready(self):
+        return self.status != 'warming'
+
+    def _begin(self):
+        with self._lock:
+            if self.status == 'warming':
+                return False
+            self.status = 'warming'
+            self.total = self.loaded = self.failed = 0
+            self.errors = {}
+            self.started = time.perf_counter()
+            self.seconds = None
+            return True
+
+    def _finish(self):
+        with self._lock:
+            self.status = 'ready'
+            self.seconds = time.perf_counter() - self.started
+
+    def _warm(self, model_obj, dummy_inference):
+        try:
+            warm_model(model_obj, dummy_inference)
+        except Exception as e:
+            logger.warning("Warming model %s failed: %s", model_obj.model_id, e)
+            with self._lock:
+                self.failed += 1
+                self.errors[str(model_obj.model_id)] = str(e)
+            return
+        with self._lock:
+            self.loaded += 1
+
+    def _run(self, models, threads, dummy_inference):
+        try:
+            if models is None:
+                models = warmup_candidates()
+            with self._lock:
+                self.total = len(models)
+            threads = threads or getattr(settings, 'MODEL_WARMUP_THREADS', 4)
+            if dummy_inference is None:
+                dummy_inference = getattr(settings, 'MODEL_WARMUP_DUMMY_INFERENCE', True)
+            with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix='model-warmup') as pool:
+                list(pool.map(lambda model_obj: self._warm(model_obj, dummy_inference), models))
+        except Exception:
+            logger.exception("Model warm-up failed")
+        finally:
+            self._finish()
+
+    def run(self, models=None, threads=None, dummy_inference=None):
+        """Warm ``models`` (default: ``warmup_candidates()``) and wait; returns ``stats()``."""
+        if self._begin():
+            self._run(models, threads, dummy_inference)
+        return self.stats()
+
+    def start(self):
+        """Warm the default candidates on a background thread; readiness is pending from this call on."""
+        if not self._begin():
+            return
+
+        def target():
+            from django.apps import apps
+            from django.db import connection
+
+            try:
+                deadline = time.monotonic() + APPS_READY_TIMEOUT
+                while not apps.ready and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                self._run(None, None, None)
+            finally:
+                connection.close()
+
+        threading.Thread(target=target, name='model-warmup', daemon=True).start()
+
+    def _after_fork(self):
+        # A server that imports the app before forking (gunicorn --preload) leaves each worker a copy of
+        # the cache but not the warming thread; the worker finishes the job itself.
+        self._lock = threading.Lock()
+        if self.status == 'warming':
+            self.status = 'idle'
+            self.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'status': self.status,
+                'ready': self.ready,
+                'total': self.total,
+                'loaded': self.loaded,
+                'failed': self.failed,
+                'seconds': self.seconds,
+                'errors': dict(self.errors),
+            }
+
+
+def warm_on_startup():
+    """Whether this process should warm models as it boots: servers only, not commands or pool workers."""
+    if not getattr(settings, 'MODEL_WARMUP_ON_STARTUP', False):
+        return False
+    if multiprocessing.parent_process() is not None:
+        return False
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program in ('manage.py', 'django-admin'):
+        if len(sys.argv) < 2 or sys.argv[1] not in SERVER_COMMANDS:
+            return False
+        # runserver's autoreloader also loads the apps in its file-watching parent process.
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    return program in SERVER_PROGRAMS
+
+
+model_warmup = ModelWarmup()
+os.register_at_fork(after_in_child=model_warmup._after_fork)
@@ -1,14 +1,59 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import FileUpload, TrainedModel, Prediction
-from .serializers import FileUploadSerializer, ProfileSerializer, TrainModelSerializer, PredictionSerializer
-from rest_framework.parsers import MultiPartParser, FormParser
-from .utils.data_profiling import infer_schema_and_metadata
-from .utils.ml_pipeline import train_model, predict
-import pandas as pd
+from .models import FileUpload, ChunkedUpload, TrainedModel, TrainingJob
+from .serializers import FileUploadSerializer, ChunkedUploadSerializer, ProfileSerializer, TrainingJobSerializer
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.renderers import BaseRenderer
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from .utils.data_profiling import profile_upload
+from .utils.profile_store import save_profile, copy_profile, page_options, profile_page, schema_columns
+from .utils.columnar_cache import delete_columnar_cache
+from .utils.artifact_storage import enforce_quotas, record_upload, touch
+from .utils.blob_store import store_upload, commit_blob, delete_blob, reusable_session
+from .utils.chunked_uploads import OffsetMismatch, append_chunk, discard_part, parse_offset, part_path, sha256_file
+from .utils.training_jobs import submit_training_job, parse_time_budget, training_key, find_trained_model, QueueFull, fail_orphaned_jobs
+from .utils.retraining import parse_retrain_options
+from .utils.appends import append_rows
+from .utils.prediction_log import prediction_log
+from .utils.micro_batching import BatchTimeout, micro_batcher
+from .utils.model_cache import model_cache
+from .utils.warmup import model_warmup
+from .utils.metrics import registry, stats_gauges
+from .utils.insights import generate_insights
+from .utils.response_cache import cached_payload, validators
+from .utils.batch_scoring import CONTENT_TYPES, csv_chunks, cached_chunks, score_chunks
 import os
 
+def _register_upload(file_name, content_hash, created):
+    """Create the session for a stored blob, reusing or building its profile and columnar cache."""
+    file_obj = FileUpload.objects.create(file=file_name, content_hash=content_hash)
+    columnar_cache = None
+    try:
+        previous = reusable_session(content_hash)
+        if previous is not None:
+            copy_profile(previous, file_obj)
+        else:
+            schema = profile_upload(file_obj.file.path, content_hash)
+            columnar_cache = schema['columnar_cache']
+            save_profile(file_obj, schema)
+    except Exception:
+        delete_columnar_cache(columnar_cache)
+        file_obj.delete()
+        if created:
+            delete_blob(file_name)
+        raise
+    record_upload(file_obj)
+    enforce_quotas(file_obj)
+    return file_obj
+
+
 class UploadFileView(APIView):
     parser_classes = [MultiPartParser, FormParser]
 
@@ -16,137 +61,401 @@ class UploadFileView(APIView):
         serializer = FileUploadSerializer(data=request.data)
         
         if serializer.is_valid():
-            file_obj = serializer.save()
             try:
-
-                file_path = file_obj.file.path
-                metadata = infer_schema_and_metadata(file_path)
-                file_obj.metadata = metadata
-                file_obj.save()
-                
-                return Response({'session_id': str(file_obj.session_id)}, status=status.HTTP_201_CREATED)
+                file_name, content_hash, created = store_upload(serializer.validated_data['file'])
+                file_obj = _register_upload(file_name, content_hash, created)
+                return Response({
+                    'session_id': str(file_obj.session_id),
+                    'content_hash': content_hash,
+                    'deduplicated': not created,
+                }, status=status.HTTP_201_CREATED)
             
             except Exception as e:
-                file_obj.delete()
                 return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ChunkedUploadView(APIView):
+    def post(self, request):
+        try:
+            filename = request.data.get('filename') or 'upload.csv'
+            total_size = request.data.get('size')
+            total_size = int(total_size) if total_size not in (None, '') else None
+            max_bytes = getattr(settings, 'CHUNKED_UPLOAD_MAX_BYTES', None)
+            if total_size is not None and (total_size <= 0 or (max_bytes is not None and total_size > max_bytes)):
+                return Response({'error': f'size must be between 1 and {max_bytes} bytes'}, status=status.HTTP_400_BAD_REQUEST)
+            upload = ChunkedUpload.objects.create(filename=os.path.basename(str(filename))[:255], total_size=total_size)
+            return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ChunkedUploadChunkView(APIView):
+    # The body is raw file bytes, read from the stream by append_chunk rather than parsed.
+    parser_classes = []
+
+    def get(self, request, upload_id):
+        try:
+            upload = ChunkedUpload.objects.get(upload_id=upload_id)
+            return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_200_OK)
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def put(self, request, upload_id):
+        try:
+            offset, length, total = parse_offset(request.headers.get('Content-Range'), request.query_params.get('offset'))
+            with transaction.atomic():
+                upload = ChunkedUpload.objects.select_for_update().get(upload_id=upload_id)
+                if upload.status != ChunkedUpload.STATUS_ACTIVE:
+                    return Response({'error': f'Upload is {upload.status}'}, status=status.HTTP_409_CONFLICT)
+                if total is not None and upload.total_size is None:
+                    upload.total_size = total
+                try:
+                    append_chunk(upload, offset, request.read, length)
+                except OffsetMismatch as e:
+                    return Response({'error': str(e), 'offset': e.expected}, status=status.HTTP_409_CONFLICT)
+                except ValueError as e:
+                    upload.status = ChunkedUpload.STATUS_FAILED
+                    upload.error = str(e)
+                    upload.save()
+                    discard_part(upload)
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                upload.save()
+            return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_200_OK)
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ChunkedUploadCompleteView(APIView):
+    def post(self, request, upload_id):
+        try:
+            with transaction.atomic():
+                upload = ChunkedUpload.objects.select_for_update().get(upload_id=upload_id)
+                if upload.status == ChunkedUpload.STATUS_COMPLETE:
+                    return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_200_OK)
+                if upload.status != ChunkedUpload.STATUS_ACTIVE:
+                    return Response({'error': f'Upload is {upload.status}'}, status=status.HTTP_409_CONFLICT)
+                if not upload.offset:
+                    return Response({'error': 'No data received'}, status=status.HTTP_400_BAD_REQUEST)
+                if upload.total_size is not None and upload.offset != upload.total_size:
+                    return Response({'error': f'Received {upload.offset} of {upload.total_size} bytes', 'offset': upload.offset},
+                                    status=status.HTTP_409_CONFLICT)
+                expected_crc32 = request.data.get('crc32')
+                if expected_crc32 not in (None, '') and int(expected_crc32) != upload.crc32:
+                    return Response({'error': 'CRC32 does not match the received bytes'}, status=status.HTTP_400_BAD_REQUEST)
+
+                part = part_path(upload)
+                content_hash = sha256_file(part)
+                expected_sha256 = request.data.get('sha256')
+                if expected_sha256 and expected_sha256.lower() != content_hash:
+                    return Response({'error': 'SHA-256 does not match the received bytes'}, status=status.HTTP_400_BAD_REQUEST)
+
+                file_name, content_hash, created = commit_blob(part, content_hash, os.path.splitext(upload.filename)[1])
+                try:
+                    file_obj = _register_upload(file_name, content_hash, created)
+                except Exception as e:
+                    upload.status = ChunkedUpload.STATUS_FAILED
+                    upload.error = str(e)
+                    upload.save()
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                upload.status = ChunkedUpload.STATUS_COMPLETE
+                upload.session = file_obj
+                upload.save()
+            return Response({
+                **ChunkedUploadSerializer(upload).data,
+                'content_hash': content_hash,
+                'deduplicated': not created,
+            }, status=status.HTTP_201_CREATED)
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 class ProfileDataView(APIView):
+    @method_decorator(condition(*validators(FileUpload, 'session_id', 'session_id')))
     def get(self, request, session_id):
         try:
             file_obj = FileUpload.objects.get(session_id=session_id)
-            serializer = ProfileSerializer({'session_id': file_obj.session_id, 'metadata': file_obj.metadata})
-            return Response(serializer.data)
+            touch(file_obj)
+            if request.query_params:
+                payload = ProfileSerializer(profile_page(file_obj, **page_options(request.query_params))).data
+            else:
+                # Only the default first page is cached; filtered pages are a couple of indexed queries.
+                payload = cached_payload(
+                    'profile', file_obj.session_id, file_obj.updated_at,
+                    lambda: ProfileSerializer(profile_page(file_obj)).data,
+                )
+            response = Response(payload)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
         except FileUpload.DoesNotExist:
             return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 class TrainModelView(APIView):
     def post(self, request, session_id):
         try:
-            file_obj = FileUpload.objects.get(session_id=session_id)
+            file_obj = FileUpload.objects.only('session_id', 'content_hash').get(session_id=session_id)
+            touch(file_obj)
             target_column = request.data.get('target_column', None)
+            time_budget = parse_time_budget(request.data.get('time_budget', None))
+            refresh = str(request.data.get('refresh', '')).lower() in ('1', 'true', 'yes')
             
+            existing = None if refresh else find_trained_model(training_key(file_obj.content_hash, target_column, time_budget))
+            if existing is not None:
+                now = timezone.now()
+                job = TrainingJob.objects.create(
+                    session=file_obj, target_column=target_column, time_budget=time_budget,
+                    status=TrainingJob.STATUS_SUCCEEDED, trained_model=existing, reused=True,
+                    started_at=now, finished_at=now,
+                )
+                serializer = TrainingJobSerializer(job)
+                return Response(serializer.data, status=status.HTTP_200_OK)
 
-            model_path, metrics, feature_importance, preprocessing_steps = train_model(file_obj.file.path, target_column)
+            job = TrainingJob.objects.create(session=file_obj, target_column=target_column, time_budget=time_budget)
+            try:
+                submit_training_job(job)
+            except QueueFull as e:
+                job.delete()
+                return Response({'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
             
+            serializer = TrainingJobSerializer(job)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        except FileUpload.DoesNotExist:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            trained_model = TrainedModel.objects.create(
-                session=file_obj,
-                model_path=model_path,
-                target_column=target_column or 'inferred',
-                metrics=metrics,
-                feature_importance=feature_importance,
-                preprocessing_steps=preprocessing_steps
-            )
-            
-            serializer = TrainModelSerializer(trained_model)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+def _submit_retrain(parent, strategy, window_rows, time_budget=None):
+    """Queue a job training a new version of ``parent`` on its session's current data."""
+    if strategy == TrainingJob.RETRAIN_WARM_START and window_rows is None:
+        # The added trees are fitted on the newest rows only: those of the session's last append.
+        window_rows = FileUpload.objects.filter(pk=parent.session_id).values_list('appended_rows', flat=True).first()
+        if not window_rows:
+            raise ValueError("warm_start needs window_rows: the model's session has no appended rows")
+    job = TrainingJob.objects.create(
+        session_id=parent.session_id, target_column=parent.target_column, time_budget=time_budget,
+        parent_model=parent, retrain_strategy=strategy, window_rows=window_rows,
+    )
+    try:
+        submit_training_job(job)
+    except QueueFull:
+        job.delete()
+        raise
+    return job
+
+class AppendRowsView(APIView):
+    """Append a CSV of new rows to a session, optionally retraining one of its models on them.
+
+    With ``model_id`` a new version of that model is queued: by default it warm-starts
+    on just the appended rows; ``strategy=window`` refits on the last ``window_rows``.
+    """
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, session_id):
+        try:
+            file_obj = FileUpload.objects.only('id', 'session_id').get(session_id=session_id)
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+            parent = None
+            if request.data.get('model_id'):
+                parent = file_obj.models.only('id', 'session_id', 'target_column').get(model_id=request.data['model_id'])
+                strategy, window_rows = parse_retrain_options(request.data)
+                time_budget = parse_time_budget(request.data.get('time_budget', None))
+
+            result = append_rows(file_obj, upload)
+            touch(file_obj)
+            payload = {'session_id': session_id, **result}
+            if parent is None:
+                return Response(payload, status=status.HTTP_200_OK)
+            try:
+                job = _submit_retrain(parent, strategy, window_rows, time_budget)
+            except QueueFull as e:
+                # The rows are appended either way; only the retraining has to be requested again.
+                return Response({**payload, 'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            return Response({**payload, 'job': TrainingJobSerializer(job).data}, status=status.HTTP_202_ACCEPTED)
         except FileUpload.DoesNotExist:
             return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        except TrainedModel.DoesNotExist:
+            return Response({'error': 'Model not found in this session'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class ModelRetrainView(APIView):
+    """Queue a new version of a model on its session's current data (``strategy``, ``window_rows``).
+
+    A warm start without ``window_rows`` fits on the rows of the session's last append.
+    """
+
+    def post(self, request, model_id):
+        try:
+            parent = TrainedModel.objects.only('id', 'session_id', 'target_column').get(model_id=model_id)
+            strategy, window_rows = parse_retrain_options(request.data)
+            try:
+                job = _submit_retrain(parent, strategy, window_rows, parse_time_budget(request.data.get('time_budget', None)))
+            except QueueFull as e:
+                return Response({'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            return Response(TrainingJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        except TrainedModel.DoesNotExist:
+            return Response({'error': 'Model not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class TrainingJobView(APIView):
+    def get(self, request, job_id):
+        try:
+            job = (TrainingJob.objects.select_related('session', 'trained_model', 'parent_model')
+                   .defer('session__metadata', 'trained_model__insights', 'trained_model__preprocessing_steps',
+                          'parent_model__insights', 'parent_model__preprocessing_steps')
+                   .get(job_id=job_id))
+            if job.status in (TrainingJob.STATUS_QUEUED, TrainingJob.STATUS_RUNNING) and fail_orphaned_jobs(TrainingJob.objects.filter(pk=job.pk)):
+                job.refresh_from_db(fields=['status', 'error', 'finished_at'])
+            serializer = TrainingJobSerializer(job)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        except TrainingJob.DoesNotExist:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class ModelPinView(APIView):
+    """Pinned models are warmed whenever a worker starts and are never evicted by the storage quotas."""
+
+    def post(self, request, model_id):
+        return self._set_pinned(model_id, True)
+
+    def delete(self, request, model_id):
+        return self._set_pinned(model_id, False)
+
+    def _set_pinned(self, model_id, pinned):
+        try:
+            if not TrainedModel.objects.filter(model_id=model_id).update(pinned=pinned):
+                return Response({'error': 'Model not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({'model_id': model_id, 'pinned': pinned}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 class PredictView(APIView):
     def post(self, request, model_id):
         try:
-            model_obj = TrainedModel.objects.get(model_id=model_id)
+            model_obj = TrainedModel.objects.only(*TrainedModel.SERVING_FIELDS).get(model_id=model_id)
+            touch(model_obj)
             input_data = request.data.get('input_data')
             if not input_data:
                 return Response({'error': 'No input data provided'}, status=status.HTTP_400_BAD_REQUEST)
             
 
-            if isinstance(input_data, list):
-                df = pd.DataFrame(input_data)
-            elif isinstance(input_data, dict):
-                df = pd.DataFrame([input_data])
-            else:
+            if not isinstance(input_data, (list, dict)):
                 return Response({'error': 'Input data must be a JSON object or array'}, status=status.HTTP_400_BAD_REQUEST)
             
-            predictions = predict(model_obj.model_path, model_obj.preprocessing_steps, df)
-            prediction_obj = Prediction.objects.create(
-                model=model_obj,
-                input_data=input_data,
-                predictions=predictions
-            )
-            serializer = PredictionSerializer(prediction_obj)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            predictions = micro_batcher.predict(model_obj, input_data)
+            prediction_id = prediction_log.log(model_obj, input_data, predictions)
+            return Response({'prediction_id': prediction_id, 'predictions': predictions}, status=status.HTTP_200_OK)
+        except TrainedModel.DoesNotExist:
+            return Response({'error': 'Model not found'}, status=status.HTTP_404_NOT_FOUND)
+        except BatchTimeout as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class BatchPredictView(APIView):
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def post(self, request, model_id):
+        try:
+            model_obj = TrainedModel.objects.only(*TrainedModel.SERVING_FIELDS, 'session').get(model_id=model_id)
+            touch(model_obj)
+            fmt = request.query_params.get('output', request.data.get('output', 'csv'))
+            upload = request.FILES.get('file')
+            session_id = request.data.get('session_id')
+
+            if upload is not None:
+                chunks = csv_chunks(upload, model_obj.preprocessing_steps, columns=schema_columns(model_obj.session_id))
+            elif session_id:
+                file_obj = FileUpload.objects.get(session_id=session_id)
+                touch(file_obj)
+                columnar_cache = (file_obj.metadata or {}).get('columnar_cache')
+                if columnar_cache:
+                    chunks = cached_chunks(columnar_cache, model_obj.preprocessing_steps)
+                else:
+                    chunks = csv_chunks(file_obj.file.path, model_obj.preprocessing_steps, columns=schema_columns(model_obj.session_id))
+            else:
+                return Response({'error': 'Provide a CSV file or the session_id of an upload'}, status=status.HTTP_400_BAD_REQUEST)
+
+            response = StreamingHttpResponse(score_chunks(model_obj, chunks, fmt), content_type=CONTENT_TYPES[fmt])
+            response['Content-Disposition'] = f'attachment; filename="predictions_{model_id}.{fmt}"'
+            return response
         except TrainedModel.DoesNotExist:
             return Response({'error': 'Model not found'}, status=status.HTTP_404_NOT_FOUND)
+        except FileUpload.DoesNotExist:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 class SummaryView(APIView):
+    @method_decorator(condition(*validators(TrainedModel, 'model_id', 'model_id')))
     def get(self, request, model_id):
         try:
             model_obj = TrainedModel.objects.get(model_id=model_id)
-            session = model_obj.session
-            metadata = session.metadata
-            feature_importance = model_obj.feature_importance
-            target_column = model_obj.target_column
-            
+            touch(model_obj)
+            if model_obj.insights is None:
+                # Models trained before insights were stored: compute once and keep them.
+                model_obj.insights = generate_insights(model_obj.target_column, model_obj.metrics, model_obj.feature_importance)
+                model_obj.save(update_fields=['insights', 'updated_at'])
+            payload = cached_payload(
+                'summary', model_obj.model_id, model_obj.updated_at,
+                lambda: {"model_id": model_id, "insights": model_obj.insights},
+            )
+            response = Response(payload, status=status.HTTP_200_OK)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        except TrainedModel.DoesNotExist:
+            return Response({'error': 'Model not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            insights = []
-            
 
-            top_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)[:3]
-            insights.append({
-                "insight": f"Key drivers of {target_column}",
-                "details": f"The top features influencing {target_column} are: {', '.join([f'{k} ({v:.3f})' for k, v in top_features])}. Focus on optimizing these factors to improve outcomes."
-            })
-            
+registry.register_collector(lambda: stats_gauges('model_cache', 'Loaded model cache state.', model_cache.stats()))
+registry.register_collector(lambda: stats_gauges(
+    'model_warmup', 'Startup model warm-up progress.', dict(model_warmup.stats(), ready=int(model_warmup.ready))
+))
+registry.register_collector(lambda: stats_gauges('prediction_log', 'Prediction log buffer state.', prediction_log.stats()))
+registry.register_collector(lambda: [
+    gauge
+    for model_id, stats in micro_batcher.stats().items()
+    for gauge in stats_gauges('micro_batch', 'Micro-batcher state per model.', stats, model_id=model_id)
+])
 
-            high_importance_features = [(k, v) for k, v in feature_importance.items() if v > 0.1]
-            if high_importance_features:
-                insights.append({
-                    "insight": "High impact features identified",
-                    "details": f"Features with high importance (>0.1): {', '.join([f'{k} ({v:.3f})' for k, v in high_importance_features])}. These are critical for accurate predictions."
-                })
-            
 
-            if len(feature_importance) > 5:
-                insights.append({
-                    "insight": "Feature importance analysis",
-                    "details": f"Model analyzed {len(feature_importance)} features. The top 3 features account for {sum([v for k, v in top_features]):.1%} of the total importance."
-                })
-            
+class PrometheusTextRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
 
-            if hasattr(model_obj, 'metrics'):
-                metrics = model_obj.metrics
-                if 'accuracy' in metrics:
-                    insights.append({
-                        "insight": "Model performance",
-                        "details": f"Model accuracy: {metrics['accuracy']:.3f}. This indicates how well the model predicts {target_column}."
-                    })
-                elif 'r2' in metrics:
-                    insights.append({
-                        "insight": "Model performance",
-                        "details": f"Model R² score: {metrics['r2']:.3f}. This indicates how well the model explains the variance in {target_column}."
-                    })
-            
-            return Response({"model_id": model_id, "insights": insights}, status=status.HTTP_200_OK)
-        except TrainedModel.DoesNotExist:
-            return Response({'error': 'Model not found'}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data.encode(self.charset)
+
+
+class MetricsView(APIView):
+    renderer_classes = [PrometheusTextRenderer]
+
+    def get(self, request):
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class HealthView(APIView):
+    """503 while this worker is still warming its models, so load balancers hold traffic back until it is ready."""
+
+    def get(self, request):
+        warmup = model_warmup.stats()
+        code = status.HTTP_200_OK if warmup['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+        response = Response({'status': 'ok' if warmup['ready'] else 'warming', 'warmup': warmup}, status=code)
+        patch_cache_control(response, no_store=True)
+        return response